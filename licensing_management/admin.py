@@ -1,8 +1,76 @@
-from django.contrib import admin
+from django.contrib import admin, messages
+from django.contrib.admin import helpers
+from django.template.response import TemplateResponse
 
-from .models import Cliente, Licencia, Sistema
+from .forms import FechaRenovacionForm
+from .models import (
+    Cliente,
+    Licencia,
+    NotificacionLicencia,
+    RenovacionLicencia,
+    Sistema,
+)
+from .views import LICENCIAS_A_MOSTRAR
 
 # Registra tus modelos aquí para que aparezcan en el panel de administración
 admin.site.register(Cliente)
 admin.site.register(Sistema)
-admin.site.register(Licencia)
+
+
+# Licencia.__str__ usa tipo_sistema y cliente: se precargan para no hacer dos
+# consultas extra por fila, y las llaves foráneas se capturan por id en lugar de
+# cargar listas desplegables con todos los registros.
+@admin.register(Licencia)
+class LicenciaAdmin(admin.ModelAdmin):
+    list_display = ["__str__", "estado", "fecha_fin_vigencia"]
+    list_select_related = ["cliente", "tipo_sistema"]
+    raw_id_fields = ["cliente"]
+    show_full_result_count = False  # Evita un segundo COUNT(*) sobre toda la tabla
+    actions = ["renovar"]
+
+    @admin.action(description="Renovar licencias seleccionadas")
+    def renovar(self, request, queryset):
+        # Como delete_selected: la primera vez muestra una confirmación que pide la
+        # fecha de inicio y vuelve a enviar la acción por POST; la selección viaja en
+        # el cuerpo (o como select_across con los filtros de la URL), nunca en la URL.
+        form = FechaRenovacionForm(request.POST if "aplicar" in request.POST else None)
+        if form.is_valid():
+            total = queryset.count()
+            renovadas = queryset.renew(form.cleaned_data["fecha_inicio_vigencia"], usuario=request.user)
+            mensaje = f"Se renovaron {renovadas} licencias."
+            if total - renovadas:
+                mensaje += f" {total - renovadas} licencias perpetuas no se renovaron."
+            self.message_user(request, mensaje, messages.SUCCESS)
+            return None
+
+        context = {
+            **self.admin_site.each_context(request),
+            "title": "Renovar licencias",
+            "opts": self.model._meta,
+            "form": form,
+            "total": queryset.count(),
+            "licencias": queryset.select_related("cliente", "tipo_sistema")[:LICENCIAS_A_MOSTRAR],
+            "seleccionadas": request.POST.getlist(helpers.ACTION_CHECKBOX_NAME),
+            "select_across": request.POST.get("select_across") == "1",
+            "action_checkbox_name": helpers.ACTION_CHECKBOX_NAME,
+        }
+        return TemplateResponse(
+            request, "admin/licensing_management/licencia/renovar_confirmacion.html", context
+        )
+
+
+@admin.register(RenovacionLicencia)
+class RenovacionLicenciaAdmin(admin.ModelAdmin):
+    list_display = ["__str__", "fecha_fin_anterior", "fecha_fin_vigencia", "usuario", "fecha_renovacion"]
+    list_select_related = ["usuario"]
+    raw_id_fields = ["licencia"]
+    show_full_result_count = False
+
+
+@admin.register(NotificacionLicencia)
+class NotificacionLicenciaAdmin(admin.ModelAdmin):
+    list_display = ["__str__", "fecha_fin_vigencia", "intentos", "fecha_envio"]
+    list_filter = ["tipo", "estado"]
+    list_select_related = ["licencia"]
+    raw_id_fields = ["licencia"]
+    show_full_result_count = False
@@ -0,0 +1,213 @@
+# licensing_management/api.py
+import os
+from datetime import date
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import F
+from django.http import JsonResponse, StreamingHttpResponse
+from django.views.decorators.http import require_GET
+
+from .models import Cliente, Licencia, Sistema
+from .pagination import decode_cursor, encode_cursor, seek
+
+API_LIMITE = int(os.getenv("API_LIMITE", 100))  # Filas por página si no se indica ?limite=
+API_LIMITE_MAXIMO = int(os.getenv("API_LIMITE_MAXIMO", 100000))
+FILAS_POR_BLOQUE = 2000  # Filas que se leen del cursor de PostgreSQL y se envían juntas
+
+# Campo de la respuesta -> campo (o ruta con __) del modelo
+CAMPOS_CLIENTE = {
+    "clave_cliente": "clave_cliente",
+    "nombre": "nombre",
+    "rfc": "rfc",
+    "correo_electronico": "correo_electronico",
+    "telefono": "telefono",
+    "activo_en_sae": "activo_en_sae",
+    "empresa_sae": "empresa_sae",
+    "fecha_registro": "fecha_registro",
+}
+
+CAMPOS_LICENCIA = {
+    "id": "id",
+    "cliente_id": "cliente_id",
+    "sistema": "tipo_sistema__nombre",
+    "categoria": "tipo_sistema__categoria",
+    "identificador_licencia": "identificador_licencia",
+    "tipo_licencia": "tipo_licencia",
+    "periodo_licencia": "periodo_licencia",
+    "estado": "estado",
+    "fecha_adquisicion": "fecha_adquisicion",
+    "fecha_inicio_vigencia": "fecha_inicio_vigencia",
+    "fecha_fin_vigencia": "fecha_fin_vigencia",
+    "numero_usuarios": "numero_usuarios",
+    "version_software": "version_software",
+    "version_sistema": "version_sistema",
+    "observaciones": "observaciones",
+}
+
+
+class ApiError(Exception):
+    """
+    Parámetro inválido en la petición; se responde con 400 y este mensaje.
+    """
+
+
+def _opciones(request, parametro, choices):
+    """
+    Valores separados por comas de un parámetro, validados contra las opciones del modelo.
+    """
+    valores = [v.strip() for v in request.GET.get(parametro, "").split(",") if v.strip()]
+    validos = {clave for clave, _ in choices}
+    invalidos = [v for v in valores if v not in validos]
+    if invalidos:
+        raise ApiError(
+            f"Valor inválido para {parametro}: {', '.join(invalidos)}. "
+            f"Opciones: {', '.join(sorted(validos))}."
+        )
+    return valores
+
+
+def _fecha(request, parametro):
+    valor = request.GET.get(parametro, "").strip()
+    if not valor:
+        return None
+    try:
+        return date.fromisoformat(valor)
+    except ValueError:
+        raise ApiError(f"{parametro} debe ser una fecha AAAA-MM-DD.")
+
+
+def _stream(request, queryset, disponibles, cursor):
+    """
+    Respuesta JSON {"results": [...], "next": url} de una página ordenada por `cursor`.
+
+    Las filas se leen con .values().iterator(), sin crear instancias de los modelos,
+    y se codifican y envían por bloques, así que una página de 100 mil licencias no
+    se arma completa en memoria. Valida todos los parámetros antes de empezar a
+    responder; lanza ApiError si alguno es inválido.
+    """
+    if "campos" in request.GET:
+        campos = [c.strip() for c in request.GET["campos"].split(",") if c.strip()]
+        desconocidos = [c for c in campos if c not in disponibles]
+        if desconocidos or not campos:
+            raise ApiError(
+                f"Campos desconocidos: {', '.join(desconocidos) or '(ninguno)'}. "
+                f"Disponibles: {', '.join(disponibles)}."
+            )
+    else:
+        campos = list(disponibles)
+
+    try:
+        limite = int(request.GET.get("limite", API_LIMITE))
+    except ValueError:
+        limite = 0
+    if not 1 <= limite <= API_LIMITE_MAXIMO:
+        raise ApiError(f"limite debe estar entre 1 y {API_LIMITE_MAXIMO}.")
+
+    token = request.GET.get("cursor")
+    if token:
+        valores = decode_cursor(token, [cursor])
+        if valores is None:
+            raise ApiError("Cursor inválido.")
+        queryset = queryset.filter(seek([cursor], valores, "gt"))
+
+    # Los campos con el mismo nombre en el modelo se piden tal cual; los demás
+    # (sistema, categoria) con F(). La llave del cursor siempre se lee.
+    seleccion = set(campos) | {cursor}
+    filas = (
+        queryset.order_by(cursor)
+        .values(
+            *(c for c in seleccion if disponibles[c] == c),
+            **{c: F(disponibles[c]) for c in seleccion if disponibles[c] != c},
+        )[: limite + 1]
+        .iterator(chunk_size=FILAS_POR_BLOQUE)
+    )
+
+    parametros = request.GET.copy()
+    ruta = request.path
+
+    def codificar(codificador, bloque, enviadas):
+        # Un solo encode() por bloque (en el codificador de C) en lugar de uno por fila;
+        # se quitan los corchetes de la lista para unir los bloques con comas.
+        separador = "," if enviadas > len(bloque) else ""
+        return separador + codificador.encode(bloque)[1:-1]
+
+    def generar():
+        codificador = DjangoJSONEncoder()
+        yield '{"results": ['
+        bloque = []
+        enviadas = 0
+        ultima = None
+        siguiente = None
+        for fila in filas:
+            if enviadas == limite:
+                # Hay al menos una fila más: la siguiente página empieza después de la última
+                parametros["cursor"] = encode_cursor([ultima[cursor]])
+                siguiente = f"{ruta}?{parametros.urlencode()}"
+                break
+            bloque.append({c: fila[c] for c in campos})
+            enviadas += 1
+            ultima = fila
+            if len(bloque) == FILAS_POR_BLOQUE:
+                yield codificar(codificador, bloque, enviadas)
+                bloque = []
+        if bloque:
+            yield codificar(codificador, bloque, enviadas)
+        yield f'], "next": {codificador.encode(siguiente)}}}'
+
+    return StreamingHttpResponse(generar(), content_type="application/json")
+
+
+@require_GET
+def client_list_api(request):
+    """
+    GET /api/clientes/?rfc=&nombre=&activo_en_sae=1&campos=&limite=&cursor=
+    """
+    clientes = Cliente.objects.all()
+    if request.GET.get("rfc"):
+        clientes = clientes.filter(rfc__icontains=request.GET["rfc"].strip())
+    if request.GET.get("nombre"):
+        clientes = clientes.filter(nombre__icontains=request.GET["nombre"].strip())
+    if request.GET.get("activo_en_sae") in ("0", "1"):
+        clientes = clientes.filter(activo_en_sae=request.GET["activo_en_sae"] == "1")
+
+    try:
+        return _stream(request, clientes, CAMPOS_CLIENTE, "clave_cliente")
+    except ApiError as e:
+        return JsonResponse({"error": str(e)}, status=400)
+
+
+@require_GET
+def license_list_api(request):
+    """
+    GET /api/licencias/?cliente=&estado=&categoria=&tipo_licencia=
+        &fecha_fin_desde=AAAA-MM-DD&fecha_fin_hasta=AAAA-MM-DD&campos=&limite=&cursor=
+
+    estado, categoria y tipo_licencia aceptan varios valores separados por comas; el
+    rango de fechas de fin es inclusivo.
+    """
+    licencias = Licencia.objects.all()
+    try:
+        if request.GET.get("cliente"):
+            # Las claves de SAE se guardan alineadas a la derecha, como en la lista de clientes
+            licencias = licencias.filter(
+                cliente_id=request.GET["cliente"].strip().rjust(10)
+            )
+        estados = _opciones(request, "estado", Licencia.ESTADO_LICENCIA_CHOICES)
+        if estados:
+            licencias = licencias.filter(estado__in=estados)
+        categorias = _opciones(request, "categoria", Sistema.CATEGORIA_CHOICES)
+        if categorias:
+            licencias = licencias.filter(tipo_sistema__categoria__in=categorias)
+        tipos = _opciones(request, "tipo_licencia", Licencia.TIPO_LICENCIA_CHOICES)
+        if tipos:
+            licencias = licencias.filter(tipo_licencia__in=tipos)
+        desde = _fecha(request, "fecha_fin_desde")
+        if desde:
+            licencias = licencias.filter(fecha_fin_vigencia__gte=desde)
+        hasta = _fecha(request, "fecha_fin_hasta")
+        if hasta:
+            licencias = licencias.filter(fecha_fin_vigencia__lte=hasta)
+
+        return _stream(request, licencias, CAMPOS_LICENCIA, "id")
+    except ApiError as e:
+        return JsonResponse({"error": str(e)}, status=400)
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class LicensingManagementConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'licensing_management'
+
+    def ready(self):
+        from . import signals  # noqa: F401  Registra los receptores de señales
@@ -0,0 +1,125 @@
+# licensing_management/caching.py
+import os
+import time
+from urllib.parse import urlencode
+
+from django.core.cache import cache
+from django.core.cache.utils import make_template_fragment_key
+from django.db import transaction
+from django.utils.safestring import mark_safe
+
+CACHE_TIMEOUT = int(os.getenv("CACHE_TIMEOUT", 300))  # Segundos; también acota cualquier carrera
+
+LISTA_CLIENTES = "lista_clientes"
+DETALLE_CLIENTE = "detalle_cliente"
+
+
+def _generacion_key(nombre):
+    return f"licensing_management:generacion:{nombre}"
+
+
+def _generacion(nombre):
+    """
+    Número de generación de un grupo de fragmentos; forma parte de sus llaves, así que
+    avanzarlo deja inalcanzables todas las entradas anteriores (expiran solas).
+    El contador está en GeneracionCache y la caché guarda una copia para no consultar
+    la base de datos en cada petición. Si la copia se perdió, se avanza la generación
+    (una sola consulta): ninguna entrada anterior se puede reutilizar.
+    """
+    clave = _generacion_key(nombre)
+    generacion = cache.get(clave)
+    if generacion is None:
+        cache.add(clave, _siguiente_generacion(nombre), None)
+        generacion = cache.get(clave)
+    return generacion
+
+
+def _siguiente_generacion(nombre):
+    from .models import GeneracionCache  # models importa este módulo
+
+    # Empieza con la hora actual para que una caché que sobrevivió a la base de
+    # datos no reutilice generaciones viejas
+    return GeneracionCache.avanzar(nombre, time.time_ns())
+
+
+def _avanzar_generacion(nombre):
+    """
+    Avanza la generación en la base de datos (atómico entre procesos) y copia el valor
+    a la caché. Si dos procesos avanzan a la vez y la copia del valor menor llega al
+    final, no se sirven datos viejos: ambos valores se obtuvieron después de que las
+    dos transacciones confirmaron. Retorna la generación nueva.
+    """
+    generacion = _siguiente_generacion(nombre)
+    cache.set(_generacion_key(nombre), generacion, None)
+    return generacion
+
+
+def client_list_cache_key(parametros):
+    """
+    Llave de los resultados de la lista de clientes para los parámetros GET dados
+    (filtros y cursor de página), sin importar su orden en la URL.
+    """
+    valores = sorted(
+        (campo, valor) for campo in parametros for valor in parametros.getlist(campo)
+    )
+    return make_template_fragment_key(
+        LISTA_CLIENTES, [_generacion(LISTA_CLIENTES), urlencode(valores)]
+    )
+
+
+def client_detail_cache_key(clave_cliente):
+    """
+    Llave del detalle de un cliente. La generación cambia si se modifica un Sistema,
+    cuyo nombre aparece en la tabla de licencias de todos los clientes.
+    """
+    return make_template_fragment_key(
+        DETALLE_CLIENTE, [clave_cliente, _generacion(DETALLE_CLIENTE)]
+    )
+
+
+def cached_fragment(clave, render):
+    """
+    Retorna el HTML guardado en `clave` o lo genera con render() y lo guarda.
+    """
+    fragmento = cache.get(clave)
+    if fragmento is None:
+        fragmento = render()
+        cache.set(clave, fragmento, CACHE_TIMEOUT)
+    return mark_safe(fragmento)
+
+
+def invalidate_clients(cliente_ids):
+    """
+    Descarta el detalle de estos clientes y todas las páginas de la lista (sus conteos
+    de licencias pudieron cambiar). Se aplica al confirmar la transacción, para que
+    ninguna petición vuelva a guardar los datos anteriores mientras tanto.
+    """
+    cliente_ids = set(cliente_ids) - {None}
+    if not cliente_ids:
+        return
+
+    def invalidar():
+        cache.delete_many([client_detail_cache_key(clave) for clave in cliente_ids])
+        _avanzar_generacion(LISTA_CLIENTES)
+
+    transaction.on_commit(invalidar)
+
+
+def invalidate_client_details():
+    """
+    Descarta el detalle de todos los clientes.
+    """
+    transaction.on_commit(lambda: _avanzar_generacion(DETALLE_CLIENTE))
+
+
+def invalidate_all_clients():
+    """
+    Descarta la lista y el detalle de todos los clientes, para cambios masivos en
+    los que listar las llaves de cada cliente costaría más que regenerarlas.
+    """
+
+    def invalidar():
+        _avanzar_generacion(LISTA_CLIENTES)
+        _avanzar_generacion(DETALLE_CLIENTE)
+
+    transaction.on_commit(invalidar)
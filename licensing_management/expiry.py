@@ -0,0 +1,97 @@
+# licensing_management/expiry.py
+"""
+Cálculo columnar de la vigencia de las licencias: fecha de fin según el periodo y
+estado según las fechas, sobre arreglos de NumPy en lugar de licencia por licencia.
+
+Licencia.save() (con arreglos de un elemento), import_licenses y cualquier proceso
+masivo usan estas mismas funciones, así que las reglas no pueden divergir.
+"""
+import numpy as np
+from django.utils import timezone
+
+NAT = np.datetime64("NaT", "D")
+
+
+def as_dates(valores):
+    """
+    Arreglo datetime64[D] a partir de fechas (date, datetime64 o cadenas ISO);
+    None se convierte en NaT.
+    """
+    return np.asarray(valores, dtype="datetime64[D]")
+
+
+def to_dates(fechas):
+    """
+    Lista de datetime.date (None en lugar de NaT), para asignarla a las licencias.
+    """
+    return fechas.astype(object).tolist()
+
+
+def add_months(fechas, meses):
+    """
+    Suma `meses` (escalar o arreglo) a cada fecha. Si el día no existe en el mes
+    destino se usa el último día del mes (31 de enero + 1 mes = 28 o 29 de febrero),
+    igual que relativedelta.
+    """
+    mes = fechas.astype("datetime64[M]")
+    dia = fechas - mes.astype("datetime64[D]")  # Días desde el 1 del mes
+    destino = mes + np.asarray(meses, dtype="timedelta64[M]")
+    primer_dia = destino.astype("datetime64[D]")
+    ultimo_dia = (destino + 1).astype("datetime64[D]") - 1
+    return np.minimum(primer_dia + dia, ultimo_dia)
+
+
+def compute_end_dates(fechas_inicio, periodos):
+    """
+    Fecha de fin de vigencia de cada licencia: inicio + meses del periodo. Es NaT
+    para las perpetuas, las que no tienen periodo o no tienen fecha de inicio.
+    """
+    from .models import Licencia
+
+    fechas_inicio = as_dates(fechas_inicio)
+    periodos = np.asarray(periodos, dtype=object)
+    meses = np.zeros(len(periodos), dtype=np.int64)
+    for periodo, total in Licencia.MESES_POR_PERIODO.items():
+        meses[periodos == periodo] = total
+
+    calculable = (meses > 0) & ~np.isnat(fechas_inicio)
+    fechas_fin = np.full(len(periodos), NAT)
+    fechas_fin[calculable] = add_months(fechas_inicio[calculable], meses[calculable])
+    return fechas_fin
+
+
+def compute_estados(fechas_inicio, fechas_fin, periodos, today=None):
+    """
+    Estado de cada licencia con las reglas de Licencia.update_estado() (y de
+    LicenciaQuerySet.estado_conditions(), su equivalente en SQL). Retorna un arreglo
+    de cadenas.
+    """
+    from .models import Licencia, LicenciaQuerySet
+
+    if today is None:
+        today = timezone.now().date()
+    hoy = np.datetime64(today, "D")
+    limite_aviso = hoy + LicenciaQuerySet.DIAS_AVISO_RENOVACION
+    fechas_inicio = as_dates(fechas_inicio)
+    fechas_fin = as_dates(fechas_fin)
+    periodos = np.asarray(periodos, dtype=object)
+
+    sin_fin = np.isnat(fechas_fin)
+    # Las comparaciones con NaT son falsas: las licencias sin fecha de fin no entran
+    # en vencidas ni pendientes.
+    estados = np.full(len(periodos), Licencia.ESTADO_ACTIVA, dtype=object)
+    estados[fechas_fin <= limite_aviso] = Licencia.ESTADO_PENDIENTE_RENOVACION
+    estados[fechas_fin < hoy] = Licencia.ESTADO_VENCIDA
+    estados[sin_fin & np.isnat(fechas_inicio)] = Licencia.ESTADO_INACTIVA
+    estados[periodos == Licencia.PERIODO_PERPETUA] = Licencia.ESTADO_ACTIVA
+    return estados
+
+
+def compute_vigencias(fechas_inicio, periodos, today=None):
+    """
+    Fechas de fin y estados de un lote de licencias en una sola pasada.
+    Retorna (fechas_fin, estados) como arreglos alineados con la entrada.
+    """
+    fechas_inicio = as_dates(fechas_inicio)
+    fechas_fin = compute_end_dates(fechas_inicio, periodos)
+    return fechas_fin, compute_estados(fechas_inicio, fechas_fin, periodos, today)
@@ -0,0 +1,88 @@
+# licensing_management/exports.py
+import csv
+import io
+import os
+
+from .models import Licencia
+
+FILAS_POR_LOTE = int(os.getenv("EXPORT_CHUNK_SIZE", 5000))  # Filas por viaje al cursor
+FILAS_POR_HOJA = 1_048_575  # Límite de filas de Excel menos el encabezado
+
+# (Encabezado, campo de Licencia en values_list)
+COLUMNAS = [
+    ("Clave cliente", "cliente_id"),
+    ("Cliente", "cliente__nombre"),
+    ("RFC", "cliente__rfc"),
+    ("Correo", "cliente__correo_electronico"),
+    ("Teléfono", "cliente__telefono"),
+    ("Activo en SAE", "cliente__activo_en_sae"),
+    ("Sistema", "tipo_sistema__nombre"),
+    ("Categoría", "tipo_sistema__categoria"),
+    ("Identificador", "identificador_licencia"),
+    ("Tipo", "tipo_licencia"),
+    ("Periodo", "periodo_licencia"),
+    ("Estado", "estado"),
+    ("Inicio de vigencia", "fecha_inicio_vigencia"),
+    ("Fin de vigencia", "fecha_fin_vigencia"),
+    ("Usuarios", "numero_usuarios"),
+    ("Versión del sistema", "version_sistema"),
+]
+ENCABEZADOS = [encabezado for encabezado, _ in COLUMNAS]
+
+
+def license_rows(clientes=None, chunk_size=FILAS_POR_LOTE):
+    """
+    Tuplas de las licencias con los datos de su cliente y sistema, ordenadas por
+    cliente. Se leen con values_list() desde un cursor del lado del servidor de
+    PostgreSQL, `chunk_size` filas a la vez, así que la memoria no depende del total.
+    `clientes` (queryset de Cliente) limita la exportación a esos clientes.
+    """
+    licencias = Licencia.objects.all()
+    if clientes is not None:
+        licencias = licencias.filter(cliente__in=clientes.values("pk"))
+    return (
+        licencias.order_by("cliente_id", "id")
+        .values_list(*(campo for _, campo in COLUMNAS))
+        .iterator(chunk_size=chunk_size)
+    )
+
+
+def iter_csv(filas, lote=FILAS_POR_LOTE):
+    """
+    Genera el CSV por pedazos de `lote` filas. Empieza con la marca BOM para que
+    Excel abra los acentos correctamente.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(ENCABEZADOS)
+    yield "\ufeff"
+    for i, fila in enumerate(filas, 1):
+        writer.writerow(fila)
+        if i % lote == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def write_xlsx(filas, destino):
+    """
+    Escribe el libro XLSX en `destino` (ruta o archivo binario). openpyxl en modo
+    write_only vuelca cada fila a un archivo temporal en lugar de guardarla en
+    memoria; al llegar al límite de filas de Excel se continúa en otra hoja.
+    Retorna el número de filas escritas.
+    """
+    from openpyxl import Workbook  # Solo se necesita al exportar a XLSX
+
+    libro = Workbook(write_only=True)
+    hoja = None
+    total = 0
+    for total, fila in enumerate(filas, 1):
+        if hoja is None or (total - 1) % FILAS_POR_HOJA == 0:
+            hoja = libro.create_sheet(f"Licencias {(total - 1) // FILAS_POR_HOJA + 1}")
+            hoja.append(ENCABEZADOS)
+        hoja.append(fila)
+    if hoja is None:
+        libro.create_sheet("Licencias 1").append(ENCABEZADOS)
+    libro.save(destino)
+    return total
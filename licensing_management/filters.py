@@ -0,0 +1,66 @@
+# licensing_management/filters.py
+from django.contrib.postgres.search import TrigramWordDistance
+from django.db.models import FloatField
+from django.db.models.functions import Cast, Upper
+
+
+def read_client_filters(parametros):
+    """
+    Filtros de la lista de clientes tomados de los parámetros GET, listos para
+    pasarse como argumentos a filter_clients().
+    """
+    nombre = parametros.get("nombre", "").strip()
+    return {
+        "rfc": parametros.get("rfc", "").strip(),
+        "clave": parametros.get("clave", "").strip(),
+        "nombre": nombre,
+        # Búsqueda aproximada: tolera errores de dedo en el nombre de la empresa
+        "similar": bool(nombre) and parametros.get("similar") == "1",
+    }
+
+
+def filter_clients(clientes, rfc="", clave="", nombre="", similar=False):
+    """
+    Aplica los filtros de la lista de clientes (RFC, clave, nombre y búsqueda
+    aproximada). La usan la lista, la exportación y el comando export_licenses.
+    Con similar=True (y un nombre) el queryset se anota con `distancia`
+    (1 - similitud por palabra: los más parecidos tienen la menor distancia).
+    """
+    # Aplicar filtros
+    if rfc:
+        clientes = clientes.filter(
+            rfc__icontains=rfc
+        )  # icontains para LIKE insensible a mayúsculas
+
+    if clave:
+        # Aquí manejamos la lógica de "acompletar espacios" para la clave.
+        # Quitamos espacios y rellenamos a la derecha con espacios si es necesario para 16 caracteres.
+        # Asegúrate de que el campo `clave_cliente` en tu modelo `Cliente` tiene max_length suficiente (ej. 16).
+        clave_formateada = clave.rjust(
+            10
+        )  # Rellena a la izquierda con espacios hasta 16 caracteres
+        clientes = clientes.filter(
+            clave_cliente__exact=clave_formateada
+        )  # exact para coincidencia exacta
+
+    if nombre and similar:
+        # Sobre UPPER(nombre) para aprovechar el índice de trigramas; la similitud
+        # por palabra compara el texto buscado con la parte más parecida del nombre.
+        nombre_buscado = nombre.upper()
+        clientes = (
+            clientes.alias(nombre_mayusculas=Upper("nombre"))
+            .filter(nombre_mayusculas__trigram_word_similar=nombre_buscado)
+            .annotate(
+                # En double precision: el valor llega exacto a Python y el cursor de la
+                # paginación por llave lo puede comparar con igualdad
+                distancia=Cast(
+                    TrigramWordDistance(nombre_buscado, "nombre_mayusculas"), FloatField()
+                )
+            )
+        )
+    elif nombre:
+        clientes = clientes.filter(
+            nombre__icontains=nombre
+        )  # icontains para LIKE insensible a mayúsculas
+
+    return clientes
@@ -1,4 +1,9 @@
+import atexit
 import os
+import threading
+import time
+from collections import deque, namedtuple
+from contextlib import contextmanager
 
 import fdb
 from dotenv import load_dotenv
@@ -17,6 +22,9 @@ FIREBIRD_PORT = int(os.getenv("FIREBIRD_PORT", "3050"))  # Puerto de Firebird
 FIREBIRD_DB_PATH = os.getenv(
     "FIREBIRD_DB_PATH", "/ruta/a/tu/base/datos/SAEDAT01.FDB"
 )  # ¡RUTA ABSOLUTA O RELATIVA ACCESIBLE DESDE EL CONTENEDOR!
+FIREBIRD_EMPRESAS = os.getenv(
+    "FIREBIRD_EMPRESAS", ""
+)  # Varias empresas SAE: "01=/ruta/SAEDAT01.FDB,02=/ruta/SAEDAT02.FDB" (sufijo=ruta)
 FIREBIRD_USER = os.getenv("FIREBIRD_USER", "SYSDBA")  # Usuario de Firebird
 FIREBIRD_PASSWORD = os.getenv(
     "FIREBIRD_PASSWORD", "masterkey"
@@ -27,74 +35,386 @@ FIREBIRD_CHARSET = os.getenv(
 FIREBIRD_ENCODING = os.getenv(
     "FIREBIRD_ENCODING", "latin-1"
 )  # Encoding de Python para decodificar (generalmente coincide con charset)
+FIREBIRD_FETCH_SIZE = int(
+    os.getenv("FIREBIRD_FETCH_SIZE", "1000")
+)  # Filas por cada fetchmany() al leer en streaming
 
+# --- Configuración del pool de conexiones ---
+FIREBIRD_POOL_MIN_SIZE = int(
+    os.getenv("FIREBIRD_POOL_MIN_SIZE", "0")
+)  # Conexiones ociosas que se conservan aunque venza su tiempo de inactividad
+FIREBIRD_POOL_MAX_SIZE = int(
+    os.getenv("FIREBIRD_POOL_MAX_SIZE", "4")
+)  # Máximo de conexiones abiertas (en uso + ociosas) por base de datos
+FIREBIRD_POOL_IDLE_TIMEOUT = float(
+    os.getenv("FIREBIRD_POOL_IDLE_TIMEOUT", "300")
+)  # Segundos que una conexión ociosa puede esperar antes de cerrarse
+FIREBIRD_POOL_ACQUIRE_TIMEOUT = float(
+    os.getenv("FIREBIRD_POOL_ACQUIRE_TIMEOUT", "30")
+)  # Segundos máximos de espera por una conexión libre
 
-def get_firebird_connection():
+# Tipos de columna (type_code de cursor.description) que pueden llegar como bytes
+_TIPOS_TEXTO = (str, bytes)
+
+
+def _connect(database=None):
+    """
+    Abre una conexión nueva a Firebird; lanza fdb.Error si falla.
+    """
+    conn = fdb.connect(
+        host=FIREBIRD_HOST,
+        port=FIREBIRD_PORT,
+        database=database or FIREBIRD_DB_PATH,
+        user=FIREBIRD_USER,
+        password=FIREBIRD_PASSWORD,
+        charset=FIREBIRD_CHARSET,
+    )
+    print("Conexión a Firebird establecida exitosamente.")
+    return conn
+
+
+def get_firebird_connection(database=None):
+    """
+    Context manager con una conexión del pool de la base de datos (por defecto
+    FIREBIRD_DB_PATH), que se devuelve al pool al salir:
+
+        with get_firebird_connection() as conn:
+            ...
+
+    Lanza fdb.Error si no se puede conectar.
+    """
+    return get_pool(database).connection()
+
+
+class FirebirdPoolTimeout(fdb.Error):
+    """
+    No se liberó ninguna conexión del pool dentro del tiempo de espera.
+    """
+
+
+class FirebirdConnectionPool:
+    """
+    Pool de conexiones a una base de datos Firebird, seguro entre hilos.
+
+    Reutiliza conexiones ociosas (la más reciente primero), comprueba que sigan vivas
+    antes de entregarlas y reconecta de forma transparente si el servidor las cerró.
+    Las conexiones ociosas por más de idle_timeout se cierran, conservando min_size.
+    """
+
+    def __init__(
+        self,
+        database=None,
+        min_size=FIREBIRD_POOL_MIN_SIZE,
+        max_size=FIREBIRD_POOL_MAX_SIZE,
+        idle_timeout=FIREBIRD_POOL_IDLE_TIMEOUT,
+        acquire_timeout=FIREBIRD_POOL_ACQUIRE_TIMEOUT,
+    ):
+        self.database = database or FIREBIRD_DB_PATH
+        self.min_size = min_size
+        self.max_size = max(max_size, 1)
+        self.idle_timeout = idle_timeout
+        self.acquire_timeout = acquire_timeout
+        self._idle = deque()  # (conexión, instante en que quedó libre)
+        self._in_use = 0
+        self._cond = threading.Condition()
+        self._stats = {
+            "hits": 0,  # Conexión ociosa reutilizada
+            "misses": 0,  # Conexión nueva abierta
+            "reconnects": 0,  # Conexión ociosa descartada por no responder
+            "timeouts": 0,  # Esperas que vencieron sin conexión libre
+            "wait_time": 0.0,  # Segundos acumulados esperando una conexión libre
+        }
+
+    def _pop_expired(self):
+        """
+        Saca del pool las conexiones ociosas vencidas (conservando min_size) y las
+        retorna para cerrarlas fuera del lock. Se llama con el lock tomado; las más
+        antiguas están a la izquierda.
+        """
+        now = time.monotonic()
+        vencidas = []
+        while (
+            self._idle
+            and len(self._idle) + self._in_use > self.min_size
+            and now - self._idle[0][1] > self.idle_timeout
+        ):
+            conn, _ = self._idle.popleft()
+            vencidas.append(conn)
+        return vencidas
+
+    def fill(self):
+        """
+        Abre por adelantado las conexiones que falten para tener min_size en el pool.
+        Las que no se pueden abrir se omiten: acquire() vuelve a intentarlo.
+        """
+        with self._cond:
+            faltantes = self.min_size - len(self._idle) - self._in_use
+        for _ in range(max(faltantes, 0)):
+            try:
+                conn = _connect(self.database)
+            except fdb.Error as e:
+                print(f"Error al abrir conexiones iniciales a Firebird: {e}")
+                return
+            with self._cond:
+                lleno = len(self._idle) + self._in_use >= self.max_size
+                if not lleno:
+                    self._idle.append((conn, time.monotonic()))
+                    self._cond.notify()
+            if lleno:
+                _close_quietly(conn)
+                return
+
+    def acquire(self):
+        """
+        Entrega una conexión viva del pool. Lanza FirebirdPoolTimeout si no hay
+        una libre a tiempo, o fdb.Error si no se puede abrir una nueva.
+        """
+        started = time.monotonic()
+        vencidas = []
+        try:
+            with self._cond:
+                while True:
+                    vencidas += self._pop_expired()
+                    if self._idle:
+                        conn, _ = self._idle.pop()
+                        break
+                    if self._in_use < self.max_size:
+                        conn = None
+                        break
+                    remaining = self.acquire_timeout - (time.monotonic() - started)
+                    if remaining <= 0:
+                        self._stats["timeouts"] += 1
+                        self._stats["wait_time"] += time.monotonic() - started
+                        raise FirebirdPoolTimeout(
+                            f"Sin conexiones libres a {self.database} tras {self.acquire_timeout}s"
+                        )
+                    self._cond.wait(remaining)
+                self._in_use += 1
+                self._stats["wait_time"] += time.monotonic() - started
+        finally:
+            # Cerrar es una llamada de red: se hace sin el lock tomado
+            for vencida in vencidas:
+                _close_quietly(vencida)
+
+        # La comprobación y la conexión se hacen fuera del lock para no bloquear a otros hilos.
+        try:
+            if conn is not None and not _is_alive(conn):
+                _close_quietly(conn)
+                conn = None
+                with self._cond:
+                    self._stats["reconnects"] += 1
+            if conn is None:
+                conn = _connect(self.database)
+                with self._cond:
+                    self._stats["misses"] += 1
+            else:
+                with self._cond:
+                    self._stats["hits"] += 1
+            return conn
+        except BaseException:
+            with self._cond:
+                self._in_use -= 1
+                self._cond.notify()
+            raise
+
+    def release(self, conn, discard=False):
+        """
+        Devuelve una conexión al pool. Termina su transacción para no dejar
+        transacciones de lectura abiertas en el servidor. Con discard=True se cierra.
+        """
+        if not discard:
+            try:
+                conn.rollback()
+            except fdb.Error:
+                discard = True
+        with self._cond:
+            self._in_use -= 1
+            if not discard:
+                self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+        if discard:
+            _close_quietly(conn)
+
+    @contextmanager
+    def connection(self):
+        """
+        Context manager que toma una conexión y la devuelve al salir. Si ocurre un
+        error de Firebird la conexión se descarta en lugar de reutilizarse.
+        """
+        conn = self.acquire()
+        try:
+            yield conn
+        except fdb.Error:
+            self.release(conn, discard=True)
+            raise
+        except BaseException:
+            self.release(conn)
+            raise
+        else:
+            self.release(conn)
+
+    def stats(self):
+        """
+        Retorna una copia de las estadísticas del pool.
+        """
+        with self._cond:
+            return dict(self._stats, idle=len(self._idle), in_use=self._in_use)
+
+    def close(self):
+        """
+        Cierra todas las conexiones ociosas.
+        """
+        with self._cond:
+            ociosas = [conn for conn, _ in self._idle]
+            self._idle.clear()
+        for conn in ociosas:
+            _close_quietly(conn)
+
+
+def _is_alive(conn):
+    """
+    Verifica con una consulta mínima que la conexión siga respondiendo.
+    """
+    try:
+        cursor = conn.cursor()
+        try:
+            cursor.execute("SELECT 1 FROM RDB$DATABASE")
+            cursor.fetchone()
+        finally:
+            cursor.close()
+        return True
+    except fdb.Error:
+        return False
+
+
+def _close_quietly(conn):
+    try:
+        conn.close()
+    except fdb.Error:
+        pass
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(database=None):
+    """
+    Retorna el pool de conexiones de la base de datos indicada (por defecto
+    FIREBIRD_DB_PATH), creándolo la primera vez.
     """
-    Establece y retorna una conexión a la base de datos Firebird.
+    database = database or FIREBIRD_DB_PATH
+    with _pools_lock:
+        pool = _pools.get(database)
+        nuevo = pool is None
+        if nuevo:
+            pool = _pools[database] = FirebirdConnectionPool(database)
+    if nuevo:
+        # Las conexiones iniciales se abren sin bloquear a los demás pools
+        pool.fill()
+    return pool
+
+
+@atexit.register
+def close_pools():
+    """
+    Cierra las conexiones ociosas de todos los pools (se ejecuta al salir del proceso).
     """
-    conn = None
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.close()
+
+
+def _decode_value(value):
+    """
+    Decodifica un valor bytes con FIREBIRD_ENCODING (o utf-8 ignorando errores).
+    """
+    if not isinstance(value, bytes):
+        return value
     try:
-        conn = fdb.connect(
-            host=FIREBIRD_HOST,
-            port=FIREBIRD_PORT,
-            database=FIREBIRD_DB_PATH,
-            user=FIREBIRD_USER,
-            password=FIREBIRD_PASSWORD,
-            charset=FIREBIRD_CHARSET,
+        return value.decode(FIREBIRD_ENCODING)
+    except UnicodeDecodeError:
+        print(
+            f"Advertencia: No se pudo decodificar el valor '{value}' con {FIREBIRD_ENCODING}"
         )
-        print("Conexión a Firebird establecida exitosamente.")
-        return conn
-    except fdb.Error as e:
-        print(f"Error al conectar a Firebird: {e}")
-        # Considera relanzar la excepción o manejarla de forma más robusta
-        return None
+        return value.decode("utf-8", errors="ignore")  # Intenta con utf-8 o ignora errores
+
+
+def _column_decoders(description):
+    """
+    Elige una sola vez, a partir del type_code de cursor.description, el
+    decodificador de cada columna: _decode_value para las de texto (str o bytes) y
+    None para las demás (enteros, decimales, fechas...), que se entregan tal cual.
+    Si el driver no informa el tipo, la columna se decodifica por si acaso.
+    """
+    decoders = []
+    for column in description:
+        type_code = column[1]
+        if isinstance(type_code, type) and not issubclass(type_code, _TIPOS_TEXTO):
+            decoders.append(None)
+        else:
+            decoders.append(_decode_value)
+    return decoders
+
+
+def iter_firebird_rows(query, params=None, batch_size=None, database=None):
+    """
+    Ejecuta una consulta SQL en Firebird y genera las filas como namedtuples
+    (campos = nombres de columna), leyendo en lotes con fetchmany() para que la
+    memoria no crezca con el número de filas.
+
+    La conexión se toma del pool de la base de datos (por defecto FIREBIRD_DB_PATH)
+    y se devuelve al terminar.
+    Si no se puede conectar, o la lectura falla a la mitad, se lanza fdb.Error: un
+    resultado vacío o parcial no se puede confundir con uno completo.
+    """
+    batch_size = batch_size or FIREBIRD_FETCH_SIZE
+
+    # connection() descarta la conexión si sale un fdb.Error
+    with get_firebird_connection(database) as conn:
+        cursor = None
+        try:
+            cursor = conn.cursor()
+            if params:
+                cursor.execute(query, params)
+            else:
+                cursor.execute(query)
+
+            columns = [col[0] for col in cursor.description]  # Nombres de las columnas
+            row_type = namedtuple("FirebirdRow", columns, rename=True)
+            decoders = _column_decoders(cursor.description)
+            decoded_columns = [
+                (i, decoder) for i, decoder in enumerate(decoders) if decoder is not None
+            ]
+
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                for row in rows:
+                    if decoded_columns:
+                        row = list(row)
+                        for i, decoder in decoded_columns:
+                            row[i] = decoder(row[i])
+                    yield row_type._make(row)
+        except fdb.Error as e:
+            print(f"Error al ejecutar consulta en Firebird: {e}")
+            raise
+        finally:
+            # Si la conexión quedó rota, el rollback de release() la descarta
+            if cursor is not None:
+                _close_quietly(cursor)
 
 
 def fetch_data_from_firebird(query):
     """
     Ejecuta una consulta SQL en Firebird y retorna los resultados.
+    Carga todo el resultado en memoria; para volúmenes grandes usa iter_firebird_rows().
     """
-    conn = None
-    cursor = None
     try:
-        conn = get_firebird_connection()
-        if conn:
-            cursor = conn.cursor()
-            cursor.execute(query)
-            columns = [col[0] for col in cursor.description]  # Nombres de las columnas
-            rows = cursor.fetchall()
-
-            # Convertir a una lista de diccionarios para facilitar el manejo
-            results = []
-            for row in rows:
-                row_dict = {}
-                for i, col_name in enumerate(columns):
-                    value = row[i]
-                    # Decodificar si es bytes y no es None
-                    if isinstance(value, bytes):
-                        try:
-                            value = value.decode(FIREBIRD_ENCODING)
-                        except UnicodeDecodeError:
-                            print(
-                                f"Advertencia: No se pudo decodificar el valor '{value}' con {FIREBIRD_ENCODING}"
-                            )
-                            value = value.decode(
-                                "utf-8", errors="ignore"
-                            )  # Intenta con utf-8 o ignora errores
-                    row_dict[col_name] = value
-                results.append(row_dict)
-            return results
-        else:
-            return []
-    except fdb.Error as e:
-        print(f"Error al ejecutar consulta en Firebird: {e}")
+        return [row._asdict() for row in iter_firebird_rows(query)]
+    except fdb.Error:
         return []
-    finally:
-        if cursor:
-            cursor.close()
-        if conn:
-            conn.close()
 
 
 if __name__ == "__main__":
@@ -79,3 +79,27 @@ class LicenciaUpdateForm(forms.ModelForm):
             "estado": "Estado de la Licencia",
             "fecha_inicio_vigencia": "Fecha de Inicio de Vigencia",
         }
+
+
+class FechaRenovacionForm(forms.Form):
+    """Nueva fecha de inicio de vigencia de las licencias que se renuevan."""
+
+    fecha_inicio_vigencia = forms.DateField(
+        label="Nueva Fecha de Inicio de Vigencia",
+        help_text="La fecha de fin y el estado de cada licencia se recalculan según su período.",
+        widget=forms.DateInput(attrs={"type": "date", "class": "form-control"}),
+    )
+
+
+class RenovacionMasivaForm(FechaRenovacionForm):
+    """
+    Renovación de varias licencias a la vez (vista bulk_renew_licenses). Las
+    licencias llegan como ids en campos ocultos.
+    """
+
+    licencias = forms.ModelMultipleChoiceField(
+        # Solo se valida que existan; renew() hace su propia consulta
+        queryset=Licencia.objects.order_by().only("pk"),
+        widget=forms.MultipleHiddenInput,
+        error_messages={"required": "Seleccione al menos una licencia."},
+    )
@@ -0,0 +1,97 @@
+# licensing_management/management/commands/benchmark_expiry.py
+import time
+from datetime import date
+
+import numpy as np
+from dateutil.relativedelta import relativedelta
+from django.core.management.base import BaseCommand
+
+from licensing_management.expiry import compute_vigencias
+from licensing_management.models import Licencia, LicenciaQuerySet
+
+
+class Command(BaseCommand):
+    help = (
+        "Mide cuántas licencias por segundo se les calcula fecha de fin y estado con el "
+        "cálculo por licencia (relativedelta y if/elif, el anterior) y con el cálculo "
+        "columnar de expiry.compute_vigencias(). No usa la base de datos."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--rows",
+            type=int,
+            default=1_000_000,
+            help="Licencias del cálculo columnar (por defecto 1,000,000).",
+        )
+        parser.add_argument(
+            "--sample",
+            type=int,
+            default=100_000,
+            help="Licencias del cálculo por licencia, que es mucho más lento (por defecto 100,000).",
+        )
+
+    def handle(self, *args, **options):
+        today = date.today()
+        fechas_inicio, periodos = self._build_columns(options["rows"], today)
+
+        muestra = options["sample"]
+        antes = self._measure(
+            lambda: [
+                self._compute_per_license(inicio, periodo, today)
+                for inicio, periodo in zip(
+                    fechas_inicio[:muestra].astype(object).tolist(), periodos[:muestra]
+                )
+            ],
+            muestra,
+        )
+        despues = self._measure(
+            lambda: compute_vigencias(fechas_inicio, periodos, today), len(periodos)
+        )
+
+        self.stdout.write(f"Por licencia ({muestra:,} filas): {antes:,.0f} licencias/s")
+        self.stdout.write(f"Columnar ({len(periodos):,} filas):  {despues:,.0f} licencias/s")
+        self.stdout.write(
+            self.style.SUCCESS(f"Mejora: {despues / antes:.1f}x" if antes else "Mejora: n/d")
+        )
+
+    def _build_columns(self, total, today):
+        # Inicios en los últimos dos años, con fin de mes y 29 de febrero incluidos
+        rng = np.random.default_rng(0)
+        fechas_inicio = np.datetime64(today, "D") - rng.integers(0, 730, total)
+        periodos = rng.choice(
+            np.array([valor for valor, _ in Licencia.PERIODO_LICENCIA_CHOICES], dtype=object),
+            total,
+        )
+        return fechas_inicio, periodos
+
+    def _measure(self, compute, filas):
+        started = time.perf_counter()
+        compute()
+        elapsed = time.perf_counter() - started
+        return filas / elapsed if elapsed else 0.0
+
+    def _compute_per_license(self, inicio, periodo, today):
+        # Equivale al cálculo anterior de Licencia._calculate_end_date() y update_estado()
+        meses = {
+            Licencia.PERIODO_MENSUAL: 1,
+            Licencia.PERIODO_TRIMESTRAL: 3,
+            Licencia.PERIODO_SEMESTRAL: 6,
+            Licencia.PERIODO_ANUAL: 12,
+        }.get(periodo)
+        fin = inicio + relativedelta(months=meses) if meses else None
+
+        if periodo == Licencia.PERIODO_PERPETUA:
+            estado = Licencia.ESTADO_ACTIVA
+        elif fin:
+            if fin < today:
+                estado = Licencia.ESTADO_VENCIDA
+            elif (fin - today).days <= LicenciaQuerySet.DIAS_AVISO_RENOVACION:
+                estado = Licencia.ESTADO_PENDIENTE_RENOVACION
+            else:
+                estado = Licencia.ESTADO_ACTIVA
+        elif not inicio:
+            estado = Licencia.ESTADO_INACTIVA
+        else:
+            estado = Licencia.ESTADO_ACTIVA
+        return fin, estado
@@ -0,0 +1,106 @@
+# licensing_management/management/commands/benchmark_notification_rendering.py
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.template.loader import render_to_string
+from django.utils import timezone
+
+from licensing_management.models import Cliente, Licencia, Sistema
+from licensing_management.notifications import _license_context, render_email
+
+
+class Command(BaseCommand):
+    help = (
+        "Mide cuántos correos de licencia por segundo se renderizan buscando y compilando "
+        "las plantillas en cada mensaje (antes) y con las plantillas compiladas y el "
+        "cierre por Sistema en caché (después). No usa la base de datos ni envía correos."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--messages",
+            type=int,
+            default=2000,
+            help="Correos a renderizar en cada medición (por defecto 2000).",
+        )
+
+    def handle(self, *args, **options):
+        licencias = self._build_licenses(options["messages"])
+
+        antes = self._measure(self._render_uncached, licencias)
+        despues = self._measure(self._render_cached, licencias)
+
+        self.stdout.write(
+            f"Sin caché (búsqueda y compilación por mensaje): {antes:,.0f} correos/s"
+        )
+        self.stdout.write(
+            f"Plantillas compiladas y cierre por Sistema:     {despues:,.0f} correos/s"
+        )
+        self.stdout.write(
+            self.style.SUCCESS(f"Mejora: {despues / antes:.1f}x" if antes else "Mejora: n/d")
+        )
+
+    def _build_licenses(self, total):
+        # Objetos en memoria: solo se mide el renderizado
+        sistemas = [
+            Sistema(nombre="Aspel SAE", categoria=Sistema.ASPEL),
+            Sistema(nombre="Microsoft 365", categoria=Sistema.MICROSOFT_OFFICE_365),
+            Sistema(nombre="Antivirus", categoria=Sistema.ANTIVIRUS),
+        ]
+        fecha_fin = timezone.now().date() - timedelta(days=1)
+        return [
+            Licencia(
+                cliente=Cliente(
+                    clave_cliente=str(i), nombre=f"Cliente {i}", rfc=f"RFC{i:010d}"
+                ),
+                tipo_sistema=sistemas[i % len(sistemas)],
+                identificador_licencia=f"LIC-{i}",
+                tipo_licencia=Licencia.TIPO_SUSCRIPCION,
+                periodo_licencia=Licencia.PERIODO_ANUAL,
+                estado=Licencia.ESTADO_VENCIDA,
+                fecha_fin_vigencia=fecha_fin,
+            )
+            for i in range(total)
+        ]
+
+    def _measure(self, render, licencias):
+        started = time.perf_counter()
+        for licencia in licencias:
+            render(licencia)
+        elapsed = time.perf_counter() - started
+        return len(licencias) / elapsed if elapsed else 0.0
+
+    def _render_uncached(self, licencia):
+        # Equivale al renderizado anterior: cada plantilla se localiza y compila por mensaje
+        # (así se comporta render_to_string con DEBUG=True, sin el cargador en caché).
+        fragment_context = {
+            "sistema_nombre": licencia.tipo_sistema.nombre,
+            "es_aspel": licencia.tipo_sistema.categoria == Sistema.ASPEL,
+        }
+        context = _license_context(licencia)
+        render_to_string(
+            "emails/expired_license_notification.txt",
+            {
+                **context,
+                "cierre": render_to_string(
+                    "emails/fragments/expired_license_cierre.txt", fragment_context
+                ),
+            },
+        )
+        render_to_string(
+            "emails/expired_license_notification.html",
+            {
+                **context,
+                "cierre": render_to_string(
+                    "emails/fragments/cierre.html", fragment_context
+                ),
+            },
+        )
+
+    def _render_cached(self, licencia):
+        render_email(
+            "emails/expired_license_notification",
+            _license_context(licencia),
+            licencia.tipo_sistema,
+        )
@@ -0,0 +1,79 @@
+# licensing_management/management/commands/export_licenses.py
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from licensing_management.exports import (
+    FILAS_POR_LOTE,
+    iter_csv,
+    license_rows,
+    write_xlsx,
+)
+from licensing_management.filters import filter_clients
+from licensing_management.models import Cliente
+
+
+class Command(BaseCommand):
+    help = (
+        "Exporta el inventario de licencias (con su cliente y sistema) a CSV o XLSX, "
+        "con los mismos filtros que la lista de clientes. La memoria usada no depende "
+        "del número de licencias."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("salida", help="Ruta del archivo a generar (.csv o .xlsx).")
+        parser.add_argument(
+            "--formato",
+            choices=["csv", "xlsx"],
+            help="Formato del archivo; por defecto se toma de la extensión de la salida.",
+        )
+        parser.add_argument("--rfc", default="", help="Filtra clientes cuyo RFC contenga el texto.")
+        parser.add_argument("--clave", default="", help="Clave exacta del cliente.")
+        parser.add_argument("--nombre", default="", help="Filtra clientes cuyo nombre contenga el texto.")
+        parser.add_argument(
+            "--similar",
+            action="store_true",
+            help="Con --nombre, búsqueda aproximada (tolera errores de escritura).",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=FILAS_POR_LOTE,
+            help=f"Filas leídas del cursor de PostgreSQL por viaje (por defecto {FILAS_POR_LOTE}).",
+        )
+
+    def handle(self, *args, **options):
+        salida = options["salida"]
+        formato = options["formato"] or salida.rsplit(".", 1)[-1].lower()
+        if formato not in ("csv", "xlsx"):
+            raise CommandError("No se pudo deducir el formato; use --formato csv o xlsx.")
+
+        nombre = options["nombre"].strip()
+        clientes = filter_clients(
+            Cliente.objects.all(),
+            rfc=options["rfc"].strip(),
+            clave=options["clave"].strip(),
+            nombre=nombre,
+            similar=bool(nombre) and options["similar"],
+        )
+
+        self.total = 0
+        filas = self._contar(license_rows(clientes, chunk_size=options["chunk_size"]))
+        inicio = time.monotonic()
+        if formato == "csv":
+            with open(salida, "w", encoding="utf-8", newline="") as archivo:
+                for pedazo in iter_csv(filas, lote=options["chunk_size"]):
+                    archivo.write(pedazo)
+        else:
+            write_xlsx(filas, salida)
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Exportadas {self.total} licencias a {salida} en {time.monotonic() - inicio:.1f} s."
+            )
+        )
+
+    def _contar(self, filas):
+        for fila in filas:
+            self.total += 1
+            yield fila
@@ -1,8 +1,71 @@
+import queue
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from itertools import islice
+
 from django.core.management.base import BaseCommand, CommandError
 from django.db import transaction
+from django.utils import timezone
+
+from licensing_management.caching import invalidate_clients
+from licensing_management.firebird_connector import (
+    FIREBIRD_DB_PATH,
+    FIREBIRD_EMPRESAS,
+    get_pool,
+    iter_firebird_rows,
+)
+from licensing_management.models import Cliente, SincronizacionClientes
+
+# Sufijo de la empresa de Aspel SAE cuando solo se configura FIREBIRD_DB_PATH
+EMPRESA_PREDETERMINADA = "01"
+
+# Nombre de columna de Firebird aceptado en --sync-column (se interpola en la consulta)
+COLUMNA_VALIDA = re.compile(r"^[A-Z_][A-Z0-9_]*$")
 
-from licensing_management.firebird_connector import fetch_data_from_firebird
-from licensing_management.models import Cliente
+# Campos que se sobrescriben cuando el cliente ya existe en Django
+CAMPOS_ACTUALIZABLES = Cliente.CAMPOS_SAE + ["huella"]
+
+
+def _clean(value):
+    """
+    Aplica .strip() solo si el valor es una cadena; si no, lo deja como está (o None).
+    """
+    return value.strip() if isinstance(value, str) else value
+
+
+def _parse_empresa(value):
+    """
+    Convierte "SUFIJO=RUTA" (ej. "02=/datos/SAEDAT02.FDB") en (sufijo, ruta).
+    """
+    sufijo, separador, ruta = value.partition("=")
+    sufijo, ruta = sufijo.strip(), ruta.strip()
+    if not separador or not sufijo.isalnum() or not ruta:
+        raise CommandError(
+            f"Empresa inválida '{value}'. Usa el formato SUFIJO=RUTA, ej. 02=/datos/SAEDAT02.FDB"
+        )
+    return sufijo, ruta
+
+
+class Empresa:
+    """
+    Una empresa de Aspel SAE: su base de datos Firebird, su tabla de clientes
+    (CLIE + sufijo) y su marca de sincronización incremental.
+    """
+
+    def __init__(self, sufijo, ruta):
+        self.sufijo = sufijo
+        self.ruta = ruta
+        self.tabla = f"CLIE{sufijo}"
+        self.sincronizacion, _ = SincronizacionClientes.objects.get_or_create(
+            origen=f"{ruta}:{self.tabla}"
+        )
+        self.max_version = None
+        self.filas = 0
+
+    def __str__(self):
+        return f"{self.tabla} ({self.ruta})"
 
 
 class Command(BaseCommand):
@@ -12,7 +75,44 @@ class Command(BaseCommand):
         parser.add_argument(
             "--truncate",
             action="store_true",
-            help="Elimina todos los clientes existentes en Django antes de importar.",
+            help="Elimina todos los clientes existentes en Django antes de importar (todo en una sola transacción).",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Número de clientes por lote; cada lote es un solo INSERT ... ON CONFLICT y su propio commit (por defecto 1000).",
+        )
+        parser.add_argument(
+            "--incremental",
+            action="store_true",
+            help="Solo importa los clientes modificados en SAE desde la última sincronización (incluye bajas).",
+        )
+        parser.add_argument(
+            "--detect-removed",
+            action="store_true",
+            help="Marca como inactivos en SAE los clientes que ya no existen o no están activos en Firebird.",
+        )
+        parser.add_argument(
+            "--sync-column",
+            default="VERSION_SINC",
+            help="Columna de Firebird con la marca de modificación de cada cliente (por defecto VERSION_SINC).",
+        )
+        parser.add_argument(
+            "--empresa",
+            action="append",
+            dest="empresas",
+            metavar="SUFIJO=RUTA",
+            help=(
+                "Empresa de Aspel SAE a importar, ej. 02=/datos/SAEDAT02.FDB (tabla CLIE02). "
+                "Se puede repetir. Por defecto se usa FIREBIRD_EMPRESAS o FIREBIRD_DB_PATH con la empresa 01."
+            ),
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=None,
+            help="Empresas que se leen en paralelo (por defecto, todas a la vez).",
         )
 
     def handle(self, *args, **options):
@@ -20,17 +120,112 @@ class Command(BaseCommand):
             self.style.SUCCESS("Iniciando la importación de clientes desde Firebird...")
         )
 
-        # Define tu consulta SQL para obtener clientes de Aspel SAE
-        # AJUSTA ESTA CONSULTA a la estructura real de tu tabla de clientes en Firebird
-        # Por ejemplo: 'SELECT CLAVE, NOMBRE, RFC, TELEFONO1, EMAIL FROM CLIENTES'
-        # Asegúrate de que los nombres de las columnas ('CLAVE', 'NOMBRE', etc.) coincidan con las de tu DB Firebird
-        firebird_query = "SELECT CLAVE, NOMBRE, RFC, EMAILPRED, TELEFONO FROM CLIE01 WHERE STATUS='A'"  # Ejemplo: solo clientes activos
+        batch_size = options["batch_size"]
+        if batch_size < 1:
+            raise CommandError("--batch-size debe ser mayor que cero.")
+
+        incremental = options["incremental"]
+        if incremental and options["truncate"]:
+            raise CommandError("--truncate no se puede combinar con --incremental.")
+
+        self.sync_column = options["sync_column"].upper()
+        if not COLUMNA_VALIDA.match(self.sync_column):
+            raise CommandError(f"--sync-column inválida '{options['sync_column']}'.")
+        self.incremental = incremental
+        self.batch_size = batch_size
+
+        valores_empresas = options["empresas"] or [
+            valor for valor in FIREBIRD_EMPRESAS.split(",") if valor.strip()
+        ]
+        if valores_empresas:
+            empresas = [Empresa(*_parse_empresa(valor)) for valor in valores_empresas]
+        else:
+            empresas = [Empresa(EMPRESA_PREDETERMINADA, FIREBIRD_DB_PATH)]
+        if len({empresa.sufijo for empresa in empresas}) != len(empresas):
+            raise CommandError("Cada empresa debe tener un sufijo distinto.")
+        workers = max(1, min(options["workers"] or len(empresas), len(empresas)))
 
         try:
-            # Obtener datos de Firebird
-            firebird_clients = fetch_data_from_firebird(firebird_query)
+            # Los hilos solo leen de Firebird; todas las escrituras en Django se hacen
+            # en este hilo, en lotes que pueden mezclar filas de varias empresas.
+            pendientes = queue.Queue(maxsize=workers * 2)
+            stop = threading.Event()
+            created_count = 0
+            updated_count = 0
+            unchanged_count = 0
+            skipped_count = 0
+            batch_number = 0
+            truncated = False
+
+            # Con --truncate el borrado y todos los lotes van en una sola transacción:
+            # si la lectura falla o se interrumpe, no se pierde ningún cliente (ni sus
+            # licencias, que se eliminan en cascada).
+            importacion = transaction.atomic() if options["truncate"] else nullcontext()
+            with importacion, ThreadPoolExecutor(
+                max_workers=workers, thread_name_prefix="import_clients"
+            ) as executor:
+                for empresa in empresas:
+                    query, params = self._build_query(empresa, incremental)
+                    executor.submit(
+                        self._extract, empresa, query, params, pendientes, stop
+                    )
 
-            if not firebird_clients:
+                try:
+                    for batch in self._batches(pendientes, len(empresas)):
+                        # Si se usó la opción --truncate, eliminar todos los clientes
+                        # existentes, solo una vez que Firebird devolvió datos.
+                        if options["truncate"] and not truncated:
+                            self.stdout.write(
+                                self.style.WARNING(
+                                    "Eliminando todos los clientes existentes en Django (opción --truncate activa)..."
+                                )
+                            )
+                            Cliente.objects.all().delete()
+                            self.stdout.write(
+                                self.style.SUCCESS("Clientes existentes eliminados.")
+                            )
+                            truncated = True
+
+                        # Sin --truncate cada lote se confirma por separado para no
+                        # retener bloqueos durante toda la importación.
+                        with transaction.atomic():
+                            created, updated, unchanged, skipped = self._upsert_batch(
+                                batch
+                            )
+                            # En modo incremental las filas de cada empresa llegan
+                            # ordenadas por versión, así que su marca puede avanzar
+                            # con cada lote confirmado.
+                            if incremental:
+                                for empresa in empresas:
+                                    self._save_mark(empresa)
+
+                        batch_number += 1
+                        created_count += created
+                        updated_count += updated
+                        unchanged_count += unchanged
+                        skipped_count += skipped
+                        self.stdout.write(
+                            f"Lote {batch_number}: {created} creados, {updated} actualizados, {unchanged} sin cambios."
+                        )
+                finally:
+                    # Si el proceso se interrumpe, los hilos dejan de leer.
+                    stop.set()
+
+                # Una empresa sin filas (base vacía o ruta equivocada) no se puede
+                # distinguir de una falla: con --truncate sus clientes quedarían
+                # borrados sin volver a importarse, así que se deshace todo.
+                vacias = [str(empresa) for empresa in empresas if not empresa.filas]
+                if options["truncate"] and vacias:
+                    raise CommandError(
+                        f"No se leyeron clientes de {', '.join(vacias)}; no se aplica --truncate."
+                    )
+
+            for empresa in empresas:
+                self._save_mark(empresa)
+                self.stdout.write(f"{empresa}: {empresa.filas} clientes leídos.")
+
+            total = created_count + updated_count + unchanged_count
+            if total == 0 and not incremental:
                 self.stdout.write(
                     self.style.WARNING(
                         "No se encontraron clientes en la base de datos Firebird o hubo un error de conexión/consulta."
@@ -38,83 +233,306 @@ class Command(BaseCommand):
                 )
                 return
 
-            self.stdout.write(
-                f"Se encontraron {len(firebird_clients)} clientes en Firebird."
-            )
-
-            # Si se usó la opción --truncate, eliminar todos los clientes existentes
-            if options["truncate"]:
+            if incremental and total == 0:
                 self.stdout.write(
-                    self.style.WARNING(
-                        "Eliminando todos los clientes existentes en Django (opción --truncate activa)..."
+                    self.style.SUCCESS(
+                        "No hay clientes modificados en Firebird desde la última sincronización."
                     )
                 )
-                Cliente.objects.all().delete()
-                self.stdout.write(self.style.SUCCESS("Clientes existentes eliminados."))
-
-            # Usar una transacción para asegurar la atomicidad de la operación
-            with transaction.atomic():
-                created_count = 0
-                updated_count = 0
-
-                for client_data in firebird_clients:
-                    # Asume que 'CLAVE' es el campo único y clave primaria en Firebird y Django
-                    clave_cliente = client_data.get("CLAVE")
-
-                    if not clave_cliente:
-                        self.stderr.write(
-                            self.style.ERROR(
-                                f"Cliente sin CLAVE encontrado en Firebird, se omite: {client_data}"
-                            )
-                        )
-                        continue
-
-                    # --- INICIO DE LA SECCIÓN A MODIFICAR ---
-                    # Extracción y limpieza segura de datos
-                    # Usamos .get() con un valor por defecto para asegurar que siempre haya algo que evaluar.
-                    # Luego, aplicamos .strip() solo si es una cadena, si no, lo dejamos como está o None.
-                    nombre_raw = client_data.get("NOMBRE")
-                    rfc_raw = client_data.get("RFC")
-                    correo_electronico_raw = client_data.get("EMAILPRED")
-                    telefono_raw = client_data.get("TELEFONO")
-
-                    client_defaults = {
-                        "nombre": nombre_raw.strip()
-                        if isinstance(nombre_raw, str)
-                        else nombre_raw,
-                        "rfc": rfc_raw.strip() if isinstance(rfc_raw, str) else rfc_raw,
-                        "correo_electronico": correo_electronico_raw.strip()
-                        if isinstance(correo_electronico_raw, str)
-                        else correo_electronico_raw,
-                        "telefono": telefono_raw.strip()
-                        if isinstance(telefono_raw, str)
-                        else telefono_raw,
-                    }
-
-                    # Aseguramos que los valores que quedaron como None no intenten actualizar
-                    # un campo en Django si su valor en Firebird es realmente nulo y el campo Django no lo acepta.
-                    # O, si el campo Django es blank=True/null=True, se aceptará el None.
-                    client_defaults = {
-                        k: v for k, v in client_defaults.items() if v is not None
-                    }
-                    # --- FIN DE LA SECCIÓN A MODIFICAR ---
-
-                    # Django usa update_or_create para manejar esto de forma eficiente
-                    # La clave_cliente es la primary_key, así que solo se usa como lookup
-                    client, created = Cliente.objects.update_or_create(
-                        clave_cliente=clave_cliente, defaults=client_defaults
+            else:
+                self.stdout.write(f"Se procesaron {total} clientes de Firebird.")
+                self.stdout.write(
+                    self.style.SUCCESS(
+                        f"Importación completada: {created_count} clientes creados, {updated_count} clientes actualizados, {unchanged_count} sin cambios."
                     )
+                )
+            if skipped_count:
+                self.stdout.write(
+                    self.style.WARNING(
+                        f"{skipped_count} clientes omitidos porque su clave ya pertenece a otra empresa."
+                    )
+                )
 
-                    if created:
-                        created_count += 1
-                    else:
-                        updated_count += 1
+            if options["detect_removed"]:
+                self._mark_removed(empresas)
 
-            self.stdout.write(
-                self.style.SUCCESS(
-                    f"Importación completada: {created_count} clientes creados, {updated_count} clientes actualizados."
+            for empresa in empresas:
+                stats = get_pool(empresa.ruta).stats()
+                self.stdout.write(
+                    f"Pool Firebird {empresa.tabla}: {stats['hits']} conexiones reutilizadas, {stats['misses']} abiertas, "
+                    f"{stats['reconnects']} reconexiones, {stats['wait_time']:.2f}s de espera."
                 )
-            )
 
         except Exception as e:
             raise CommandError(f"Error durante la importación: {e}")
+
+    def _build_query(self, empresa, incremental):
+        """
+        Retorna (consulta, parámetros) para leer los clientes de una empresa.
+        """
+        # Define tu consulta SQL para obtener clientes de Aspel SAE
+        # AJUSTA ESTA CONSULTA a la estructura real de tu tabla de clientes en Firebird
+        # Asegúrate de que los nombres de las columnas ('CLAVE', 'NOMBRE', etc.) coincidan con las de tu DB Firebird
+        columnas = "CLAVE, NOMBRE, RFC, EMAILPRED, TELEFONO, STATUS"
+        if not incremental:
+            return (
+                f"SELECT {columnas} FROM {empresa.tabla} WHERE STATUS='A'",  # Solo clientes activos
+                None,
+            )
+        # La columna de sincronización solo se lee (y solo tiene que existir) en modo incremental
+        columnas = f"{columnas}, {self.sync_column}"
+        ultima_version = empresa.sincronizacion.ultima_version
+        if ultima_version:
+            self.stdout.write(
+                f"{empresa}: sincronización incremental desde {timezone.localtime(ultima_version):%d/%m/%Y %H:%M:%S}."
+            )
+            # '>=' en lugar de '>' para no perder filas con la misma marca que quedaron
+            # en el siguiente lote si una ejecución anterior se interrumpió.
+            return (
+                f"SELECT {columnas} FROM {empresa.tabla} WHERE {self.sync_column} >= ? ORDER BY {self.sync_column}",
+                [timezone.make_naive(ultima_version)],
+            )
+        self.stdout.write(
+            f"{empresa}: primera sincronización incremental, se leerán todos los clientes."
+        )
+        return (
+            f"SELECT {columnas} FROM {empresa.tabla} ORDER BY {self.sync_column}",
+            None,
+        )
+
+    def _extract(self, empresa, query, params, pendientes, stop):
+        """
+        Hilo lector: envía a la cola listas de (empresa, fila) y al final (empresa, None),
+        o (empresa, excepción) si la lectura falla.
+        """
+        try:
+            rows = iter_firebird_rows(
+                query, params, batch_size=self.batch_size, database=empresa.ruta
+            )
+            while not stop.is_set():
+                chunk = [(empresa, row) for row in islice(rows, self.batch_size)]
+                if not chunk:
+                    break
+                self._put(pendientes, chunk, stop)
+            rows.close()
+            self._put(pendientes, (empresa, None), stop)
+        except Exception as e:
+            self._put(pendientes, (empresa, e), stop)
+
+    def _put(self, pendientes, item, stop):
+        # put() con espera acotada para que el hilo termine si el proceso principal se detuvo.
+        while not stop.is_set():
+            try:
+                pendientes.put(item, timeout=1)
+                return
+            except queue.Full:
+                continue
+
+    def _batches(self, pendientes, total_empresas):
+        """
+        Reúne las filas que envían los hilos lectores en lotes de batch_size.
+        """
+        batch = []
+        terminadas = 0
+        while terminadas < total_empresas:
+            item = pendientes.get()
+            if isinstance(item, tuple):
+                empresa, resultado = item
+                if isinstance(resultado, Exception):
+                    raise CommandError(f"Error al leer {empresa}: {resultado}")
+                terminadas += 1
+                continue
+            batch.extend(item)
+            while len(batch) >= self.batch_size:
+                yield batch[: self.batch_size]
+                batch = batch[self.batch_size :]
+        if batch:
+            yield batch
+
+    def _build_cliente(self, empresa, client_data):
+        """
+        Convierte una fila de Firebird en una instancia (sin guardar) de Cliente,
+        o retorna None si la fila no se puede importar.
+        """
+        # Asume que 'CLAVE' es el campo único y clave primaria en Firebird y Django
+        clave_cliente = client_data.CLAVE
+
+        if not clave_cliente:
+            self.stderr.write(
+                self.style.ERROR(
+                    f"Cliente sin CLAVE encontrado en {empresa}, se omite: {client_data}"
+                )
+            )
+            return None
+
+        nombre = _clean(client_data.NOMBRE)
+        if not nombre:
+            self.stderr.write(
+                self.style.ERROR(
+                    f"Cliente {clave_cliente} sin NOMBRE en {empresa}, se omite: {client_data}"
+                )
+            )
+            return None
+
+        return Cliente(
+            clave_cliente=clave_cliente,
+            nombre=nombre,
+            rfc=_clean(client_data.RFC),
+            correo_electronico=_clean(client_data.EMAILPRED),
+            telefono=_clean(client_data.TELEFONO),
+            activo_en_sae=_clean(client_data.STATUS) == "A",
+            empresa_sae=empresa.sufijo,
+        )
+
+    def _upsert_batch(self, batch):
+        """
+        Inserta o actualiza un lote de filas (empresa, fila) de Firebird con un solo
+        INSERT ... ON CONFLICT (clave_cliente) DO UPDATE.
+        Solo se escriben los clientes nuevos, los que cambiaron en SAE y los que se
+        editaron en Django desde la última importación.
+        Retorna (creados, actualizados, sin cambios, omitidos por pertenecer a otra empresa).
+        """
+        # Si una clave se repite dentro del lote, PostgreSQL rechaza el ON CONFLICT;
+        # nos quedamos con la última aparición.
+        clientes = {}
+        omitidos = 0
+        for empresa, row in batch:
+            empresa.filas += 1
+            if self.incremental:
+                version = getattr(row, self.sync_column)
+                if version and (empresa.max_version is None or version > empresa.max_version):
+                    empresa.max_version = version
+            cliente = self._build_cliente(empresa, row)
+            if cliente is None:
+                continue
+            previo = clientes.get(cliente.clave_cliente)
+            if previo is not None and previo.empresa_sae != cliente.empresa_sae:
+                self._report_collision(cliente.clave_cliente, previo, cliente)
+                omitidos += 1
+                continue
+            clientes[cliente.clave_cliente] = cliente
+
+        # Los clientes del lote que ya existen en Django, con sus campos de SAE actuales
+        existentes = {
+            cliente.pk: cliente
+            for cliente in Cliente.objects.filter(pk__in=clientes.keys()).only(
+                "huella", *Cliente.CAMPOS_SAE
+            )
+        }
+
+        nuevos = []
+        modificados = []
+        sin_cambios = 0
+        for clave, cliente in clientes.items():
+            cliente.huella = cliente.calcular_huella()
+            if clave not in existentes:
+                # Un cliente dado de baja en SAE que nunca se importó no se crea en Django.
+                if cliente.activo_en_sae:
+                    nuevos.append(cliente)
+                continue
+
+            existente = existentes[clave]
+            # Los clientes importados antes de registrar la empresa pertenecen a la
+            # predeterminada; otra empresa no puede quedarse con ellos.
+            empresa_sae = existente.empresa_sae or EMPRESA_PREDETERMINADA
+            if empresa_sae != cliente.empresa_sae:
+                self._report_collision(clave, Cliente(empresa_sae=empresa_sae), cliente)
+                omitidos += 1
+            # Sin cambios solo si SAE no cambió y nadie editó el cliente en Django desde
+            # la última importación (su huella guardada sigue coincidiendo con sus valores).
+            elif cliente.huella == existente.huella == existente.calcular_huella():
+                sin_cambios += 1
+            else:
+                modificados.append(cliente)
+
+        if nuevos or modificados:
+            Cliente.objects.bulk_create(
+                nuevos + modificados,
+                update_conflicts=True,
+                unique_fields=["clave_cliente"],
+                update_fields=CAMPOS_ACTUALIZABLES,
+            )
+            # bulk_create no envía señales: se invalida la caché de estos clientes aquí
+            invalidate_clients(cliente.clave_cliente for cliente in nuevos + modificados)
+
+        return len(nuevos), len(modificados), sin_cambios, omitidos
+
+    def _report_collision(self, clave, conservado, omitido):
+        """
+        La misma clave existe en dos empresas: se conserva la primera que se importó.
+        """
+        self.stderr.write(
+            self.style.ERROR(
+                f"La clave {clave} ya pertenece a la empresa {conservado.empresa_sae}; se omite el cliente de la empresa {omitido.empresa_sae}."
+            )
+        )
+
+    def _save_mark(self, empresa):
+        """
+        Avanza la marca de agua de la sincronización de la empresa si su versión es más reciente.
+        """
+        version = empresa.max_version
+        if version is None:
+            return
+        if timezone.is_naive(version):
+            version = timezone.make_aware(version)
+        sincronizacion = empresa.sincronizacion
+        if sincronizacion.ultima_version is None or version > sincronizacion.ultima_version:
+            sincronizacion.ultima_version = version
+            sincronizacion.save(update_fields=["ultima_version", "ultima_ejecucion"])
+
+    def _mark_removed(self, empresas):
+        """
+        Marca como inactivos en SAE los clientes de Django de estas empresas cuya clave
+        ya no aparece entre los clientes activos de Firebird. Solo lee la columna CLAVE.
+        """
+
+        def claves_activas(empresa):
+            return {
+                row.CLAVE
+                for row in iter_firebird_rows(
+                    f"SELECT CLAVE FROM {empresa.tabla} WHERE STATUS='A'",
+                    batch_size=self.batch_size,
+                    database=empresa.ruta,
+                )
+            }
+
+        with ThreadPoolExecutor(max_workers=len(empresas)) as executor:
+            claves_por_empresa = dict(
+                zip(
+                    (empresa.sufijo for empresa in empresas),
+                    executor.map(claves_activas, empresas),
+                )
+            )
+
+        sin_datos = [sufijo for sufijo, claves in claves_por_empresa.items() if not claves]
+        if sin_datos:
+            # Sin datos no podemos distinguir "todos dados de baja" de un error de conexión.
+            self.stdout.write(
+                self.style.WARNING(
+                    f"No se obtuvieron claves activas de Firebird para las empresas {', '.join(sin_datos)}; no se marcaron bajas en ellas."
+                )
+            )
+
+        bajas = []
+        for clave, empresa_sae in (
+            Cliente.objects.filter(activo_en_sae=True)
+            .values_list("pk", "empresa_sae")
+            .iterator(chunk_size=self.batch_size)
+        ):
+            # Los clientes importados antes de registrar la empresa pertenecen a la predeterminada.
+            claves = claves_por_empresa.get(empresa_sae or EMPRESA_PREDETERMINADA)
+            if claves and clave not in claves:
+                bajas.append(clave)
+
+        for inicio in range(0, len(bajas), self.batch_size):
+            # Se limpia la huella para que, si el cliente reaparece en SAE, se reescriba.
+            lote = bajas[inicio : inicio + self.batch_size]
+            Cliente.objects.filter(pk__in=lote).update(activo_en_sae=False, huella="")
+            invalidate_clients(lote)
+
+        self.stdout.write(
+            self.style.WARNING(
+                f"{len(bajas)} clientes marcados como inactivos en SAE (dados de baja o eliminados)."
+            )
+        )
@@ -0,0 +1,319 @@
+# licensing_management/management/commands/import_licenses.py
+import csv
+from datetime import datetime
+from itertools import islice
+
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError, transaction
+
+from licensing_management.expiry import compute_vigencias
+from licensing_management.models import Cliente, Licencia, Sistema
+from licensing_management.signals import licencias_actualizadas
+
+COLUMNAS_REQUERIDAS = [
+    "clave_cliente",
+    "sistema",
+    "identificador_licencia",
+    "tipo_licencia",
+]
+
+# Campos que clean_fields() no revisa: cliente y tipo_sistema ya se resolvieron con
+# los diccionarios (validarlos con el ORM haría una consulta por fila).
+CAMPOS_SIN_VALIDAR = ["cliente", "tipo_sistema"]
+
+
+class Fila:
+    """
+    Una fila del CSV en proceso: número de línea, valores originales y la licencia
+    que se construye a partir de ellos. `error` marca la fila como rechazada.
+    """
+
+    def __init__(self, linea, valores):
+        self.linea = linea
+        self.valores = valores
+        self.licencia = None
+        self.error = None
+
+
+def _parse_fecha(valor):
+    """
+    Acepta AAAA-MM-DD o DD/MM/AAAA; retorna None si el valor está vacío.
+    """
+    if not valor:
+        return None
+    for formato in ("%Y-%m-%d", "%d/%m/%Y"):
+        try:
+            return datetime.strptime(valor, formato).date()
+        except ValueError:
+            continue
+    raise ValueError(f"fecha inválida '{valor}' (use AAAA-MM-DD o DD/MM/AAAA)")
+
+
+class Command(BaseCommand):
+    help = (
+        "Importa licencias desde un CSV (columnas: clave_cliente, sistema, "
+        "identificador_licencia, tipo_licencia y opcionalmente periodo_licencia, "
+        "fecha_inicio_vigencia, fecha_adquisicion, numero_usuarios, "
+        "version_software, version_sistema, observaciones). El estado se calcula con "
+        "las fechas, como al guardar una licencia; una columna estado se ignora. Las "
+        "filas con errores se escriben en un archivo de rechazos sin detener la importación."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("archivo", help="CSV de licencias (UTF-8, con encabezados).")
+        parser.add_argument(
+            "--rechazos",
+            help="CSV donde se escriben las filas rechazadas con su error "
+            "(por defecto <archivo>.rechazos.csv).",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=2000,
+            help="Filas validadas e insertadas por lote (por defecto 2000).",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Solo valida el archivo y genera los rechazos; no inserta nada.",
+        )
+
+    def handle(self, *args, **options):
+        archivo = options["archivo"]
+        ruta_rechazos = options["rechazos"] or f"{archivo}.rechazos.csv"
+        self.dry_run = options["dry_run"]
+
+        # Diccionarios de búsqueda precargados una sola vez para todo el archivo
+        self.sistemas = {
+            nombre.casefold(): pk
+            for pk, nombre in Sistema.objects.values_list("pk", "nombre")
+        }
+        self.clientes = set(Cliente.objects.order_by().values_list("pk", flat=True))
+        self.identificadores_vistos = set()
+        self.estados_ignorados = 0
+
+        verbo = "validadas (sin insertar, --dry-run)" if self.dry_run else "importadas"
+        importadas = rechazadas = 0
+        try:
+            entrada = open(archivo, encoding="utf-8-sig", newline="")
+        except OSError as e:
+            raise CommandError(f"No se pudo abrir {archivo}: {e}")
+
+        with entrada, open(ruta_rechazos, "w", encoding="utf-8", newline="") as salida:
+            lector = csv.DictReader(entrada)
+            encabezados = [c.strip() for c in lector.fieldnames or []]
+            faltantes = [c for c in COLUMNAS_REQUERIDAS if c not in encabezados]
+            if faltantes:
+                raise CommandError(f"Faltan columnas en el CSV: {', '.join(faltantes)}.")
+            lector.fieldnames = encabezados
+            if "estado" in encabezados:
+                self.stdout.write(
+                    self.style.WARNING(
+                        "Se ignora la columna estado: el estado de cada licencia se "
+                        "calcula con sus fechas, igual que al guardarla."
+                    )
+                )
+            rechazos = csv.writer(salida)
+            rechazos.writerow(["linea", *encabezados, "error"])
+
+            filas = (
+                # La línea 1 es el encabezado
+                Fila(linea, {c: (v or "").strip() for c, v in valores.items() if c})
+                for linea, valores in enumerate(lector, 2)
+            )
+            numero_lote = 0
+            while lote := list(islice(filas, options["batch_size"])):
+                numero_lote += 1
+                validas = self._validar(lote)
+                insertadas = self._insertar(validas)
+
+                errores = [fila for fila in lote if fila.error]
+                for fila in errores:
+                    rechazos.writerow(
+                        [fila.linea, *(fila.valores.get(c, "") for c in encabezados), fila.error]
+                    )
+                importadas += insertadas
+                rechazadas += len(errores)
+                self.stdout.write(
+                    f"Lote {numero_lote}: {insertadas} licencias {verbo}, {len(errores)} rechazadas."
+                )
+
+        self.stdout.write(self.style.SUCCESS(f"Importación completada: {importadas} licencias {verbo}."))
+        if self.estados_ignorados:
+            self.stdout.write(
+                self.style.WARNING(
+                    f"{self.estados_ignorados} filas traían un estado distinto al calculado; "
+                    "se usó el calculado."
+                )
+            )
+        if rechazadas:
+            self.stdout.write(
+                self.style.WARNING(f"{rechazadas} filas rechazadas; detalle en {ruta_rechazos}.")
+            )
+
+    def _validar(self, lote):
+        """
+        Valida el lote en pasadas sobre todas sus filas; cada pasada solo recibe las
+        filas que siguen siendo válidas. Retorna las licencias listas para insertar.
+        """
+        for paso in (
+            self._construir,
+            self._resolver_referencias,
+            self._descartar_duplicados,
+            self._aplicar_reglas,
+        ):
+            pendientes = [fila for fila in lote if not fila.error]
+            if not pendientes:
+                break
+            paso(pendientes)
+        return [fila for fila in lote if not fila.error]
+
+    def _construir(self, filas):
+        """
+        Tipos y valores por defecto de cada columna.
+        """
+        for fila in filas:
+            valores = fila.valores
+            try:
+                numero_usuarios = valores.get("numero_usuarios")
+                fechas = {
+                    campo: _parse_fecha(valores[campo])
+                    for campo in ("fecha_inicio_vigencia", "fecha_adquisicion")
+                    # Sin valor se deja el default del modelo, como en Licencia.objects.create()
+                    if valores.get(campo)
+                }
+                fila.licencia = Licencia(
+                    identificador_licencia=valores["identificador_licencia"],
+                    tipo_licencia=valores["tipo_licencia"].upper(),
+                    periodo_licencia=(valores.get("periodo_licencia") or "").upper() or None,
+                    numero_usuarios=int(numero_usuarios) if numero_usuarios else 1,
+                    version_software=valores.get("version_software") or None,
+                    version_sistema=valores.get("version_sistema") or None,
+                    observaciones=valores.get("observaciones") or None,
+                    **fechas,
+                )
+            except ValueError as e:
+                fila.error = str(e)
+
+    def _resolver_referencias(self, filas):
+        """
+        Cliente y sistema con los diccionarios precargados, sin consultas por fila.
+        """
+        for fila in filas:
+            clave = fila.valores["clave_cliente"]
+            # Las claves de SAE se guardan alineadas a la derecha a 10 caracteres
+            if clave not in self.clientes:
+                clave = clave.rjust(10)
+            sistema_id = self.sistemas.get(fila.valores["sistema"].casefold())
+            if clave not in self.clientes:
+                fila.error = f"No existe el cliente '{fila.valores['clave_cliente']}'."
+            elif sistema_id is None:
+                fila.error = f"No existe el sistema '{fila.valores['sistema']}'."
+            else:
+                fila.licencia.cliente_id = clave
+                fila.licencia.tipo_sistema_id = sistema_id
+
+    def _descartar_duplicados(self, filas):
+        """
+        Identificadores repetidos en el archivo o ya registrados (una consulta por lote).
+        """
+        identificadores = {fila.licencia.identificador_licencia for fila in filas}
+        existentes = set(
+            Licencia.objects.filter(identificador_licencia__in=identificadores)
+            .order_by()
+            .values_list("identificador_licencia", flat=True)
+        )
+        for fila in filas:
+            identificador = fila.licencia.identificador_licencia
+            if identificador in existentes:
+                fila.error = f"La licencia '{identificador}' ya está registrada."
+            elif identificador in self.identificadores_vistos:
+                fila.error = f"La licencia '{identificador}' está repetida en el archivo."
+            else:
+                self.identificadores_vistos.add(identificador)
+
+    def _aplicar_reglas(self, filas):
+        """
+        Las validaciones del modelo (opciones, longitudes, Licencia.clean()) fila por
+        fila; después, los estados de todo el lote en una sola pasada con el mismo
+        cálculo que save(). La fecha de fin la calcula PostgreSQL al insertar.
+        """
+        validas = []
+        for fila in filas:
+            licencia = fila.licencia
+            try:
+                licencia.clean_fields(exclude=CAMPOS_SIN_VALIDAR)
+                licencia.clean()
+            except ValidationError as e:
+                fila.error = "; ".join(
+                    f"{campo}: {' '.join(mensajes)}"
+                    for campo, mensajes in e.message_dict.items()
+                )
+                self.identificadores_vistos.discard(licencia.identificador_licencia)
+                continue
+            validas.append(fila)
+
+        _, estados = compute_vigencias(
+            [fila.licencia.fecha_inicio_vigencia for fila in validas],
+            [fila.licencia.periodo_licencia for fila in validas],
+        )
+        for fila, estado in zip(validas, estados):
+            fila.licencia.estado = estado
+            estado_csv = fila.valores.get("estado", "").upper()
+            if estado_csv and estado_csv != estado:
+                self.estados_ignorados += 1
+
+    def _insertar(self, filas):
+        """
+        Inserta las licencias válidas con bulk_create y avisa a los resúmenes y la
+        caché de los clientes afectados. Retorna cuántas se insertaron (con --dry-run,
+        cuántas se habrían insertado).
+        """
+        if self.dry_run or not filas:
+            return len(filas)
+
+        try:
+            self._guardar(filas)
+        except IntegrityError as e:
+            # Otro proceso pudo registrar alguno de los identificadores después de
+            # revisarlos: esas filas se rechazan y se informan, y el resto se guarda.
+            conflictos = self._registradas_durante_la_importacion(filas)
+            if not conflictos:
+                raise CommandError(
+                    f"La base de datos rechazó el lote de las líneas {filas[0].linea} a "
+                    f"{filas[-1].linea}: {e}"
+                )
+            for fila in conflictos:
+                self.stdout.write(self.style.WARNING(f"Línea {fila.linea}: {fila.error}"))
+            filas = [fila for fila in filas if not fila.error]
+            self._guardar(filas)
+        return len(filas)
+
+    def _guardar(self, filas):
+        with transaction.atomic():
+            Licencia.objects.bulk_create([fila.licencia for fila in filas])
+            licencias_actualizadas.send(
+                sender=Licencia,
+                cliente_ids={fila.licencia.cliente_id for fila in filas},
+            )
+
+    def _registradas_durante_la_importacion(self, filas):
+        """
+        Marca con error las filas cuyo identificador ya existe en la base de datos
+        (una consulta). Retorna esas filas.
+        """
+        por_identificador = {fila.licencia.identificador_licencia: fila for fila in filas}
+        registradas = (
+            Licencia.objects.filter(identificador_licencia__in=por_identificador)
+            .order_by()
+            .values_list("identificador_licencia", flat=True)
+        )
+        conflictos = []
+        for identificador in registradas:
+            fila = por_identificador[identificador]
+            fila.error = (
+                f"La licencia '{identificador}' la registró otro proceso durante la importación."
+            )
+            conflictos.append(fila)
+        return conflictos
@@ -0,0 +1,62 @@
+# licensing_management/management/commands/process_notification_outbox.py
+import smtplib
+
+from django.core.management.base import BaseCommand, CommandError
+
+from licensing_management.models import NotificacionLicencia
+from licensing_management.notifications import (
+    ReporteEnvioMixin,
+    INTENTOS_MAXIMOS,
+    add_sending_arguments,
+    process_outbox,
+)
+
+
+class Command(ReporteEnvioMixin, BaseCommand):
+    help = (
+        "Envía los avisos pendientes de la bandeja de salida de notificaciones. "
+        "Se pueden correr varios procesos a la vez: cada lote se reclama con SKIP LOCKED."
+    )
+
+    def add_arguments(self, parser):
+        add_sending_arguments(parser)
+        parser.add_argument(
+            "--tipo",
+            choices=[tipo for tipo, _ in NotificacionLicencia.TIPO_CHOICES],
+            help="Solo envía avisos de este tipo (por defecto, todos).",
+        )
+        parser.add_argument(
+            "--max-attempts",
+            type=int,
+            default=INTENTOS_MAXIMOS,
+            help=f"Ejecuciones fallidas antes de marcar un aviso como fallido (por defecto {INTENTOS_MAXIMOS}).",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            resultado = process_outbox(
+                tipo=options["tipo"],
+                batch_size=options["batch_size"],
+                pause=options["pause"],
+                digest=options["digest"],
+                max_retries=options["max_retries"],
+                concurrency=options["concurrency"],
+                max_attempts=options["max_attempts"],
+                on_result=self._report,
+                on_skip=self._skip,
+            )
+        except (smtplib.SMTPException, OSError) as e:
+            raise CommandError(f"No se pudo conectar al servidor de correo: {e}")
+
+        if not resultado.notificaciones:
+            self.stdout.write(
+                self.style.SUCCESS("No hay avisos pendientes en la bandeja de salida.")
+            )
+            return
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Bandeja de salida procesada: {resultado.enviadas} enviadas, "
+                f"{resultado.fallidas} con error, {resultado.throughput:.1f} mensajes/s."
+            )
+        )
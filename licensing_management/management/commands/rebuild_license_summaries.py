@@ -0,0 +1,42 @@
+# licensing_management/management/commands/rebuild_license_summaries.py
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from licensing_management.models import Cliente, ResumenLicenciasCliente
+
+
+class Command(BaseCommand):
+    help = (
+        "Reconstruye desde cero el resumen de licencias (activas, por renovar, "
+        "vencidas y próximo vencimiento) de todos los clientes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=2000,
+            help="Clientes recalculados por consulta (por defecto 2000).",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        claves = Cliente.objects.order_by("pk").values_list("pk", flat=True)
+
+        total = 0
+        lote = []
+        for clave in claves.iterator(chunk_size=batch_size):
+            lote.append(clave)
+            if len(lote) >= batch_size:
+                total += self._rebuild(lote)
+                lote = []
+        if lote:
+            total += self._rebuild(lote)
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Resúmenes de licencias reconstruidos para {total} clientes.")
+        )
+
+    def _rebuild(self, claves):
+        with transaction.atomic():
+            return ResumenLicenciasCliente.recalcular(claves)
@@ -0,0 +1,30 @@
+# licensing_management/management/commands/refresh_expiry_calendar.py
+import time
+
+from django.core.management.base import BaseCommand
+
+from licensing_management.models import CalendarioVencimientos
+
+
+class Command(BaseCommand):
+    help = (
+        "Recalcula la vista materializada del calendario de vencimientos "
+        "(próximos 12 meses por semana y por mes) que usa el tablero."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--no-concurrently",
+            action="store_true",
+            help="Recalcula bloqueando las lecturas (más rápido; útil fuera de horario).",
+        )
+
+    def handle(self, *args, **options):
+        inicio = time.monotonic()
+        CalendarioVencimientos.refrescar(concurrently=not options["no_concurrently"])
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Calendario de vencimientos actualizado en {time.monotonic() - inicio:.1f} s "
+                f"({CalendarioVencimientos.objects.count()} filas)."
+            )
+        )
@@ -0,0 +1,40 @@
+# licensing_management/management/commands/update_license_status.py
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from licensing_management.models import Licencia
+
+
+class Command(BaseCommand):
+    help = (
+        "Recalcula el estado (Activa, Pendiente de Renovación, Vencida, Inactiva) "
+        "de todas las licencias con actualizaciones masivas en la base de datos."
+    )
+
+    def handle(self, *args, **kwargs):
+        today = timezone.now().date()
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Recalculando estados de licencias con fecha de referencia {today.strftime('%d/%m/%Y')}..."
+            )
+        )
+
+        transiciones = Licencia.objects.update_estados(today=today)
+
+        if not transiciones:
+            self.stdout.write(
+                self.style.SUCCESS("Todas las licencias ya tenían el estado correcto.")
+            )
+            return
+
+        etiquetas = dict(Licencia.ESTADO_LICENCIA_CHOICES)
+        for (anterior, nuevo), total in sorted(transiciones.items()):
+            self.stdout.write(
+                f"  {etiquetas.get(anterior, anterior)} -> {etiquetas.get(nuevo, nuevo)}: {total}"
+            )
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Recálculo completado: {sum(transiciones.values())} licencias cambiaron de estado."
+            )
+        )
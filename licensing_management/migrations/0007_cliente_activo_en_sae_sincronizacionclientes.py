@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('licensing_management', '0006_alter_licencia_tipo_licencia'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SincronizacionClientes',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('origen', models.CharField(help_text='Base de datos y tabla de Firebird sincronizadas (ej. /ruta/SAEDAT01.FDB:CLIE01)', max_length=255, unique=True)),
+                ('ultima_version', models.DateTimeField(blank=True, help_text='Mayor VERSION_SINC importada; la siguiente ejecución parte de aquí', null=True)),
+                ('ultima_ejecucion', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Sincronización de Clientes',
+                'verbose_name_plural': 'Sincronizaciones de Clientes',
+            },
+        ),
+        migrations.AddField(
+            model_name='cliente',
+            name='activo_en_sae',
+            field=models.BooleanField(default=True, help_text='Falso si el cliente se dio de baja o ya no existe en Aspel SAE', verbose_name='Activo en SAE'),
+        ),
+    ]
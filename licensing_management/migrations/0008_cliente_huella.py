@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('licensing_management', '0007_cliente_activo_en_sae_sincronizacionclientes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cliente',
+            name='huella',
+            field=models.CharField(blank=True, editable=False, help_text='Huella de los datos importados de SAE; si no cambia, la importación no reescribe el registro', max_length=32),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('licensing_management', '0008_cliente_huella'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cliente',
+            name='empresa_sae',
+            field=models.CharField(blank=True, help_text='Sufijo de la empresa de Aspel SAE de la que se importó el cliente (ej. 01)', max_length=10, verbose_name='Empresa SAE'),
+        ),
+    ]
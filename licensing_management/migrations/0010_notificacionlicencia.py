@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:29
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('licensing_management', '0009_cliente_empresa_sae'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NotificacionLicencia',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(choices=[('VENCIDA', 'Licencia Vencida'), ('POR_VENCER', 'Licencia por Vencer')], max_length=20)),
+                ('fecha_fin_vigencia', models.DateField(help_text='Fecha de fin de vigencia de la licencia al encolar el aviso')),
+                ('estado', models.CharField(choices=[('PENDIENTE', 'Pendiente'), ('ENVIADA', 'Enviada'), ('FALLIDA', 'Fallida'), ('CANCELADA', 'Cancelada')], default='PENDIENTE', max_length=20)),
+                ('intentos', models.PositiveIntegerField(default=0)),
+                ('ultimo_error', models.TextField(blank=True)),
+                ('siguiente_intento', models.DateTimeField(default=django.utils.timezone.now, help_text='Los avisos pendientes no se toman antes de esta fecha (espera entre intentos)')),
+                ('fecha_creacion', models.DateTimeField(auto_now_add=True)),
+                ('fecha_envio', models.DateTimeField(blank=True, null=True)),
+                ('licencia', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='notificaciones', to='licensing_management.licencia')),
+            ],
+            options={
+                'verbose_name': 'Notificación de Licencia',
+                'verbose_name_plural': 'Notificaciones de Licencias',
+                'ordering': ['-fecha_creacion'],
+                'indexes': [models.Index(condition=models.Q(('estado', 'PENDIENTE')), fields=['siguiente_intento'], name='notificacion_pendiente_idx')],
+                'constraints': [models.UniqueConstraint(fields=('licencia', 'tipo', 'fecha_fin_vigencia'), name='notificacion_unica_por_vencimiento')],
+            },
+        ),
+    ]
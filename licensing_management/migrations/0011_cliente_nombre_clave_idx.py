@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('licensing_management', '0010_notificacionlicencia'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='cliente',
+            index=models.Index(fields=['nombre', 'clave_cliente'], name='cliente_nombre_clave_idx'),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('licensing_management', '0012_cliente_trigram_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='licencia',
+            index=models.Index(fields=['fecha_fin_vigencia', 'cliente'], name='licencia_fin_cliente_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='licencia',
+            index=models.Index(condition=models.Q(('tipo_licencia', 'SUSCRIPCION')), fields=['estado', 'fecha_fin_vigencia'], name='licencia_susc_estado_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='licencia',
+            index=models.Index(condition=models.Q(('tipo_licencia', 'SUSCRIPCION')), fields=['cliente', 'fecha_fin_vigencia'], name='licencia_susc_cliente_idx'),
+        ),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('licensing_management', '0013_licencia_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumenLicenciasCliente',
+            fields=[
+                ('cliente', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='resumen_licencias', serialize=False, to='licensing_management.cliente')),
+                ('activas', models.PositiveIntegerField(default=0)),
+                ('pendientes', models.PositiveIntegerField(default=0)),
+                ('vencidas', models.PositiveIntegerField(default=0)),
+                ('inactivas', models.PositiveIntegerField(default=0)),
+                ('tiene_suscripcion_vencida', models.BooleanField(default=False)),
+                ('proxima_fecha_fin', models.DateField(blank=True, help_text='Fecha de fin más cercana entre las licencias activas o por renovar', null=True)),
+                ('fecha_actualizacion', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Resumen de Licencias del Cliente',
+                'verbose_name_plural': 'Resúmenes de Licencias de Clientes',
+            },
+        ),
+        # Resúmenes iniciales de los clientes existentes
+        migrations.RunSQL(
+            """
+            INSERT INTO licensing_management_resumenlicenciascliente (
+                cliente_id, activas, pendientes, vencidas, inactivas,
+                tiene_suscripcion_vencida, proxima_fecha_fin, fecha_actualizacion
+            )
+            SELECT
+                c.clave_cliente,
+                COUNT(l.id) FILTER (WHERE l.estado = 'ACTIVA'),
+                COUNT(l.id) FILTER (WHERE l.estado = 'PENDIENTE_RENOVACION'),
+                COUNT(l.id) FILTER (WHERE l.estado = 'VENCIDA'),
+                COUNT(l.id) FILTER (WHERE l.estado = 'INACTIVA'),
+                COUNT(l.id) FILTER (
+                    WHERE l.estado = 'VENCIDA' AND l.tipo_licencia = 'SUSCRIPCION'
+                ) > 0,
+                MIN(l.fecha_fin_vigencia) FILTER (
+                    WHERE l.estado IN ('ACTIVA', 'PENDIENTE_RENOVACION')
+                ),
+                NOW()
+            FROM licensing_management_cliente c
+            LEFT JOIN licensing_management_licencia l ON l.cliente_id = c.clave_cliente
+            GROUP BY c.clave_cliente
+            """,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
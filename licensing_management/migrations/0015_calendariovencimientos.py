@@ -0,0 +1,76 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('licensing_management', '0014_resumenlicenciascliente'),
+    ]
+
+    operations = [
+        # Vista materializada: una fila por (granularidad, periodo, categoría, tipo de
+        # licencia) con los vencimientos desde hoy hasta dentro de 12 meses.
+        # CURRENT_DATE se evalúa en cada REFRESH.
+        migrations.RunSQL(
+            """
+            CREATE MATERIALIZED VIEW licensing_management_calendariovencimientos AS
+            WITH proximas AS (
+                SELECT l.fecha_fin_vigencia, l.tipo_licencia, l.cliente_id, s.categoria
+                FROM licensing_management_licencia l
+                JOIN licensing_management_sistema s ON s.id = l.tipo_sistema_id
+                WHERE l.estado <> 'INACTIVA'
+                  AND l.fecha_fin_vigencia >= CURRENT_DATE
+                  AND l.fecha_fin_vigencia < CURRENT_DATE + INTERVAL '12 months'
+            ),
+            periodos AS (
+                SELECT 'SEMANA' AS granularidad,
+                       date_trunc('week', fecha_fin_vigencia)::date AS periodo,
+                       categoria, tipo_licencia, cliente_id
+                FROM proximas
+                UNION ALL
+                SELECT 'MES', date_trunc('month', fecha_fin_vigencia)::date,
+                       categoria, tipo_licencia, cliente_id
+                FROM proximas
+            )
+            SELECT
+                granularidad || ':' || periodo::text || ':' || categoria || ':' || tipo_licencia AS id,
+                granularidad,
+                periodo,
+                categoria,
+                tipo_licencia,
+                COUNT(*)::integer AS licencias,
+                COUNT(DISTINCT cliente_id)::integer AS clientes,
+                NOW() AS fecha_calculo
+            FROM periodos
+            GROUP BY granularidad, periodo, categoria, tipo_licencia
+            WITH DATA;
+
+            CREATE UNIQUE INDEX calendario_vencimientos_id_idx
+                ON licensing_management_calendariovencimientos (id);
+            CREATE INDEX calendario_vencimientos_periodo_idx
+                ON licensing_management_calendariovencimientos (granularidad, periodo);
+            """,
+            reverse_sql="DROP MATERIALIZED VIEW IF EXISTS licensing_management_calendariovencimientos",
+        ),
+        migrations.CreateModel(
+            name='CalendarioVencimientos',
+            fields=[
+                ('id', models.TextField(primary_key=True, serialize=False)),
+                ('granularidad', models.CharField(choices=[('SEMANA', 'Semana'), ('MES', 'Mes')], max_length=10)),
+                ('periodo', models.DateField(help_text='Lunes de la semana o primer día del mes')),
+                ('categoria', models.CharField(choices=[('ASPEL', 'Aspel'), ('MICROSOFT_OFFICE_365', 'Microsoft Office 365'), ('ANTIVIRUS', 'Antivirus'), ('OTROS', 'Otros')], max_length=50)),
+                ('tipo_licencia', models.CharField(choices=[('FISICA', 'Física'), ('ELECTRONICA', 'Electrónica'), ('SUSCRIPCION', 'Suscripción')], max_length=20)),
+                ('licencias', models.IntegerField()),
+                ('clientes', models.IntegerField()),
+                ('fecha_calculo', models.DateTimeField()),
+            ],
+            options={
+                'verbose_name': 'Calendario de Vencimientos',
+                'verbose_name_plural': 'Calendario de Vencimientos',
+                'db_table': 'licensing_management_calendariovencimientos',
+                'managed': False,
+            },
+        ),
+    ]
@@ -0,0 +1,93 @@
+# Generated by Django 5.2.18 on 2026-10-17 04:09
+
+from importlib import import_module
+
+import django.db.models.expressions
+import django.db.models.functions.comparison
+from django.db import migrations, models
+
+# La vista del calendario depende de fecha_fin_vigencia: se elimina antes de cambiar
+# la columna y se vuelve a crear después con la misma sentencia de 0015.
+CALENDARIO = import_module(
+    "licensing_management.migrations.0015_calendariovencimientos"
+).Migration.operations[0]
+
+
+def _fin(meses):
+    return django.db.models.functions.comparison.Cast(
+        django.db.models.expressions.CombinedExpression(
+            models.F('fecha_inicio_vigencia'),
+            '+',
+            django.db.models.functions.comparison.Cast(models.Value(f'{meses} months'), models.DurationField()),
+        ),
+        models.DateField(),
+    )
+
+
+class Migration(migrations.Migration):
+    """
+    fecha_fin_vigencia pasa a ser una columna generada por PostgreSQL. Django no puede
+    convertir una columna normal en generada, así que se elimina y se vuelve a crear;
+    antes se quitan la vista del calendario y los índices que dependen de ella, y al
+    final se crean de nuevo. Los valores se recalculan a partir de la fecha de inicio
+    y el periodo de cada licencia.
+    """
+
+    dependencies = [
+        ('licensing_management', '0015_calendariovencimientos'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            CALENDARIO.reverse_sql,
+            reverse_sql=CALENDARIO.sql,
+        ),
+        migrations.RemoveIndex(
+            model_name='licencia',
+            name='licencia_fin_cliente_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='licencia',
+            name='licencia_susc_estado_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='licencia',
+            name='licencia_susc_cliente_idx',
+        ),
+        migrations.RemoveField(
+            model_name='licencia',
+            name='fecha_fin_vigencia',
+        ),
+        migrations.AddField(
+            model_name='licencia',
+            name='fecha_fin_vigencia',
+            field=models.GeneratedField(
+                db_persist=True,
+                expression=models.Case(
+                    models.When(periodo_licencia='MENSUAL', then=_fin(1)),
+                    models.When(periodo_licencia='TRIMESTRAL', then=_fin(3)),
+                    models.When(periodo_licencia='SEMESTRAL', then=_fin(6)),
+                    models.When(periodo_licencia='ANUAL', then=_fin(12)),
+                    default=None,
+                    output_field=models.DateField(),
+                ),
+                output_field=models.DateField(blank=True, help_text='Fecha de vencimiento de la licencia (si aplica)', null=True),
+            ),
+        ),
+        migrations.AddIndex(
+            model_name='licencia',
+            index=models.Index(fields=['fecha_fin_vigencia', 'cliente'], name='licencia_fin_cliente_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='licencia',
+            index=models.Index(condition=models.Q(('tipo_licencia', 'SUSCRIPCION')), fields=['estado', 'fecha_fin_vigencia'], name='licencia_susc_estado_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='licencia',
+            index=models.Index(condition=models.Q(('tipo_licencia', 'SUSCRIPCION')), fields=['cliente', 'fecha_fin_vigencia'], name='licencia_susc_cliente_idx'),
+        ),
+        migrations.RunSQL(
+            CALENDARIO.sql,
+            reverse_sql=CALENDARIO.reverse_sql,
+        ),
+    ]
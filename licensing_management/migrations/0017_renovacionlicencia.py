@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-17 04:13
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('licensing_management', '0016_licencia_fecha_fin_vigencia_generada'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RenovacionLicencia',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha_inicio_anterior', models.DateField()),
+                ('fecha_fin_anterior', models.DateField(blank=True, null=True)),
+                ('fecha_inicio_vigencia', models.DateField()),
+                ('fecha_fin_vigencia', models.DateField(blank=True, null=True)),
+                ('fecha_renovacion', models.DateTimeField(auto_now_add=True)),
+                ('licencia', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='renovaciones', to='licensing_management.licencia')),
+                ('usuario', models.ForeignKey(blank=True, help_text='Usuario que hizo la renovación (vacío si no había sesión iniciada)', null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Renovación de Licencia',
+                'verbose_name_plural': 'Renovaciones de Licencias',
+                'ordering': ['-fecha_renovacion'],
+            },
+        ),
+    ]
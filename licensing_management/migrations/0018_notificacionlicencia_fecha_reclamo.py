@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-17 04:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('licensing_management', '0017_renovacionlicencia'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notificacionlicencia',
+            name='fecha_reclamo',
+            field=models.DateTimeField(blank=True, help_text='Cuándo lo reclamó el último proceso que intentó enviarlo', null=True),
+        ),
+        migrations.AlterField(
+            model_name='notificacionlicencia',
+            name='estado',
+            field=models.CharField(choices=[('PENDIENTE', 'Pendiente'), ('ENVIANDO', 'Enviando'), ('ENVIADA', 'Enviada'), ('FALLIDA', 'Fallida'), ('CANCELADA', 'Cancelada')], default='PENDIENTE', max_length=20),
+        ),
+    ]
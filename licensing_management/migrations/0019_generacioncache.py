@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-17 04:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('licensing_management', '0018_notificacionlicencia_fecha_reclamo'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GeneracionCache',
+            fields=[
+                ('nombre', models.CharField(max_length=50, primary_key=True, serialize=False)),
+                ('valor', models.BigIntegerField()),
+            ],
+            options={
+                'verbose_name': 'Generación de Caché',
+                'verbose_name_plural': 'Generaciones de Caché',
+            },
+        ),
+    ]
@@ -1,10 +1,18 @@
+import hashlib
 from datetime import timedelta
 
-from dateutil.relativedelta import relativedelta
+from django.conf import settings
+from django.contrib.postgres.indexes import GinIndex, OpClass
 from django.core.exceptions import ValidationError
-from django.db import models
+from django.db import connection, models, transaction
+from django.db.models import Case, Count, F, Q, Value, When
+from django.db.models.functions import Cast, Upper
 from django.utils import timezone
 
+from .caching import invalidate_all_clients
+from .expiry import compute_end_dates, compute_estados, compute_vigencias, to_dates
+from .signals import licencias_actualizadas
+
 
 class Cliente(models.Model):
     clave_cliente = models.CharField(
@@ -18,14 +26,127 @@ class Cliente(models.Model):
     correo_electronico = models.EmailField(blank=True, null=True)
     telefono = models.CharField(max_length=50, blank=True, null=True)
     fecha_registro = models.DateTimeField(auto_now_add=True)
+    activo_en_sae = models.BooleanField(
+        default=True,
+        verbose_name="Activo en SAE",
+        help_text="Falso si el cliente se dio de baja o ya no existe en Aspel SAE",
+    )
+    empresa_sae = models.CharField(
+        max_length=10,
+        blank=True,
+        verbose_name="Empresa SAE",
+        help_text="Sufijo de la empresa de Aspel SAE de la que se importó el cliente (ej. 01)",
+    )
+    huella = models.CharField(
+        max_length=32,
+        blank=True,
+        editable=False,
+        help_text="Huella de los datos importados de SAE; si no cambia, la importación no reescribe el registro",
+    )
+
+    # Campos que provienen de Aspel SAE y forman parte de la huella
+    CAMPOS_SAE = [
+        "nombre",
+        "rfc",
+        "correo_electronico",
+        "telefono",
+        "activo_en_sae",
+        "empresa_sae",
+    ]
 
     def __str__(self):
         return f"{self.nombre} ({self.clave_cliente})"
 
+    def calcular_huella(self):
+        """
+        Calcula una huella compacta (blake2b de 128 bits, en hex) de los campos importados de SAE.
+        """
+        valores = "\x1f".join(
+            "\x00" if valor is None else str(valor)
+            for valor in (getattr(self, campo) for campo in self.CAMPOS_SAE)
+        )
+        return hashlib.blake2b(valores.encode("utf-8"), digest_size=16).hexdigest()
+
     class Meta:
         verbose_name = "Cliente"
         verbose_name_plural = "Clientes"
         ordering = ["nombre"]
+        indexes = [
+            # Orden y paginación por llave de la lista de clientes
+            models.Index(fields=["nombre", "clave_cliente"], name="cliente_nombre_clave_idx"),
+            # Trigramas (pg_trgm) sobre UPPER(col): atienden icontains, que PostgreSQL
+            # ejecuta como UPPER(col) LIKE UPPER('%x%'), y la búsqueda por similitud.
+            GinIndex(
+                OpClass(Upper("nombre"), name="gin_trgm_ops"),
+                name="cliente_nombre_trgm_idx",
+            ),
+            GinIndex(
+                OpClass(Upper("rfc"), name="gin_trgm_ops"),
+                name="cliente_rfc_trgm_idx",
+            ),
+        ]
+
+
+class SincronizacionClientes(models.Model):
+    """
+    Marca de agua de la importación incremental de clientes desde una tabla de
+    Aspel SAE: la versión de sincronización (VERSION_SINC) más alta ya importada.
+    """
+
+    origen = models.CharField(
+        max_length=255,
+        unique=True,
+        help_text="Base de datos y tabla de Firebird sincronizadas (ej. /ruta/SAEDAT01.FDB:CLIE01)",
+    )
+    ultima_version = models.DateTimeField(
+        blank=True,
+        null=True,
+        help_text="Mayor VERSION_SINC importada; la siguiente ejecución parte de aquí",
+    )
+    ultima_ejecucion = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.origen} ({self.ultima_version})"
+
+    class Meta:
+        verbose_name = "Sincronización de Clientes"
+        verbose_name_plural = "Sincronizaciones de Clientes"
+
+
+class GeneracionCache(models.Model):
+    """
+    Contador de generación de un grupo de fragmentos en caché (ver caching.py). Vive
+    en la base de datos porque allí se incrementa de forma atómica: el incr() de la
+    caché de archivos lee y reescribe el valor, y dos procesos pueden pisarse.
+    """
+
+    nombre = models.CharField(max_length=50, primary_key=True)
+    valor = models.BigIntegerField()
+
+    def __str__(self):
+        return f"{self.nombre}: {self.valor}"
+
+    @classmethod
+    def avanzar(cls, nombre, inicial):
+        """
+        Incrementa el contador en un solo UPDATE atómico (o lo crea con `inicial`) y
+        retorna el valor nuevo.
+        """
+        qn = connection.ops.quote_name
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                INSERT INTO {qn(cls._meta.db_table)} AS g (nombre, valor) VALUES (%s, %s)
+                ON CONFLICT (nombre) DO UPDATE SET valor = g.valor + 1
+                RETURNING valor
+                """,
+                [nombre, inicial],
+            )
+            return cursor.fetchone()[0]
+
+    class Meta:
+        verbose_name = "Generación de Caché"
+        verbose_name_plural = "Generaciones de Caché"
 
 
 # Modelo modificado de TipoSistemaAspel a SistemaAspel
@@ -60,6 +181,168 @@ class Sistema(models.Model):  # <--- Nombre de clase cambiado aquí
         verbose_name_plural = "Sistemas"  # <--- verbose_name_plural cambiado aquí
 
 
+class LicenciaQuerySet(models.QuerySet):
+    # Días de anticipación con los que una licencia pasa a PENDIENTE_RENOVACION
+    DIAS_AVISO_RENOVACION = 7
+    # Tabla temporal de update_estados() con los clientes cuyas licencias cambiaron
+    TABLA_TRANSICIONES = "licencias_clientes_con_transicion"
+
+    @classmethod
+    def estado_conditions(cls, today):
+        """
+        Devuelve una lista de (estado, Q) con la misma lógica que Licencia.update_estado(),
+        expresada como condiciones SQL mutuamente excluyentes.
+        """
+        perpetua = Q(periodo_licencia=Licencia.PERIODO_PERPETUA)
+        limite_aviso = today + timedelta(days=cls.DIAS_AVISO_RENOVACION)
+        return [
+            (Licencia.ESTADO_VENCIDA, ~perpetua & Q(fecha_fin_vigencia__lt=today)),
+            (
+                Licencia.ESTADO_PENDIENTE_RENOVACION,
+                ~perpetua
+                & Q(fecha_fin_vigencia__gte=today, fecha_fin_vigencia__lte=limite_aviso),
+            ),
+            (
+                Licencia.ESTADO_INACTIVA,
+                ~perpetua
+                & Q(fecha_fin_vigencia__isnull=True, fecha_inicio_vigencia__isnull=True),
+            ),
+            (
+                Licencia.ESTADO_ACTIVA,
+                perpetua
+                | Q(fecha_fin_vigencia__gt=limite_aviso)
+                | Q(fecha_fin_vigencia__isnull=True, fecha_inicio_vigencia__isnull=False),
+            ),
+        ]
+
+    @classmethod
+    def estado_expression(cls, today):
+        """
+        Expresión Case equivalente a update_estado(), útil para anotar o actualizar en SQL.
+        """
+        return Case(
+            *[
+                When(condicion, then=Value(estado))
+                for estado, condicion in cls.estado_conditions(today)
+            ],
+            default=Value(Licencia.ESTADO_ACTIVA),
+            output_field=models.CharField(),
+        )
+
+    def update_estados(self, today=None):
+        """
+        Recalcula el estado de todas las licencias del queryset con un UPDATE por estado
+        destino, sin cargar instancias en memoria. Los clientes con alguna licencia que
+        cambió de estado se guardan en una tabla temporal, y sus resúmenes se recalculan
+        en SQL a partir de ella; ningún paso carga en Python las licencias ni los
+        clientes, así que el costo no depende de cuántos cambien.
+
+        Las licencias INACTIVA se dejan como están: las dio de baja alguien y el paso
+        del tiempo no las reactiva.
+
+        Retorna un diccionario {(estado_anterior, estado_nuevo): cantidad} con las
+        licencias que cambiaron de estado.
+        """
+        if today is None:
+            today = timezone.now().date()
+
+        licencias = self.exclude(estado=Licencia.ESTADO_INACTIVA)
+        with transaction.atomic():
+            cambiadas = licencias.annotate(
+                nuevo_estado=self.estado_expression(today)
+            ).exclude(estado=F("nuevo_estado"))
+            # Conteo de transiciones antes de actualizar (una sola consulta agregada)
+            transiciones = (
+                cambiadas.values_list("estado", "nuevo_estado")
+                .annotate(total=Count("pk"))
+                .order_by()
+            )
+            resultado = {
+                (anterior, nuevo): total for anterior, nuevo, total in transiciones
+            }
+            if not resultado:
+                return resultado
+
+            sql, params = (
+                cambiadas.values("cliente_id").distinct().order_by().query.sql_with_params()
+            )
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f"CREATE TEMPORARY TABLE {self.TABLA_TRANSICIONES} ON COMMIT DROP AS {sql}",
+                    params,
+                )
+
+            for estado, condicion in self.estado_conditions(today):
+                licencias.filter(condicion).exclude(estado=estado).update(estado=estado)
+
+            ResumenLicenciasCliente.recalcular_desde(
+                f"SELECT cliente_id FROM {self.TABLA_TRANSICIONES}"
+            )
+            # Puede ser cualquier número de clientes: se descarta la caché de todos en
+            # lugar de listar sus llaves.
+            invalidate_all_clients()
+            with connection.cursor() as cursor:
+                # ON COMMIT DROP no alcanza si la transacción exterior sigue abierta
+                cursor.execute(f"DROP TABLE {self.TABLA_TRANSICIONES}")
+
+        return resultado
+
+    def renew(self, fecha_inicio, usuario=None):
+        """
+        Renueva todas las licencias del queryset a partir de `fecha_inicio`: un solo
+        UPDATE con la nueva fecha de inicio y el estado correspondiente (la fecha de
+        fin la recalcula PostgreSQL) y un solo INSERT con el historial en
+        RenovacionLicencia. El número de consultas no depende de cuántas licencias
+        se renueven. Las perpetuas no se renuevan.
+
+        Retorna cuántas licencias se renovaron.
+        """
+        with transaction.atomic():
+            anteriores = list(
+                self.exclude(periodo_licencia=Licencia.PERIODO_PERPETUA)
+                .select_for_update()
+                .order_by()
+                .values_list(
+                    "pk", "cliente_id", "periodo_licencia", "fecha_inicio_vigencia", "fecha_fin_vigencia"
+                )
+            )
+            if not anteriores:
+                return 0
+
+            # Con la misma fecha de inicio, la fecha de fin y el estado solo dependen del periodo
+            periodos = list({periodo for _, _, periodo, _, _ in anteriores})
+            fechas_fin, estados = compute_vigencias([fecha_inicio] * len(periodos), periodos)
+            fin_por_periodo = dict(zip(periodos, to_dates(fechas_fin)))
+
+            Licencia.objects.filter(pk__in=[pk for pk, *_ in anteriores]).update(
+                fecha_inicio_vigencia=fecha_inicio,
+                estado=Case(
+                    *[
+                        When(periodo_licencia=periodo, then=Value(estado))
+                        for periodo, estado in zip(periodos, estados)
+                    ],
+                    output_field=models.CharField(),
+                ),
+            )
+            RenovacionLicencia.objects.bulk_create(
+                RenovacionLicencia(
+                    licencia_id=pk,
+                    usuario=usuario,
+                    fecha_inicio_anterior=inicio_anterior,
+                    fecha_fin_anterior=fin_anterior,
+                    fecha_inicio_vigencia=fecha_inicio,
+                    fecha_fin_vigencia=fin_por_periodo[periodo],
+                )
+                for pk, _, periodo, inicio_anterior, fin_anterior in anteriores
+            )
+            licencias_actualizadas.send(
+                sender=Licencia,
+                cliente_ids={cliente_id for _, cliente_id, *_ in anteriores},
+            )
+
+        return len(anteriores)
+
+
 class Licencia(models.Model):
     # --- DEFINICIÓN DE CONSTANTES DE CLASE ---
 
@@ -81,6 +364,14 @@ class Licencia(models.Model):
     PERIODO_ANUAL = "ANUAL"
     PERIODO_PERPETUA = "PERPETUA"  # La constante para el periodo perpetuo
 
+    # Meses que dura cada periodo; los demás (perpetua o sin periodo) no tienen fecha de fin
+    MESES_POR_PERIODO = {
+        PERIODO_MENSUAL: 1,
+        PERIODO_TRIMESTRAL: 3,
+        PERIODO_SEMESTRAL: 6,
+        PERIODO_ANUAL: 12,
+    }
+
     # --- DEFINICIÓN DE CHOICES USANDO LAS CONSTANTES ---
 
     ESTADO_LICENCIA_CHOICES = [
@@ -129,10 +420,32 @@ class Licencia(models.Model):
 
     fecha_adquisicion = models.DateField(blank=True, null=True)
     fecha_inicio_vigencia = models.DateField(default=timezone.now)
-    fecha_fin_vigencia = models.DateField(
-        blank=True,
-        null=True,
-        help_text="Fecha de vencimiento de la licencia (si aplica)",
+    # La calcula PostgreSQL a partir de la fecha de inicio y el periodo, así que
+    # update(), bulk_create() y el SQL directo la dejan siempre correcta. La suma de
+    # meses de PostgreSQL usa el último día del mes si el día no existe, igual que
+    # expiry.compute_end_dates().
+    fecha_fin_vigencia = models.GeneratedField(
+        expression=Case(
+            *[
+                When(
+                    periodo_licencia=periodo,
+                    then=Cast(
+                        F("fecha_inicio_vigencia")
+                        + Cast(Value(f"{meses} months"), models.DurationField()),
+                        models.DateField(),
+                    ),
+                )
+                for periodo, meses in MESES_POR_PERIODO.items()
+            ],
+            default=None,
+            output_field=models.DateField(),
+        ),
+        output_field=models.DateField(
+            blank=True,
+            null=True,
+            help_text="Fecha de vencimiento de la licencia (si aplica)",
+        ),
+        db_persist=True,
     )
 
     estado = models.CharField(
@@ -159,34 +472,25 @@ class Licencia(models.Model):
         default=1, help_text="Número de usuarios permitidos por la licencia"
     )
 
+    objects = LicenciaQuerySet.as_manager()
+
     def __str__(self):
         # Actualiza esto también para reflejar el nuevo nombre del modelo
         return f"{self.tipo_sistema.nombre} - {self.identificador_licencia} para {self.cliente.nombre}"
 
+    def _fecha_inicio(self):
+        # Como la guardaría el ORM: el default timezone.now deja un datetime
+        return self._meta.get_field("fecha_inicio_vigencia").to_python(
+            self.fecha_inicio_vigencia
+        )
+
     def _calculate_end_date(self):
         """
         Calcula la fecha de fin de vigencia basándose en la fecha de inicio y la periodicidad.
+        El cálculo está en expiry.compute_end_dates(), el mismo que usan los procesos masivos.
         """
-        # La licencia es "perpetua" si su PERIODO es PERIODO_PERPETUA
-        # NO DEBERÍA MARCAR ERROR AQUÍ SI PERIODO_PERPETUA ESTÁ DEFINIDO ARRIBA
-        if self.periodo_licencia == Licencia.PERIODO_PERPETUA:  # <--- DEBE SER ASÍ
-            return None
-
-        if not self.fecha_inicio_vigencia:
-            return None
-
-        start_date = self.fecha_inicio_vigencia
-
-        if self.periodo_licencia == Licencia.PERIODO_MENSUAL:
-            return start_date + relativedelta(months=+1)
-        elif self.periodo_licencia == Licencia.PERIODO_TRIMESTRAL:
-            return start_date + relativedelta(months=+3)
-        elif self.periodo_licencia == Licencia.PERIODO_SEMESTRAL:
-            return start_date + relativedelta(months=+6)
-        elif self.periodo_licencia == Licencia.PERIODO_ANUAL:
-            return start_date + relativedelta(years=+1)
-
-        return None
+        fechas_fin = compute_end_dates([self._fecha_inicio()], [self.periodo_licencia])
+        return to_dates(fechas_fin)[0]
 
     def clean(self):
         if self.tipo_licencia == "SUSCRIPCION" and self.periodo_licencia == "PERPETUA":
@@ -209,29 +513,12 @@ class Licencia(models.Model):
         """
         Actualiza el estado de la licencia basado en la fecha de fin de vigencia y el tipo.
         Este método DEBE ser llamado periódicamente (ej. en un cron job) o en cada acceso a la licencia.
+        Para recalcular muchas licencias a la vez usa Licencia.objects.update_estados().
         """
-        # Guarda el estado actual ANTES de calcular el nuevo
-        # old_estado = self.estado
-
-        if self.periodo_licencia == Licencia.PERIODO_PERPETUA:
-            self.estado = Licencia.ESTADO_ACTIVA
-        elif self.fecha_fin_vigencia:
-            today = timezone.now().date()
-            if self.fecha_fin_vigencia < today:
-                self.estado = Licencia.ESTADO_VENCIDA
-            elif (
-                self.fecha_fin_vigencia - timedelta(days=7) <= today
-            ):  # Vence en los próximos 7 días
-                self.estado = Licencia.ESTADO_PENDIENTE_RENOVACION
-            else:
-                self.estado = Licencia.ESTADO_ACTIVA
-        # Si no tiene fecha_fin_vigencia y no es perpetua, o no tiene fecha de inicio, considerarla inactiva
-        elif not self.fecha_inicio_vigencia:
-            self.estado = (
-                Licencia.ESTADO_INACTIVA
-            )  # O el estado que consideres apropiado
-        else:  # Si tiene fecha de inicio pero no de fin y no es perpetua, por defecto activa
-            self.estado = Licencia.ESTADO_ACTIVA
+        # Las reglas están en expiry.compute_estados(), las mismas de los procesos masivos
+        self.estado = compute_estados(
+            [self._fecha_inicio()], [self.fecha_fin_vigencia], [self.periodo_licencia]
+        )[0]
 
         # Guardar solo si el estado cambió
         # if self._state.db:  # Solo si el objeto ya existe en la DB
@@ -239,17 +526,15 @@ class Licencia(models.Model):
         #     if original_licencia.estado != self.estado:
         #         self.save(update_fields=["estado"])  # Guarda solo el campo estado
 
-    # Sobreescribe save para asegurar que el estado se actualiza al guardar si no se hace explícitamente
-    def save(self, *args, **kwargs):
-        # Lógica para fecha_fin_vigencia:
-        # Se asegura que fecha_fin_vigencia sea None si es perpetua,
-        # o la calcula si tiene fecha_inicio_vigencia.
-        if self.periodo_licencia == Licencia.PERIODO_PERPETUA:
-            self.fecha_fin_vigencia = None
-        elif self.fecha_inicio_vigencia:
-            self.fecha_fin_vigencia = self._calculate_end_date()
-        else:
-            self.fecha_fin_vigencia = None
+    def compute_vigencia(self):
+        """
+        Aplica en memoria la lógica de save(): fecha de fin según el periodo, fecha de
+        inicio por defecto y estado. Para lotes de licencias usa expiry.compute_vigencias().
+        """
+        # fecha_fin_vigencia la calcula PostgreSQL (columna generada); aquí solo se
+        # refleja en memoria con el mismo cálculo para obtener el estado sin releer
+        # la licencia después de guardarla.
+        self.fecha_fin_vigencia = self._calculate_end_date()
 
         # Si el estado es ACTIVA y no tiene fecha_inicio_vigencia, la establece a la fecha actual.
         # Esto es útil si una licencia se crea y es activa sin una fecha de inicio explícita.
@@ -260,6 +545,10 @@ class Licencia(models.Model):
         # # basándose en las fechas y el tipo. Esto ocurre ANTES de guardar.
         self.update_estado()  # Llama al nuevo método para actualizar el estado
 
+    # Sobreescribe save para asegurar que el estado se actualiza al guardar si no se hace explícitamente
+    def save(self, *args, **kwargs):
+        self.compute_vigencia()
+
         # Finalmente, llama al método save original del ORM de Django.
         # Esto es lo que realmente guarda el objeto (y su estado actualizado) en la base de datos.
         super().save(*args, **kwargs)
@@ -268,3 +557,272 @@ class Licencia(models.Model):
         verbose_name = "Licencia"
         verbose_name_plural = "Licencias"
         ordering = ["fecha_fin_vigencia", "cliente"]
+        indexes = [
+            # Orden por defecto y rangos de fecha de fin (update_estados, avisos por vencer)
+            models.Index(
+                fields=["fecha_fin_vigencia", "cliente"], name="licencia_fin_cliente_idx"
+            ),
+            # check_expired_licenses / check_licenses_per_renew: suscripciones por estado
+            models.Index(
+                fields=["estado", "fecha_fin_vigencia"],
+                name="licencia_susc_estado_idx",
+                condition=models.Q(tipo_licencia="SUSCRIPCION"),
+            ),
+            # Suscripciones de un cliente por fecha de fin (¿tiene alguna vencida?)
+            models.Index(
+                fields=["cliente", "fecha_fin_vigencia"],
+                name="licencia_susc_cliente_idx",
+                condition=models.Q(tipo_licencia="SUSCRIPCION"),
+            ),
+        ]
+
+
+class RenovacionLicencia(models.Model):
+    """
+    Historial de renovaciones: una fila por licencia renovada con sus fechas de
+    vigencia antes y después. Lo escribe LicenciaQuerySet.renew().
+    """
+
+    licencia = models.ForeignKey(
+        Licencia, on_delete=models.CASCADE, related_name="renovaciones"
+    )
+    usuario = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        blank=True,
+        null=True,
+        help_text="Usuario que hizo la renovación (vacío si no había sesión iniciada)",
+    )
+    fecha_inicio_anterior = models.DateField()
+    fecha_fin_anterior = models.DateField(blank=True, null=True)
+    fecha_inicio_vigencia = models.DateField()
+    fecha_fin_vigencia = models.DateField(blank=True, null=True)
+    fecha_renovacion = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Renovación de la licencia {self.licencia_id} ({self.fecha_inicio_vigencia:%d/%m/%Y})"
+
+    class Meta:
+        verbose_name = "Renovación de Licencia"
+        verbose_name_plural = "Renovaciones de Licencias"
+        ordering = ["-fecha_renovacion"]
+
+
+class ResumenLicenciasCliente(models.Model):
+    """
+    Resumen precalculado de las licencias de un cliente para la lista de clientes.
+    Se mantiene al guardar o eliminar una licencia y con la señal licencias_actualizadas
+    de los cambios masivos; rebuild_license_summaries lo reconstruye por completo.
+    """
+
+    cliente = models.OneToOneField(
+        Cliente,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="resumen_licencias",
+    )
+    activas = models.PositiveIntegerField(default=0)
+    pendientes = models.PositiveIntegerField(default=0)
+    vencidas = models.PositiveIntegerField(default=0)
+    inactivas = models.PositiveIntegerField(default=0)
+    tiene_suscripcion_vencida = models.BooleanField(default=False)
+    proxima_fecha_fin = models.DateField(
+        blank=True,
+        null=True,
+        help_text="Fecha de fin más cercana entre las licencias activas o por renovar",
+    )
+    fecha_actualizacion = models.DateTimeField(auto_now=True)
+
+    CAMPOS_RESUMEN = [
+        "activas",
+        "pendientes",
+        "vencidas",
+        "inactivas",
+        "tiene_suscripcion_vencida",
+        "proxima_fecha_fin",
+        "fecha_actualizacion",
+    ]
+
+    def __str__(self):
+        return f"Resumen de {self.cliente_id}"
+
+    @classmethod
+    def recalcular(cls, cliente_ids):
+        """
+        Recalcula el resumen de los clientes indicados. Los clientes sin licencias
+        quedan en cero. Retorna cuántos resúmenes se escribieron.
+        """
+        cliente_ids = list(cliente_ids)
+        if not cliente_ids:
+            return 0
+        return cls.recalcular_desde(
+            "SELECT DISTINCT unnest(%s::varchar[])", [cliente_ids]
+        )
+
+    @classmethod
+    def recalcular_desde(cls, clientes_sql, params=()):
+        """
+        Recalcula en un solo INSERT ... SELECT ... ON CONFLICT DO UPDATE el resumen de
+        los clientes que devuelve `clientes_sql` (una consulta de una sola columna con
+        sus claves), sin traer filas a Python. Retorna cuántos resúmenes se escribieron.
+        """
+        qn = connection.ops.quote_name
+        sql = f"""
+            INSERT INTO {qn(cls._meta.db_table)} (cliente_id, {", ".join(cls.CAMPOS_RESUMEN)})
+            SELECT
+                c.cliente_id,
+                COUNT(l.id) FILTER (WHERE l.estado = %s),
+                COUNT(l.id) FILTER (WHERE l.estado = %s),
+                COUNT(l.id) FILTER (WHERE l.estado = %s),
+                COUNT(l.id) FILTER (WHERE l.estado = %s),
+                COALESCE(bool_or(l.estado = %s AND l.tipo_licencia = %s), FALSE),
+                MIN(l.fecha_fin_vigencia) FILTER (WHERE l.estado IN (%s, %s)),
+                NOW()
+            FROM ({clientes_sql}) AS c (cliente_id)
+            LEFT JOIN {qn(Licencia._meta.db_table)} l ON l.cliente_id = c.cliente_id
+            GROUP BY c.cliente_id
+            ON CONFLICT (cliente_id) DO UPDATE SET
+                {", ".join(f"{campo} = EXCLUDED.{campo}" for campo in cls.CAMPOS_RESUMEN)}
+        """
+        valores = [
+            Licencia.ESTADO_ACTIVA,
+            Licencia.ESTADO_PENDIENTE_RENOVACION,
+            Licencia.ESTADO_VENCIDA,
+            Licencia.ESTADO_INACTIVA,
+            Licencia.ESTADO_VENCIDA,
+            Licencia.TIPO_SUSCRIPCION,
+            Licencia.ESTADO_ACTIVA,
+            Licencia.ESTADO_PENDIENTE_RENOVACION,
+            *params,
+        ]
+        with connection.cursor() as cursor:
+            cursor.execute(sql, valores)
+            return cursor.rowcount
+
+    class Meta:
+        verbose_name = "Resumen de Licencias del Cliente"
+        verbose_name_plural = "Resúmenes de Licencias de Clientes"
+
+
+class CalendarioVencimientos(models.Model):
+    """
+    Vencimientos de los próximos 12 meses agrupados por semana y por mes, categoría
+    del sistema y tipo de licencia. Es una vista materializada de PostgreSQL (creada
+    en la migración 0015): el tablero la lee con una consulta indexada y
+    refresh_expiry_calendar la recalcula de forma periódica.
+    """
+
+    GRANULARIDAD_SEMANA = "SEMANA"
+    GRANULARIDAD_MES = "MES"
+    GRANULARIDAD_CHOICES = [
+        (GRANULARIDAD_SEMANA, "Semana"),
+        (GRANULARIDAD_MES, "Mes"),
+    ]
+
+    # granularidad:periodo:categoria:tipo_licencia; REFRESH ... CONCURRENTLY requiere
+    # un índice único sobre la vista
+    id = models.TextField(primary_key=True)
+    granularidad = models.CharField(max_length=10, choices=GRANULARIDAD_CHOICES)
+    periodo = models.DateField(help_text="Lunes de la semana o primer día del mes")
+    categoria = models.CharField(max_length=50, choices=Sistema.CATEGORIA_CHOICES)
+    tipo_licencia = models.CharField(
+        max_length=20, choices=Licencia.TIPO_LICENCIA_CHOICES
+    )
+    licencias = models.IntegerField()
+    clientes = models.IntegerField()
+    fecha_calculo = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.get_granularidad_display()} {self.periodo}: {self.licencias}"
+
+    @classmethod
+    def refrescar(cls, concurrently=True):
+        """
+        Recalcula la vista. Con concurrently=True las lecturas del tablero no se
+        bloquean mientras se recalcula.
+        """
+        modo = "CONCURRENTLY " if concurrently else ""
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"REFRESH MATERIALIZED VIEW {modo}{connection.ops.quote_name(cls._meta.db_table)}"
+            )
+
+    class Meta:
+        managed = False
+        db_table = "licensing_management_calendariovencimientos"
+        verbose_name = "Calendario de Vencimientos"
+        verbose_name_plural = "Calendario de Vencimientos"
+
+
+class NotificacionLicencia(models.Model):
+    """
+    Bandeja de salida de avisos por correo. Cada aviso es único por licencia, tipo
+    y fecha de vencimiento: volver a correr los comandos no lo duplica, y una licencia
+    renovada (con nueva fecha de fin) genera un aviso nuevo.
+    """
+
+    TIPO_VENCIDA = "VENCIDA"
+    TIPO_POR_VENCER = "POR_VENCER"
+    TIPO_CHOICES = [
+        (TIPO_VENCIDA, "Licencia Vencida"),
+        (TIPO_POR_VENCER, "Licencia por Vencer"),
+    ]
+
+    ESTADO_PENDIENTE = "PENDIENTE"
+    ESTADO_ENVIANDO = "ENVIANDO"
+    ESTADO_ENVIADA = "ENVIADA"
+    ESTADO_FALLIDA = "FALLIDA"
+    ESTADO_CANCELADA = "CANCELADA"
+    ESTADO_CHOICES = [
+        (ESTADO_PENDIENTE, "Pendiente"),
+        (ESTADO_ENVIANDO, "Enviando"),  # Reclamado por un proceso que lo está enviando
+        (ESTADO_ENVIADA, "Enviada"),
+        (ESTADO_FALLIDA, "Fallida"),  # Se agotaron los intentos o no hay destinatario
+        (ESTADO_CANCELADA, "Cancelada"),  # La licencia cambió antes del envío
+    ]
+
+    licencia = models.ForeignKey(
+        Licencia, on_delete=models.CASCADE, related_name="notificaciones"
+    )
+    tipo = models.CharField(max_length=20, choices=TIPO_CHOICES)
+    fecha_fin_vigencia = models.DateField(
+        help_text="Fecha de fin de vigencia de la licencia al encolar el aviso"
+    )
+    estado = models.CharField(
+        max_length=20, choices=ESTADO_CHOICES, default=ESTADO_PENDIENTE
+    )
+    intentos = models.PositiveIntegerField(default=0)
+    ultimo_error = models.TextField(blank=True)
+    siguiente_intento = models.DateTimeField(
+        default=timezone.now,
+        help_text="Los avisos pendientes no se toman antes de esta fecha (espera entre intentos)",
+    )
+    fecha_reclamo = models.DateTimeField(
+        blank=True,
+        null=True,
+        help_text="Cuándo lo reclamó el último proceso que intentó enviarlo",
+    )
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+    fecha_envio = models.DateTimeField(blank=True, null=True)
+
+    def __str__(self):
+        return f"{self.get_tipo_display()} - {self.licencia.identificador_licencia} ({self.get_estado_display()})"
+
+    class Meta:
+        verbose_name = "Notificación de Licencia"
+        verbose_name_plural = "Notificaciones de Licencias"
+        ordering = ["-fecha_creacion"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["licencia", "tipo", "fecha_fin_vigencia"],
+                name="notificacion_unica_por_vencimiento",
+            )
+        ]
+        indexes = [
+            # Solo los pendientes se consultan al vaciar la bandeja
+            models.Index(
+                fields=["siguiente_intento"],
+                name="notificacion_pendiente_idx",
+                condition=models.Q(estado="PENDIENTE"),
+            )
+        ]
@@ -0,0 +1,860 @@
+import functools
+import logging
+import smtplib
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import transaction
+from django.db.models import Case, CharField, F, Q, Value, When
+from django.template.loader import get_template
+from django.utils import timezone
+from django.utils.safestring import mark_safe
+
+from .models import Licencia, NotificacionLicencia, Sistema
+
+logger = logging.getLogger(__name__)
+
+# Valores por defecto del envío en lotes (se pueden cambiar desde los comandos)
+TAMANO_LOTE = 50  # Mensajes entre cada pausa
+PAUSA_ENTRE_LOTES = 1.0  # Segundos de espera entre lotes para respetar límites del proveedor
+REINTENTOS = 3  # Reintentos por mensaje ante errores transitorios de SMTP
+ESPERA_REINTENTO = 2.0  # Segundos de la primera espera; se duplica en cada reintento
+CONCURRENCIA = 4  # Sesiones SMTP simultáneas, una por hilo (--concurrency)
+INTENTOS_MAXIMOS = 5  # Ejecuciones que puede fallar un aviso de la bandeja antes de darlo por fallido
+ESPERA_ENTRE_INTENTOS = timedelta(hours=1)  # Primera espera antes de retomar un aviso fallido; se duplica
+RECLAMO_VENCIDO = timedelta(minutes=30)  # Tiempo tras el cual se revisa un aviso que quedó en ENVIANDO
+
+
+class Notificacion:
+    """
+    Un correo listo para enviarse junto con la(s) licencia(s) que lo originaron.
+    """
+
+    def __init__(self, licencias, message, descripcion):
+        self.licencias = licencias
+        self.message = message
+        self.descripcion = descripcion  # Texto para la bitácora del comando
+        self.error = None
+        self.enviada = False
+
+    @property
+    def identificadores(self):
+        return ", ".join(licencia.identificador_licencia for licencia in self.licencias)
+
+
+# Fragmentos de cierre (texto plano, html) de cada plantilla individual. Dependen solo
+# del Sistema de la licencia, así que se renderizan una vez por Sistema.
+_CIERRES = {
+    "emails/expired_license_notification": (
+        "emails/fragments/expired_license_cierre.txt",
+        "emails/fragments/cierre.html",
+    ),
+    "emails/license_per_renew_notification": (
+        "emails/fragments/license_per_renew_cierre.txt",
+        "emails/fragments/cierre.html",
+    ),
+}
+FRAGMENTOS_EN_CACHE = 256  # Fragmentos de cierre renderizados que se conservan por proceso
+
+
+@functools.lru_cache(maxsize=None)
+def _get_template(nombre):
+    """
+    Carga y compila la plantilla una sola vez por proceso. Con DEBUG=True Django no
+    usa el cargador en caché, y sin esto cada correo volvería a leer y compilar el archivo.
+    """
+    return get_template(nombre)
+
+
+@functools.lru_cache(maxsize=FRAGMENTOS_EN_CACHE)
+def _render_fragment(nombre, sistema_nombre, es_aspel):
+    return mark_safe(
+        _get_template(nombre).render(
+            {"sistema_nombre": sistema_nombre, "es_aspel": es_aspel}
+        )
+    )
+
+
+def _sistema_fragment(nombre, sistema):
+    return _render_fragment(nombre, sistema.nombre, sistema.categoria == Sistema.ASPEL)
+
+
+def render_email(plantilla, context, sistema=None):
+    """
+    Renderiza el cuerpo en texto plano y en HTML de emails/<plantilla>.txt|.html con
+    las plantillas ya compiladas. Si se indica el Sistema, agrega al contexto el cierre
+    precalculado para ese Sistema. Retorna (texto_plano, html).
+    """
+    cierre_txt, cierre_html = _CIERRES.get(plantilla, (None, None))
+    plain_context = dict(context)
+    html_context = dict(context)
+    if sistema is not None and cierre_txt:
+        plain_context["cierre"] = _sistema_fragment(cierre_txt, sistema)
+        html_context["cierre"] = _sistema_fragment(cierre_html, sistema)
+    return (
+        _get_template(f"{plantilla}.txt").render(plain_context),
+        _get_template(f"{plantilla}.html").render(html_context),
+    )
+
+
+def _license_context(licencia):
+    return {
+        "cliente_nombre": licencia.cliente.nombre,
+        "cliente_rfc": licencia.cliente.rfc,
+        "licencia_id": licencia.identificador_licencia,
+        "licencia_periodicidad": licencia.get_periodo_licencia_display(),
+        "fecha_vencimiento": licencia.fecha_fin_vigencia.strftime("%d/%m/%Y"),
+        "licencia_tipo": licencia.get_tipo_licencia_display(),
+        "sistema_nombre": licencia.tipo_sistema.nombre,
+        "licencia_estado": licencia.get_estado_display(),
+        "es_aspel": licencia.tipo_sistema.categoria
+        == Sistema.ASPEL,  # Pasa esta variable a la plantilla si quieres adaptar el contenido
+    }
+
+
+def build_expired_notification(licencia):
+    """
+    Construye el correo de licencia vencida. Las licencias Aspel se notifican
+    internamente a EMAIL_ADMON; las demás, al cliente.
+    Retorna (Notificacion, None) o (None, motivo) si no hay destinatario.
+    """
+    if licencia.tipo_sistema.categoria == Sistema.ASPEL:
+        recipient_email = [settings.EMAIL_ADMON]
+        subject = f"Notificación Interna: Licencia Aspel Vencida - {licencia.cliente.nombre} ({licencia.identificador_licencia})"
+        descripcion = f"Licencia Aspel vencida para {licencia.cliente.nombre}. Enviando notificación a {settings.EMAIL_ADMON}"
+    elif licencia.cliente.correo_electronico:
+        recipient_email = [licencia.cliente.correo_electronico]
+        subject = f"URGENTE: Su Licencia de {licencia.tipo_sistema.nombre} ha Vencido - {licencia.identificador_licencia}"
+        descripcion = f"Licencia no-Aspel vencida para {licencia.cliente.nombre}. Enviando notificación a {licencia.cliente.correo_electronico}"
+    else:
+        return (
+            None,
+            f"Cliente {licencia.cliente.nombre} no tiene correo electrónico. No se pudo enviar notificación para licencia {licencia.identificador_licencia}.",
+        )
+
+    if not all(recipient_email):  # Si por alguna razón no se definió un destinatario
+        return (
+            None,
+            f"No se pudo determinar el destinatario para la licencia {licencia.identificador_licencia}. Saltando.",
+        )
+
+    plain_message, html_message = render_email(
+        "emails/expired_license_notification",
+        _license_context(licencia),
+        licencia.tipo_sistema,
+    )
+    message = EmailMultiAlternatives(
+        subject, plain_message, None, recipient_email
+    )  # DEFAULT_FROM_EMAIL se usa si es None
+    message.attach_alternative(html_message, "text/html")
+    return Notificacion([licencia], message, descripcion), None
+
+
+def build_per_renew_notification(licencia):
+    """
+    Construye el correo al cliente de una licencia de suscripción por vencer.
+    Retorna (Notificacion, None) o (None, motivo) si el cliente no tiene correo.
+    """
+    if not licencia.cliente.correo_electronico:
+        return (
+            None,
+            f"Cliente {licencia.cliente.nombre} no tiene correo electrónico. No se pudo enviar notificación para licencia {licencia.identificador_licencia}.",
+        )
+
+    recipient_email = [licencia.cliente.correo_electronico]
+    subject = f"ADVERTENCIA: Su Licencia de {licencia.tipo_sistema.nombre} está por expirar - {licencia.identificador_licencia}"
+    descripcion = f"Licencia no-Aspel por expirar para {licencia.cliente.nombre}. Enviando notificación a {licencia.cliente.correo_electronico}"
+
+    plain_message, html_message = render_email(
+        "emails/license_per_renew_notification",
+        _license_context(licencia),
+        licencia.tipo_sistema,
+    )
+
+    message = EmailMultiAlternatives(subject, plain_message, None, recipient_email)
+    message.attach_alternative(html_message, "text/html")
+    return Notificacion([licencia], message, descripcion), None
+
+
+def _build_digest(licencias, recipient_email, subject, template, interna, descripcion):
+    context = {
+        "cliente_nombre": licencias[0].cliente.nombre,
+        "cliente_rfc": licencias[0].cliente.rfc,
+        "interna": interna,  # Resumen para EMAIL_ADMON con licencias de varios clientes
+        "licencias": [_license_context(licencia) for licencia in licencias],
+    }
+    plain_message, html_message = render_email(template, context)
+    message = EmailMultiAlternatives(subject, plain_message, None, recipient_email)
+    message.attach_alternative(html_message, "text/html")
+    return Notificacion(licencias, message, descripcion)
+
+
+def _group_by_cliente(licencias):
+    grupos = {}
+    for licencia in licencias:
+        grupos.setdefault(licencia.cliente_id, []).append(licencia)
+    return grupos.values()
+
+
+def build_expired_digests(licencias):
+    """
+    Agrupa las licencias vencidas en un resumen por cliente y un único resumen interno
+    a EMAIL_ADMON con todas las licencias Aspel. Un grupo de una sola licencia usa el
+    correo individual de siempre. Sin EMAIL_ADMON configurado, el resumen Aspel no
+    se envía y sus licencias quedan entre los motivos.
+    Retorna (notificaciones, motivos de las licencias que no se pueden notificar).
+    """
+    notificaciones = []
+    motivos = []
+    aspel = []
+    clientes = []
+    for licencia in licencias:
+        if licencia.tipo_sistema.categoria == Sistema.ASPEL:
+            aspel.append(licencia)
+        else:
+            clientes.append(licencia)
+
+    if len(aspel) == 1:
+        clientes.insert(0, aspel.pop())
+    elif aspel and not settings.EMAIL_ADMON:
+        logger.warning(
+            "EMAIL_ADMON no está configurado; no se envía el resumen de %d licencias Aspel vencidas.",
+            len(aspel),
+        )
+        motivos.extend(
+            f"EMAIL_ADMON no está configurado. No se pudo enviar notificación para licencia {licencia.identificador_licencia}."
+            for licencia in aspel
+        )
+    elif aspel:
+        notificaciones.append(
+            _build_digest(
+                aspel,
+                [settings.EMAIL_ADMON],
+                f"Notificación Interna: {len(aspel)} Licencias Aspel Vencidas",
+                "emails/expired_license_digest",
+                True,
+                f"{len(aspel)} licencias Aspel vencidas. Enviando resumen a {settings.EMAIL_ADMON}",
+            )
+        )
+
+    for grupo in _group_by_cliente(clientes):
+        cliente = grupo[0].cliente
+        if len(grupo) == 1 or not cliente.correo_electronico:
+            for licencia in grupo:
+                notificacion, motivo = build_expired_notification(licencia)
+                if notificacion is None:
+                    motivos.append(motivo)
+                else:
+                    notificaciones.append(notificacion)
+            continue
+        notificaciones.append(
+            _build_digest(
+                grupo,
+                [cliente.correo_electronico],
+                f"URGENTE: {len(grupo)} de sus Licencias han Vencido - {cliente.nombre}",
+                "emails/expired_license_digest",
+                False,
+                f"{len(grupo)} licencias vencidas para {cliente.nombre}. Enviando resumen a {cliente.correo_electronico}",
+            )
+        )
+
+    return notificaciones, motivos
+
+
+def build_per_renew_digests(licencias):
+    """
+    Agrupa las licencias por vencer en un resumen por cliente. Un grupo de una sola
+    licencia usa el correo individual de siempre.
+    Retorna (notificaciones, motivos de las licencias que no se pueden notificar).
+    """
+    notificaciones = []
+    motivos = []
+    for grupo in _group_by_cliente(licencias):
+        cliente = grupo[0].cliente
+        if len(grupo) == 1 or not cliente.correo_electronico:
+            for licencia in grupo:
+                notificacion, motivo = build_per_renew_notification(licencia)
+                if notificacion is None:
+                    motivos.append(motivo)
+                else:
+                    notificaciones.append(notificacion)
+            continue
+        notificaciones.append(
+            _build_digest(
+                grupo,
+                [cliente.correo_electronico],
+                f"ADVERTENCIA: {len(grupo)} de sus Licencias están por expirar - {cliente.nombre}",
+                "emails/license_per_renew_digest",
+                False,
+                f"{len(grupo)} licencias por expirar para {cliente.nombre}. Enviando resumen a {cliente.correo_electronico}",
+            )
+        )
+    return notificaciones, motivos
+
+
+def add_sending_arguments(parser):
+    """
+    Agrega a un comando las opciones del envío en lotes.
+    """
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=TAMANO_LOTE,
+        help=f"Mensajes por lote antes de pausar (por defecto {TAMANO_LOTE}).",
+    )
+    parser.add_argument(
+        "--pause",
+        type=float,
+        default=PAUSA_ENTRE_LOTES,
+        help=f"Segundos de pausa entre lotes (por defecto {PAUSA_ENTRE_LOTES}).",
+    )
+    parser.add_argument(
+        "--digest",
+        action="store_true",
+        help="Envía un solo correo por destinatario con todas sus licencias en lugar de uno por licencia.",
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=1,
+        help=(
+            "Sesiones SMTP simultáneas, cada una en su propio hilo "
+            f"(sugerido {CONCURRENCIA}; por defecto 1, envío en serie)."
+        ),
+    )
+    parser.add_argument(
+        "--max-retries",
+        type=int,
+        default=REINTENTOS,
+        help=f"Reintentos por mensaje ante errores transitorios de SMTP (por defecto {REINTENTOS}).",
+    )
+
+
+class ReporteEnvioMixin:
+    """
+    Mezcla para los comandos de envío: escribe en la salida del comando el resultado
+    de cada notificación (on_result) y los avisos que no se pudieron enviar (on_skip).
+    """
+
+    def _skip(self, aviso, motivo):
+        self.stdout.write(self.style.ERROR(motivo))
+
+    def _report(self, notificacion):
+        licencia_id = notificacion.identificadores
+        if notificacion.enviada:
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"Notificación enviada exitosamente para licencia {licencia_id}."
+                )
+            )
+        else:
+            self.stdout.write(
+                self.style.ERROR(
+                    f"Error al enviar notificación para licencia {licencia_id}: {notificacion.error}"
+                )
+            )
+
+
+def _is_transient(error):
+    """
+    Indica si vale la pena reintentar: desconexiones, errores de red y respuestas 4xx de SMTP.
+    """
+    if isinstance(error, (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError)):
+        return True
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return False
+    if isinstance(error, smtplib.SMTPResponseException):
+        return 400 <= error.smtp_code < 500
+    return isinstance(error, OSError)  # Timeouts y errores de socket
+
+
+def _reconnect(connection):
+    try:
+        connection.close()
+    except Exception:
+        pass
+    connection.open()
+
+
+class ResultadoEnvio:
+    """
+    Resumen de un envío: notificaciones enviadas, fallidas y mensajes por segundo.
+    """
+
+    def __init__(self, notificaciones, elapsed):
+        self.notificaciones = notificaciones
+        self.elapsed = elapsed
+        self.enviadas = sum(1 for n in notificaciones if n.enviada)
+        self.fallidas = len(notificaciones) - self.enviadas
+
+    @property
+    def throughput(self):
+        return self.enviadas / self.elapsed if self.elapsed else 0.0
+
+
+def _send_one(connection, notificacion, max_retries, backoff):
+    """
+    Envía un mensaje por una conexión ya abierta, reintentando con espera exponencial
+    (y reconectando) ante errores transitorios. Marca la Notificacion con enviada/error.
+    """
+    for intento in range(max_retries + 1):
+        try:
+            # Un mensaje por llamada para saber exactamente cuál falló;
+            # la conexión sigue abierta entre llamadas.
+            connection.send_messages([notificacion.message])
+            notificacion.enviada = True
+            notificacion.error = None
+            return
+        except Exception as e:
+            notificacion.error = e
+            if intento == max_retries or not _is_transient(e):
+                return
+            time.sleep(backoff * 2**intento)
+            try:
+                _reconnect(connection)
+            except Exception as reconnect_error:
+                notificacion.error = reconnect_error
+
+
+def send_notifications(
+    notificaciones,
+    batch_size=TAMANO_LOTE,
+    pause=PAUSA_ENTRE_LOTES,
+    max_retries=REINTENTOS,
+    backoff=ESPERA_REINTENTO,
+    connection=None,
+    on_send=None,
+    on_result=None,
+):
+    """
+    Envía las notificaciones por una sola conexión SMTP reutilizada, con una pausa
+    cada batch_size mensajes y reintentos con espera exponencial ante errores
+    transitorios (reconectando si el servidor cerró la sesión).
+
+    Cada Notificacion queda marcada con enviada/error; on_send(notificacion) se llama
+    justo antes de entregarla al servidor y on_result(notificacion) después de su
+    intento final. Retorna un ResultadoEnvio.
+    """
+    notificaciones = list(notificaciones)
+    own_connection = connection is None  # Una conexión recibida la cierra quien la abrió
+    connection = connection or get_connection(fail_silently=False)
+    started = time.monotonic()
+    try:
+        connection.open()
+        for index, notificacion in enumerate(notificaciones):
+            if index and batch_size and index % batch_size == 0 and pause:
+                time.sleep(pause)
+
+            if on_send:
+                on_send(notificacion)
+            _send_one(connection, notificacion, max_retries, backoff)
+            if on_result:
+                on_result(notificacion)
+    finally:
+        if own_connection:
+            connection.close()
+
+    return ResultadoEnvio(notificaciones, time.monotonic() - started)
+
+
+def _open_quietly(connection):
+    try:
+        connection.open()
+    except Exception as e:
+        return e
+    return None
+
+
+def open_connections(total):
+    """
+    Abre hasta `total` sesiones SMTP en paralelo, una por hilo, para que los saludos
+    SMTP y TLS se negocien a la vez. Las que no logran conectarse se descartan; si
+    ninguna se conecta se lanza el error de la primera.
+    """
+    connections = [get_connection(fail_silently=False) for _ in range(max(total, 1))]
+    with ThreadPoolExecutor(max_workers=len(connections)) as executor:
+        errores = list(executor.map(_open_quietly, connections))
+    abiertas = [
+        connection for connection, error in zip(connections, errores) if error is None
+    ]
+    if not abiertas:
+        raise errores[0]
+    return abiertas
+
+
+def send_notifications_concurrent(
+    notificaciones,
+    connections=None,
+    concurrency=CONCURRENCIA,
+    max_retries=REINTENTOS,
+    backoff=ESPERA_REINTENTO,
+    on_send=None,
+    on_result=None,
+):
+    """
+    Envía las notificaciones repartiéndolas entre varias sesiones SMTP abiertas a la
+    vez (como máximo `concurrency`), cada una atendida por su propio hilo de un
+    ThreadPoolExecutor, con los mismos reintentos que send_notifications. Se pueden
+    pasar sesiones ya abiertas (open_connections) para reutilizarlas entre lotes; las
+    que se abren aquí también se cierran aquí.
+
+    Cada sesión envía un mensaje a la vez. on_send(notificacion), justo antes de pasar
+    un mensaje a una sesión, y on_result(notificacion) se llaman en el hilo que invocó
+    la función (pueden escribir en la base de datos).
+    Retorna un ResultadoEnvio.
+    """
+    notificaciones = list(notificaciones)
+    own_connections = connections is None
+    started = time.monotonic()
+    if own_connections:
+        connections = open_connections(min(concurrency, len(notificaciones)))
+    pendientes = deque(notificaciones)
+    libres = list(connections)
+    en_curso = {}
+    try:
+        with ThreadPoolExecutor(max_workers=len(connections)) as executor:
+            while pendientes or en_curso:
+                while pendientes and libres:
+                    connection = libres.pop()
+                    notificacion = pendientes.popleft()
+                    if on_send:
+                        on_send(notificacion)
+                    futuro = executor.submit(
+                        _send_one, connection, notificacion, max_retries, backoff
+                    )
+                    en_curso[futuro] = (notificacion, connection)
+                terminados, _ = wait(en_curso, return_when=FIRST_COMPLETED)
+                for futuro in terminados:
+                    notificacion, connection = en_curso.pop(futuro)
+                    libres.append(connection)
+                    futuro.result()  # _send_one no lanza; esto solo propaga errores inesperados
+                    if on_result:
+                        on_result(notificacion)
+    finally:
+        if own_connections:
+            for connection in connections:
+                connection.close()
+
+    return ResultadoEnvio(notificaciones, time.monotonic() - started)
+
+
+# Constructores de correo y estado que debe conservar la licencia para cada tipo de aviso
+_BUILDERS = {
+    NotificacionLicencia.TIPO_VENCIDA: (
+        build_expired_notification,
+        build_expired_digests,
+        Licencia.ESTADO_VENCIDA,
+    ),
+    NotificacionLicencia.TIPO_POR_VENCER: (
+        build_per_renew_notification,
+        build_per_renew_digests,
+        Licencia.ESTADO_PENDIENTE_RENOVACION,
+    ),
+}
+
+
+def enqueue_notifications(licencias, tipo):
+    """
+    Encola en la bandeja de salida un aviso por licencia del queryset. Los avisos que
+    ya existen para la misma licencia, tipo y fecha de fin se ignoran, así que volver a
+    correr un comando no duplica correos. Retorna cuántos avisos nuevos se encolaron.
+    """
+    licencias = licencias.filter(fecha_fin_vigencia__isnull=False)
+    avisos = [
+        NotificacionLicencia(licencia_id=pk, tipo=tipo, fecha_fin_vigencia=fecha_fin)
+        for pk, fecha_fin in licencias.values_list("pk", "fecha_fin_vigencia")
+    ]
+    encolados = NotificacionLicencia.objects.filter(tipo=tipo, licencia__in=licencias)
+    antes = encolados.count()
+    NotificacionLicencia.objects.bulk_create(
+        avisos, batch_size=1000, ignore_conflicts=True
+    )
+    return encolados.count() - antes
+
+
+def _build_from_outbox(avisos, digest, on_skip):
+    """
+    Construye los correos de un lote de avisos. Retorna una lista de
+    (Notificacion, avisos que cubre); los avisos sin correo quedan marcados en memoria.
+    """
+    pares = []
+    for tipo, (individual, resumen, estado_esperado) in _BUILDERS.items():
+        por_licencia = {}
+        for aviso in avisos:
+            if aviso.tipo != tipo:
+                continue
+            licencia = aviso.licencia
+            if (
+                licencia.estado != estado_esperado
+                or licencia.fecha_fin_vigencia != aviso.fecha_fin_vigencia
+            ):
+                # Se renovó o cambió de estado después de encolar: el aviso ya no aplica
+                aviso.estado = NotificacionLicencia.ESTADO_CANCELADA
+                aviso.ultimo_error = "La licencia cambió antes del envío."
+                on_skip(
+                    aviso,
+                    f"Licencia {licencia.identificador_licencia} cambió antes del envío. Aviso cancelado.",
+                )
+                continue
+            por_licencia[licencia.pk] = aviso
+
+        licencias = [aviso.licencia for aviso in por_licencia.values()]
+        motivos = {}
+        if digest:
+            notificaciones, _ = resumen(licencias)
+        else:
+            notificaciones = []
+            for licencia in licencias:
+                notificacion, motivo = individual(licencia)
+                if notificacion is None:
+                    motivos[licencia.pk] = motivo
+                else:
+                    notificaciones.append(notificacion)
+
+        for notificacion in notificaciones:
+            pares.append(
+                (notificacion, [por_licencia.pop(l.pk) for l in notificacion.licencias])
+            )
+        # Lo que quedó sin correo no tiene destinatario; reintentar no lo resolvería
+        for pk, aviso in por_licencia.items():
+            motivo = motivos.get(
+                pk,
+                f"No se pudo determinar el destinatario para la licencia {aviso.licencia.identificador_licencia}.",
+            )
+            aviso.estado = NotificacionLicencia.ESTADO_FALLIDA
+            aviso.ultimo_error = motivo
+            on_skip(aviso, motivo)
+    return pares
+
+
+def _record_result(notificacion, avisos, max_attempts, now):
+    # Los intentos ya se contaron al reclamar el aviso (_claim_batch)
+    for aviso in avisos:
+        if notificacion.enviada:
+            aviso.estado = NotificacionLicencia.ESTADO_ENVIADA
+            aviso.fecha_envio = now
+            aviso.ultimo_error = ""
+        elif aviso.intentos >= max_attempts:
+            aviso.estado = NotificacionLicencia.ESTADO_FALLIDA
+            aviso.ultimo_error = str(notificacion.error)
+            aviso.fecha_envio = None
+        else:
+            # Vuelve a la bandeja para otro intento más tarde
+            aviso.estado = NotificacionLicencia.ESTADO_PENDIENTE
+            aviso.ultimo_error = str(notificacion.error)
+            aviso.fecha_envio = None
+            aviso.siguiente_intento = now + ESPERA_ENTRE_INTENTOS * 2 ** (aviso.intentos - 1)
+
+
+def _destinatario():
+    """
+    Expresión con la clave del destinatario de cada aviso: los avisos de licencias
+    Aspel vencidas van todos al mismo resumen interno (EMAIL_ADMON); los demás, al
+    cliente de la licencia.
+    """
+    return Case(
+        When(
+            tipo=NotificacionLicencia.TIPO_VENCIDA,
+            licencia__tipo_sistema__categoria=Sistema.ASPEL,
+            then=Value(""),
+        ),
+        default=F("licencia__cliente_id"),
+        output_field=CharField(),
+    )
+
+
+def _claim_batch(reclamables, batch_size):
+    """
+    Reclama el siguiente lote de avisos en una transacción corta: los bloquea con
+    SELECT ... FOR UPDATE SKIP LOCKED, los marca ENVIANDO con la hora del reclamo,
+    les suma un intento y confirma. El lote se forma con destinatarios completos: si el último destinatario
+    quedó cortado por batch_size se agregan sus avisos restantes, para que un resumen
+    no se parta entre lotes. Retorna los avisos reclamados.
+    """
+    reclamables = reclamables.annotate(destinatario=_destinatario()).select_related(
+        "licencia__cliente", "licencia__tipo_sistema"
+    )
+    with transaction.atomic():
+        avisos = list(
+            reclamables.select_for_update(skip_locked=True, of=("self",)).order_by(
+                "destinatario", "pk"
+            )[:batch_size]
+        )
+        if not avisos:
+            return []
+        if len(avisos) == batch_size:
+            # Sin SKIP LOCKED: si otro proceso tiene alguno bloqueado se espera a que lo
+            # marque ENVIANDO, y entonces ya no cumple el filtro.
+            avisos += reclamables.select_for_update(of=("self",)).filter(
+                destinatario=avisos[-1].destinatario
+            ).exclude(pk__in=[aviso.pk for aviso in avisos])
+
+        now = timezone.now()
+        NotificacionLicencia.objects.filter(pk__in=[aviso.pk for aviso in avisos]).update(
+            estado=NotificacionLicencia.ESTADO_ENVIANDO,
+            fecha_reclamo=now,
+            intentos=F("intentos") + 1,
+        )
+    for aviso in avisos:
+        aviso.estado = NotificacionLicencia.ESTADO_ENVIANDO
+        aviso.fecha_reclamo = now
+        aviso.intentos += 1
+    return avisos
+
+
+def _close_interrupted(reclamo_vencido, tipo, on_skip):
+    """
+    Da por fallidos los avisos que un proceso alcanzó a entregar al servidor SMTP pero
+    cuyo resultado no guardó (murió a la mitad del envío). No se sabe si el correo
+    llegó, así que no se vuelven a enviar: quedan FALLIDA para revisarlos a mano.
+    """
+    interrumpidos = NotificacionLicencia.objects.filter(
+        estado=NotificacionLicencia.ESTADO_ENVIANDO,
+        fecha_reclamo__lt=reclamo_vencido,
+        fecha_envio__isnull=False,
+    ).select_related("licencia")
+    if tipo:
+        interrumpidos = interrumpidos.filter(tipo=tipo)
+    motivo = "El envío se interrumpió y no se sabe si el correo se entregó; no se reenvía."
+    with transaction.atomic():
+        avisos = list(interrumpidos.select_for_update(skip_locked=True, of=("self",)))
+        NotificacionLicencia.objects.filter(pk__in=[aviso.pk for aviso in avisos]).update(
+            estado=NotificacionLicencia.ESTADO_FALLIDA, ultimo_error=motivo
+        )
+    for aviso in avisos:
+        on_skip(
+            aviso, f"Licencia {aviso.licencia.identificador_licencia}: {motivo}"
+        )
+
+
+def process_outbox(
+    tipo=None,
+    batch_size=TAMANO_LOTE,
+    pause=PAUSA_ENTRE_LOTES,
+    digest=False,
+    max_retries=REINTENTOS,
+    max_attempts=INTENTOS_MAXIMOS,
+    concurrency=1,
+    on_result=None,
+    on_skip=None,
+):
+    """
+    Vacía la bandeja de salida en lotes de unos batch_size avisos, sin enviar correos
+    dentro de una transacción:
+
+    1. Cada lote se reclama en una transacción corta (_claim_batch): los avisos pasan
+       a ENVIANDO, suman un intento y ningún otro proceso los vuelve a tomar. Varios
+       procesos pueden vaciar la bandeja a la vez.
+    2. Las sesiones SMTP se abren después del primer reclamo con correos por enviar
+       (una bandeja vacía no abre ninguna) y se reutilizan en los lotes siguientes;
+       con concurrency > 1 el envío es con send_notifications_concurrent.
+    3. Justo antes de entregar cada correo al servidor se guarda su fecha_envio, y su
+       resultado se guarda en cuanto termina, sin esperar al resto del lote.
+
+    Ningún correo se envía dos veces. Si un proceso muere con avisos reclamados,
+    después de RECLAMO_VENCIDO los que nunca se entregaron al servidor (sin
+    fecha_envio) se vuelven a tomar, y el que estaba entregándose queda FALLIDA
+    porque no se sabe si llegó (_close_interrupted).
+
+    Retorna un ResultadoEnvio con todas las notificaciones intentadas.
+    """
+    on_skip = on_skip or (lambda aviso, motivo: None)
+    campos = ["estado", "ultimo_error", "siguiente_intento", "fecha_envio"]
+
+    _close_interrupted(timezone.now() - RECLAMO_VENCIDO, tipo, on_skip)
+
+    avisos_de = {}  # id(Notificacion) -> avisos que cubre
+
+    def marcar_envio(notificacion):
+        # fecha_envio indica que el correo ya pudo llegar al servidor
+        now = timezone.now()
+        avisos_correo = avisos_de[id(notificacion)]
+        NotificacionLicencia.objects.filter(
+            pk__in=[aviso.pk for aviso in avisos_correo]
+        ).update(fecha_envio=now)
+        for aviso in avisos_correo:
+            aviso.fecha_envio = now
+
+    def registrar(notificacion):
+        avisos_correo = avisos_de.pop(id(notificacion))
+        _record_result(notificacion, avisos_correo, max_attempts, timezone.now())
+        NotificacionLicencia.objects.bulk_update(avisos_correo, campos)
+        enviadas.append(notificacion)
+        if on_result:
+            on_result(notificacion)
+
+    enviadas = []
+    connections = []
+    started = time.monotonic()
+    try:
+        while True:
+            now = timezone.now()
+            reclamables = NotificacionLicencia.objects.filter(
+                Q(estado=NotificacionLicencia.ESTADO_PENDIENTE, siguiente_intento__lte=now)
+                | Q(
+                    estado=NotificacionLicencia.ESTADO_ENVIANDO,
+                    fecha_reclamo__lt=now - RECLAMO_VENCIDO,
+                    fecha_envio__isnull=True,
+                )
+            )
+            if tipo:
+                reclamables = reclamables.filter(tipo=tipo)
+            avisos = _claim_batch(reclamables, batch_size)
+            if not avisos:
+                break
+
+            pares = _build_from_outbox(avisos, digest, on_skip)
+            cubiertos = {aviso.pk for _, avisos_correo in pares for aviso in avisos_correo}
+            # Cancelados y sin destinatario: no se envían
+            descartados = [aviso for aviso in avisos if aviso.pk not in cubiertos]
+            if descartados:
+                NotificacionLicencia.objects.bulk_update(descartados, campos)
+            if not pares:
+                continue
+
+            faltantes = min(concurrency, len(pares)) - len(connections)
+            if faltantes > 0:
+                try:
+                    connections += open_connections(faltantes)
+                except Exception:
+                    if not connections:
+                        # Sin servidor no se entregó nada: el lote vuelve a la bandeja
+                        NotificacionLicencia.objects.filter(pk__in=cubiertos).update(
+                            estado=NotificacionLicencia.ESTADO_PENDIENTE,
+                            intentos=F("intentos") - 1,
+                        )
+                        raise
+
+            notificaciones = []
+            for notificacion, avisos_correo in pares:
+                avisos_de[id(notificacion)] = avisos_correo
+                notificaciones.append(notificacion)
+            if len(connections) > 1:
+                send_notifications_concurrent(
+                    notificaciones,
+                    connections=connections,
+                    max_retries=max_retries,
+                    on_send=marcar_envio,
+                    on_result=registrar,
+                )
+            else:
+                send_notifications(
+                    notificaciones,
+                    batch_size=0,
+                    pause=0,
+                    max_retries=max_retries,
+                    connection=connections[0],
+                    on_send=marcar_envio,
+                    on_result=registrar,
+                )
+            if pause:
+                time.sleep(pause)
+    finally:
+        for connection in connections:
+            connection.close()
+
+    return ResultadoEnvio(enviadas, time.monotonic() - started)
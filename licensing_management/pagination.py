@@ -0,0 +1,149 @@
+# licensing_management/pagination.py
+import base64
+import json
+from collections import namedtuple
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection
+from django.db.models import Q
+
+LIMITE_CONTEO = 1000  # Con filtros se cuenta hasta aquí; más allá se muestra "más de N"
+
+# tipo: "exacto", "estimado" (estadísticas de PostgreSQL) o "minimo" (se alcanzó el límite)
+Conteo = namedtuple("Conteo", ["total", "tipo"])
+
+
+def encode_cursor(valores):
+    """
+    Convierte los valores de la llave de orden de una fila en un token para la URL.
+    """
+    data = json.dumps(list(valores), cls=DjangoJSONEncoder).encode()
+    return base64.urlsafe_b64encode(data).decode().rstrip("=")
+
+
+def decode_cursor(token, campos):
+    """
+    Recupera los valores de un token; retorna None si el token no es válido: tiene
+    que ser una lista de escalares JSON con un valor por campo.
+    """
+    try:
+        data = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        valores = json.loads(data)
+    except (ValueError, TypeError):
+        return None
+    if not isinstance(valores, list) or len(valores) != len(campos):
+        return None
+    # Listas u objetos anidados harían fallar el filtro de seek() con un error 500
+    if not all(valor is None or isinstance(valor, (str, int, float)) for valor in valores):
+        return None
+    return valores
+
+
+def seek(campos, valores, lookup):
+    """
+    Filtro "fila > cursor" (o "<") sobre varias columnas:
+    a > x OR (a = x AND b > y) OR ...
+    El límite a >= x que lo acompaña permite a PostgreSQL hacer un recorrido
+    de rango sobre el índice compuesto en lugar de leer la tabla completa.
+    """
+    condicion = Q()
+    iguales = {}
+    for campo, valor in zip(campos, valores):
+        condicion |= Q(**iguales, **{f"{campo}__{lookup}": valor})
+        iguales[campo] = valor
+    return Q(**{f"{campos[0]}__{lookup}e": valores[0]}) & condicion
+
+
+class KeysetPage:
+    """
+    Una página obtenida por búsqueda de llave (keyset): en lugar de OFFSET, la
+    siguiente página empieza justo después de la última fila de la actual, así que
+    cualquier página cuesta lo mismo que la primera.
+    """
+
+    def __init__(self, object_list, campos, has_next, has_previous):
+        self.object_list = object_list
+        self.campos = campos
+        self.has_next = has_next
+        self.has_previous = has_previous
+
+    def _cursor(self, fila):
+        if isinstance(fila, dict):
+            return encode_cursor(fila[campo] for campo in self.campos)
+        return encode_cursor(getattr(fila, campo) for campo in self.campos)
+
+    @property
+    def next_cursor(self):
+        if not self.has_next or not self.object_list:
+            return None
+        return self._cursor(self.object_list[-1])
+
+    @property
+    def previous_cursor(self):
+        if not self.has_previous or not self.object_list:
+            return None
+        return self._cursor(self.object_list[0])
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+
+def paginate_keyset(queryset, campos, per_page, after=None, before=None):
+    """
+    Pagina el queryset ordenado de forma ascendente por `campos` (que en conjunto
+    deben ser únicos). `after`/`before` son tokens de encode_cursor: la página
+    empieza después de `after` o termina antes de `before`. Un token inválido se
+    trata como la primera página.
+    """
+    campos = list(campos)
+    valores_after = decode_cursor(after, campos) if after else None
+    valores_before = decode_cursor(before, campos) if before else None
+
+    if valores_before is not None:
+        # Hacia atrás: se recorre el índice al revés y se voltea el resultado
+        filas = list(
+            queryset.filter(seek(campos, valores_before, "lt")).order_by(
+                *(f"-{campo}" for campo in campos)
+            )[: per_page + 1]
+        )
+        has_previous = len(filas) > per_page
+        filas = filas[:per_page]
+        filas.reverse()
+        return KeysetPage(filas, campos, has_next=True, has_previous=has_previous)
+
+    if valores_after is not None:
+        queryset = queryset.filter(seek(campos, valores_after, "gt"))
+    filas = list(queryset.order_by(*campos)[: per_page + 1])
+    has_next = len(filas) > per_page
+    return KeysetPage(
+        filas[:per_page],
+        campos,
+        has_next=has_next,
+        has_previous=valores_after is not None,
+    )
+
+
+def estimate_count(queryset, limite=LIMITE_CONTEO):
+    """
+    Total aproximado sin COUNT(*) sobre toda la tabla. Sin filtros se usa la
+    estimación de PostgreSQL (pg_class.reltuples, actualizada por ANALYZE); con
+    filtros, o si la tabla es chica, se cuenta hasta `limite` filas. Retorna un Conteo.
+    """
+    if not queryset.query.where and connection.vendor == "postgresql":
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass",
+                [queryset.model._meta.db_table],
+            )
+            fila = cursor.fetchone()
+        # -1: la tabla aún no se ha analizado. En tablas chicas el conteo exacto es barato.
+        if fila and fila[0] > limite:
+            return Conteo(fila[0], "estimado")
+
+    total = queryset.order_by().values("pk")[: limite + 1].count()
+    if total > limite:
+        return Conteo(limite, "minimo")
+    return Conteo(total, "exacto")
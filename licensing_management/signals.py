@@ -0,0 +1,64 @@
+# licensing_management/signals.py
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import Signal, receiver
+
+from .caching import invalidate_client_details, invalidate_clients
+
+# Se envía después de cambios masivos a licencias que no pasan por save()/delete()
+# (UPDATE o bulk_create), con cliente_ids = claves de los clientes afectados.
+licencias_actualizadas = Signal()
+
+CLIENTE = "licensing_management.Cliente"
+LICENCIA = "licensing_management.Licencia"
+SISTEMA = "licensing_management.Sistema"
+
+
+def _recalcular(cliente_ids):
+    from .models import ResumenLicenciasCliente
+
+    ResumenLicenciasCliente.recalcular(cliente_ids)
+
+
+@receiver(post_save, sender=CLIENTE)
+@receiver(post_delete, sender=CLIENTE)
+def cliente_modificado(sender, instance, **kwargs):
+    invalidate_clients([instance.pk])
+
+
+@receiver(post_save, sender=SISTEMA)
+@receiver(post_delete, sender=SISTEMA)
+def sistema_modificado(sender, instance, **kwargs):
+    invalidate_client_details()
+
+
+@receiver(post_init, sender=LICENCIA)
+def recordar_cliente(sender, instance, **kwargs):
+    # Cliente al cargar la licencia, para actualizar también su resumen si se reasigna.
+    # Se lee de __dict__ para no disparar una consulta si el campo fue diferido.
+    instance._cliente_id_cargado = instance.__dict__.get("cliente_id")
+
+
+@receiver(post_save, sender=LICENCIA)
+def licencia_guardada(sender, instance, raw=False, **kwargs):
+    cliente_ids = {instance.cliente_id, instance._cliente_id_cargado} - {None}
+    invalidate_clients(cliente_ids)
+    if raw:  # loaddata: los resúmenes se reconstruyen con rebuild_license_summaries
+        return
+    _recalcular(cliente_ids)
+    instance._cliente_id_cargado = instance.cliente_id
+
+
+@receiver(post_delete, sender=LICENCIA)
+def licencia_eliminada(sender, instance, origin=None, **kwargs):
+    # Si se eliminó el cliente completo, su resumen se borra en cascada junto con él;
+    # recalcularlo volvería a insertar una fila que apunta a un cliente inexistente.
+    if origin is not None and getattr(origin, "model", type(origin)) is not sender:
+        return
+    invalidate_clients([instance.cliente_id])
+    _recalcular([instance.cliente_id])
+
+
+@receiver(licencias_actualizadas)
+def licencias_actualizadas_en_bloque(sender, cliente_ids, **kwargs):
+    invalidate_clients(cliente_ids)
+    _recalcular(cliente_ids)
@@ -1,3 +1,2074 @@
-from django.test import TestCase
+import asyncio
+import csv
+import io
+import json
+import os
+import re
+import smtplib
+import socket
+import tempfile
+import threading
+import time
+import unittest
+from collections import namedtuple
+from datetime import date, timedelta
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+import fdb
+from dateutil.relativedelta import relativedelta
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.core.cache import cache
+from django.core.mail import EmailMessage
+from django.core.mail.backends.locmem import EmailBackend as LocmemBackend
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.db.models import Exists, OuterRef, Q
+from django.db.models.signals import post_init
+from django.template import engines
+from django.template.loader import get_template
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from . import caching, firebird_connector, notifications
+from .expiry import compute_end_dates, compute_estados, to_dates
+from .filters import filter_clients
+from .management.commands import import_clients, import_licenses
+from .models import (
+    CalendarioVencimientos,
+    Cliente,
+    GeneracionCache,
+    Licencia,
+    LicenciaQuerySet,
+    NotificacionLicencia,
+    RenovacionLicencia,
+    ResumenLicenciasCliente,
+    Sistema,
+)
+from .notifications import (
+    RECLAMO_VENCIDO,
+    Notificacion,
+    process_outbox,
+    send_notifications,
+    send_notifications_concurrent,
+)
+from .pagination import encode_cursor
+from .views import CLIENTES_POR_PAGINA
+
+try:
+    from aiosmtpd.controller import Controller
+except ImportError:  # Solo se usa como servidor SMTP de prueba
+    Controller = None
+
+try:
+    import openpyxl
+except ImportError:  # Solo se necesita para exportar a XLSX
+    openpyxl = None
+
+
+def _notificaciones(total, destinatario="cliente{}@example.com"):
+    return [
+        Notificacion(
+            [],
+            EmailMessage(f"Aviso {i}", "Cuerpo", "avisos@example.com", [destinatario.format(i)]),
+            f"Aviso {i}",
+        )
+        for i in range(total)
+    ]
+
+
+class RechazaBackend(LocmemBackend):
+    """
+    Backend en memoria que rechaza los destinatarios que empiezan con "rechazado".
+    """
+
+    def send_messages(self, messages):
+        for message in messages:
+            if message.to[0].startswith("rechazado"):
+                raise smtplib.SMTPRecipientsRefused({message.to[0]: (550, b"No existe")})
+        return super().send_messages(messages)
+
+
+@override_settings(EMAIL_BACKEND="django.core.mail.backends.locmem.EmailBackend")
+class SendNotificationsConcurrentTests(SimpleTestCase):
+    def test_envia_todas_y_reporta_cada_resultado(self):
+        notificaciones = _notificaciones(25)
+        reportadas = []
+
+        resultado = send_notifications_concurrent(
+            notificaciones, concurrency=4, on_result=reportadas.append
+        )
+
+        self.assertEqual(resultado.enviadas, 25)
+        self.assertEqual(resultado.fallidas, 0)
+        self.assertEqual(len(mail.outbox), 25)
+        self.assertCountEqual(reportadas, notificaciones)
+
+    @override_settings(EMAIL_BACKEND="licensing_management.tests.RechazaBackend")
+    def test_un_rechazo_no_detiene_los_demas(self):
+        notificaciones = _notificaciones(6)
+        notificaciones += _notificaciones(2, destinatario="rechazado{}@example.com")
+
+        resultado = send_notifications_concurrent(notificaciones, concurrency=3, backoff=0)
+
+        self.assertEqual(resultado.enviadas, 6)
+        self.assertEqual(resultado.fallidas, 2)
+        for notificacion in notificaciones[-2:]:
+            self.assertFalse(notificacion.enviada)
+            self.assertIsInstance(notificacion.error, smtplib.SMTPRecipientsRefused)
+
+
+class FakeSMTP:
+    """
+    Sustituye a smtplib.SMTP: registra cada sesión abierta y los correos de cada una.
+    Los errores de `fallas` se lanzan, en orden, en las siguientes llamadas a sendmail.
+    """
+
+    sesiones = []
+    fallas = []
+
+    def __init__(self, host, port, **kwargs):
+        self.enviados = []
+        self.cerrada = False
+        FakeSMTP.sesiones.append(self)
+
+    def sendmail(self, from_addr, to_addrs, msg):
+        if FakeSMTP.fallas:
+            raise FakeSMTP.fallas.pop(0)
+        self.enviados.append(to_addrs[0])
+
+    def quit(self):
+        self.cerrada = True
+
+    def close(self):
+        self.cerrada = True
+
+
+@override_settings(
+    EMAIL_BACKEND="django.core.mail.backends.smtp.EmailBackend",
+    EMAIL_USE_SSL=False,
+    EMAIL_USE_TLS=False,
+    EMAIL_HOST_USER="",
+    EMAIL_HOST_PASSWORD="",
+)
+class SendNotificationsRetryTests(SimpleTestCase):
+    def setUp(self):
+        FakeSMTP.sesiones = []
+        FakeSMTP.fallas = []
+        patcher = mock.patch("smtplib.SMTP", FakeSMTP)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_una_sola_sesion_para_todos_los_mensajes(self):
+        resultado = send_notifications(_notificaciones(5), pause=0, backoff=0)
+
+        self.assertEqual(resultado.enviadas, 5)
+        self.assertEqual(len(FakeSMTP.sesiones), 1)
+        self.assertEqual(len(FakeSMTP.sesiones[0].enviados), 5)
+        self.assertTrue(FakeSMTP.sesiones[0].cerrada)
+
+    def test_reconecta_si_el_servidor_cierra_la_sesion(self):
+        FakeSMTP.fallas = [smtplib.SMTPServerDisconnected("Conexión cerrada")]
+
+        resultado = send_notifications(_notificaciones(3), pause=0, backoff=0)
+
+        self.assertEqual(resultado.enviadas, 3)
+        primera, segunda = FakeSMTP.sesiones
+        self.assertEqual(primera.enviados, [])
+        self.assertEqual(len(segunda.enviados), 3)
+
+    def test_se_rinde_despues_de_max_retries(self):
+        FakeSMTP.fallas = [smtplib.SMTPServerDisconnected("Conexión cerrada")] * 10
+        notificacion = _notificaciones(1)[0]
+
+        resultado = send_notifications([notificacion], pause=0, max_retries=2, backoff=0)
+
+        self.assertEqual(resultado.fallidas, 1)
+        self.assertIsInstance(notificacion.error, smtplib.SMTPServerDisconnected)
+        # El intento original y dos reintentos, cada reintento en una sesión nueva
+        self.assertEqual(len(FakeSMTP.fallas), 7)
+        self.assertEqual(len(FakeSMTP.sesiones), 3)
+
+    def test_un_error_permanente_no_se_reintenta(self):
+        FakeSMTP.fallas = [
+            smtplib.SMTPRecipientsRefused({"cliente0@example.com": (550, b"No existe")})
+        ]
+
+        resultado = send_notifications(_notificaciones(2), pause=0, backoff=0)
+
+        self.assertEqual((resultado.enviadas, resultado.fallidas), (1, 1))
+        self.assertEqual(len(FakeSMTP.sesiones), 1)
+
+
+class _HandlerLento:
+    """
+    Servidor SMTP de prueba que tarda en aceptar cada mensaje, como un proveedor real.
+    Registra las sesiones que entregaron mensajes y cuántas lo hicieron a la vez.
+    """
+
+    def __init__(self, latencia):
+        self.latencia = latencia
+        self.recibidos = []
+        self.sesiones = set()
+        self.simultaneas = 0
+        self.max_simultaneas = 0
+
+    async def handle_DATA(self, server, session, envelope):
+        self.sesiones.add(id(session))
+        self.simultaneas += 1
+        self.max_simultaneas = max(self.max_simultaneas, self.simultaneas)
+        await asyncio.sleep(self.latencia)
+        self.simultaneas -= 1
+        self.recibidos.append(envelope.rcpt_tos[0])
+        return "250 OK"
+
+
+def _puerto_libre():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class ProcesoCaido(BaseException):
+    """
+    Simula que el proceso muere (no es un error de SMTP que se pueda reintentar).
+    """
+
+
+class CaeBackend(LocmemBackend):
+    """
+    Backend en memoria con el que el proceso muere al entregar el correo a `destinatario_caida`.
+    """
+
+    destinatario_caida = None
+
+    def send_messages(self, messages):
+        if messages[0].to[0] == self.destinatario_caida:
+            raise ProcesoCaido()
+        return super().send_messages(messages)
+
+
+@unittest.skipIf(Controller is None, "aiosmtpd no está instalado")
+class SendNotificationsSmtpServerTests(SimpleTestCase):
+    def setUp(self):
+        self.handler = _HandlerLento(latencia=0.05)
+        self.controller = Controller(self.handler, hostname="127.0.0.1", port=_puerto_libre())
+        self.controller.start()
+        self.addCleanup(self.controller.stop)
+        settings_smtp = override_settings(
+            EMAIL_BACKEND="django.core.mail.backends.smtp.EmailBackend",
+            EMAIL_HOST="127.0.0.1",
+            EMAIL_PORT=self.controller.port,
+            EMAIL_USE_SSL=False,
+            EMAIL_USE_TLS=False,
+            EMAIL_HOST_USER="",
+            EMAIL_HOST_PASSWORD="",
+        )
+        settings_smtp.enable()
+        self.addCleanup(settings_smtp.disable)
+
+    def test_en_serie_usa_una_sola_sesion(self):
+        resultado = send_notifications(_notificaciones(6), pause=0)
+
+        self.assertEqual(resultado.enviadas, 6)
+        self.assertEqual(len(self.handler.sesiones), 1)
+        self.assertEqual(self.handler.max_simultaneas, 1)
+
+    def test_reparte_los_mensajes_entre_sesiones_concurrentes(self):
+        resultado = send_notifications_concurrent(_notificaciones(20), concurrency=5)
+
+        self.assertEqual(resultado.enviadas, 20)
+        self.assertEqual(len(self.handler.recibidos), 20)
+        self.assertEqual(len(self.handler.sesiones), 5)
+        self.assertGreater(self.handler.max_simultaneas, 1)
+        self.assertLessEqual(self.handler.max_simultaneas, 5)
+
+
+@override_settings(
+    EMAIL_BACKEND="django.core.mail.backends.locmem.EmailBackend",
+    EMAIL_ADMON="admon@example.com",
+)
+class NotificationOutboxTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.aspel = Sistema.objects.create(nombre="SAE", categoria=Sistema.ASPEL)
+        cls.office = Sistema.objects.create(
+            nombre="Office 365", categoria=Sistema.MICROSOFT_OFFICE_365
+        )
+        cls.clientes = [
+            Cliente.objects.create(
+                clave_cliente=f"{i:>10}", nombre=f"Cliente {i}", correo_electronico=f"c{i}@example.com"
+            )
+            for i in range(1, 4)
+        ]
+
+    def _encolar(self, cliente, sistema, identificador, **campos):
+        licencia = Licencia.objects.create(
+            cliente=cliente,
+            tipo_sistema=sistema,
+            identificador_licencia=identificador,
+            tipo_licencia=Licencia.TIPO_SUSCRIPCION,
+            periodo_licencia=Licencia.PERIODO_MENSUAL,
+            fecha_inicio_vigencia=timezone.now().date() - timedelta(days=60),
+        )
+        return NotificacionLicencia.objects.create(
+            licencia=licencia,
+            tipo=NotificacionLicencia.TIPO_VENCIDA,
+            fecha_fin_vigencia=licencia.fecha_fin_vigencia,
+            **campos,
+        )
+
+    def test_el_resumen_de_un_destinatario_no_se_parte_entre_lotes(self):
+        for i, cliente in enumerate(self.clientes):
+            self._encolar(cliente, self.aspel, f"ASPEL-{i}")
+        self._encolar(self.clientes[0], self.office, "OFFICE-1")
+
+        resultado = process_outbox(batch_size=2, pause=0, digest=True)
+
+        self.assertEqual(resultado.enviadas, 2)
+        internos = [m for m in mail.outbox if m.to == ["admon@example.com"]]
+        self.assertEqual(len(internos), 1)
+        self.assertIn("3 Licencias Aspel", internos[0].subject)
+        self.assertFalse(
+            NotificacionLicencia.objects.exclude(estado=NotificacionLicencia.ESTADO_ENVIADA).exists()
+        )
+
+    @override_settings(EMAIL_ADMON=None)
+    def test_sin_email_admon_no_se_envia_el_resumen_aspel(self):
+        avisos = [
+            self._encolar(cliente, self.aspel, f"ASPEL-{i}")
+            for i, cliente in enumerate(self.clientes[:2])
+        ]
+
+        with self.assertLogs("licensing_management.notifications", "WARNING"):
+            resultado = process_outbox(pause=0, digest=True)
+
+        self.assertEqual(resultado.enviadas, 0)
+        self.assertEqual(mail.outbox, [])
+        for aviso in avisos:
+            aviso.refresh_from_db()
+            self.assertEqual(aviso.estado, NotificacionLicencia.ESTADO_FALLIDA)
+
+    def test_los_avisos_reclamados_solo_se_retoman_al_vencer_el_reclamo(self):
+        reciente = self._encolar(
+            self.clientes[0],
+            self.office,
+            "RECIENTE",
+            estado=NotificacionLicencia.ESTADO_ENVIANDO,
+            fecha_reclamo=timezone.now(),
+        )
+        abandonado = self._encolar(
+            self.clientes[1],
+            self.office,
+            "ABANDONADO",
+            estado=NotificacionLicencia.ESTADO_ENVIANDO,
+            fecha_reclamo=timezone.now() - RECLAMO_VENCIDO - timedelta(minutes=1),
+        )
+
+        process_outbox(pause=0)
+
+        reciente.refresh_from_db()
+        abandonado.refresh_from_db()
+        self.assertEqual(reciente.estado, NotificacionLicencia.ESTADO_ENVIANDO)
+        self.assertEqual(abandonado.estado, NotificacionLicencia.ESTADO_ENVIADA)
+        self.assertEqual([m.to for m in mail.outbox], [["c2@example.com"]])
+
+    def test_una_bandeja_vacia_no_abre_sesiones_smtp(self):
+        with mock.patch("licensing_management.notifications.open_connections") as abrir:
+            resultado = process_outbox(pause=0, concurrency=4)
+
+        abrir.assert_not_called()
+        self.assertEqual(resultado.notificaciones, [])
+
+    @override_settings(EMAIL_BACKEND="licensing_management.tests.CaeBackend")
+    def test_si_el_proceso_muere_ningun_correo_se_envia_dos_veces(self):
+        avisos = [
+            self._encolar(cliente, self.office, f"OFFICE-{i}")
+            for i, cliente in enumerate(self.clientes)
+        ]
+        CaeBackend.destinatario_caida = "c2@example.com"
+        self.addCleanup(setattr, CaeBackend, "destinatario_caida", None)
+
+        with self.assertRaises(ProcesoCaido):
+            process_outbox(pause=0)
+
+        for aviso in avisos:
+            aviso.refresh_from_db()
+        enviado, interrumpido, sin_enviar = avisos
+        # El resultado del primero se guardó antes de caer; los tres contaron un intento
+        self.assertEqual(enviado.estado, NotificacionLicencia.ESTADO_ENVIADA)
+        self.assertEqual(interrumpido.estado, NotificacionLicencia.ESTADO_ENVIANDO)
+        self.assertIsNotNone(interrumpido.fecha_envio)
+        self.assertEqual(sin_enviar.estado, NotificacionLicencia.ESTADO_ENVIANDO)
+        self.assertIsNone(sin_enviar.fecha_envio)
+        self.assertEqual([aviso.intentos for aviso in avisos], [1, 1, 1])
+
+        CaeBackend.destinatario_caida = None
+        NotificacionLicencia.objects.filter(
+            estado=NotificacionLicencia.ESTADO_ENVIANDO
+        ).update(fecha_reclamo=timezone.now() - RECLAMO_VENCIDO - timedelta(minutes=1))
+        process_outbox(pause=0)
+
+        for aviso in avisos:
+            aviso.refresh_from_db()
+        self.assertEqual(interrumpido.estado, NotificacionLicencia.ESTADO_FALLIDA)
+        self.assertEqual(sin_enviar.estado, NotificacionLicencia.ESTADO_ENVIADA)
+        self.assertEqual(sin_enviar.intentos, 2)
+        self.assertEqual(
+            [m.to for m in mail.outbox], [["c1@example.com"], ["c3@example.com"]]
+        )
+
+    @override_settings(
+        EMAIL_BACKEND="django.core.mail.backends.smtp.EmailBackend",
+        EMAIL_HOST="127.0.0.1",
+        EMAIL_PORT=1,  # Nadie escucha: la conexión se rechaza
+        EMAIL_USE_TLS=False,
+        EMAIL_USE_SSL=False,
+        EMAIL_TIMEOUT=1,
+    )
+    def test_sin_servidor_de_correo_el_comando_falla(self):
+        aviso = self._encolar(self.clientes[0], self.office, "OFFICE-1")
+
+        with self.assertRaisesMessage(CommandError, "No se pudo conectar al servidor de correo"):
+            call_command("process_notification_outbox", stdout=io.StringIO())
+        aviso.refresh_from_db()
+        self.assertEqual(aviso.estado, NotificacionLicencia.ESTADO_PENDIENTE)
+
+
+def _lineas(texto):
+    """
+    Líneas no vacías del texto con los espacios normalizados, para comparar cuerpos
+    de correo sin depender de la sangría.
+    """
+    return [" ".join(linea.split()) for linea in texto.splitlines() if linea.strip()]
+
+
+class RenderEmailTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cliente = Cliente.objects.create(
+            clave_cliente="         1", nombre="Tecno & Cía", rfc="TEC010101AAA"
+        )
+        cls.licencias = {
+            categoria: Licencia.objects.create(
+                cliente=cliente,
+                tipo_sistema=Sistema.objects.create(nombre=nombre, categoria=categoria),
+                identificador_licencia=f"LIC-{nombre}",
+                tipo_licencia=Licencia.TIPO_SUSCRIPCION,
+                periodo_licencia=Licencia.PERIODO_ANUAL,
+                fecha_inicio_vigencia=date(2025, 3, 1),
+            )
+            for nombre, categoria in [("SAE", Sistema.ASPEL), ("Office 365", Sistema.MICROSOFT_OFFICE_365)]
+        }
+
+    def _render_anterior(self, plantilla, licencia):
+        # Plantilla HTML como era antes de separar el cierre: con el fragmento en línea
+        with open(get_template(f"{plantilla}.html").origin.name, encoding="utf-8") as archivo:
+            fuente = archivo.read()
+        with open(get_template("emails/fragments/cierre.html").origin.name, encoding="utf-8") as archivo:
+            cierre = archivo.read().split("\n", 1)[1]  # Sin el comentario de la ruta
+        fuente = re.sub(r"\{#[^#]*#\}\s*\{\{ cierre \}\}", lambda m: cierre, fuente)
+        return engines["django"].from_string(fuente).render(notifications._license_context(licencia))
+
+    def test_el_html_es_el_mismo_que_con_el_cierre_en_linea(self):
+        for plantilla in ["emails/expired_license_notification", "emails/license_per_renew_notification"]:
+            for licencia in self.licencias.values():
+                with self.subTest(plantilla=plantilla, sistema=licencia.tipo_sistema.nombre):
+                    _, html = notifications.render_email(
+                        plantilla, notifications._license_context(licencia), licencia.tipo_sistema
+                    )
+                    self.assertEqual(_lineas(html), _lineas(self._render_anterior(plantilla, licencia)))
+
+    def test_el_texto_plano_es_el_de_antes(self):
+        office = self.licencias[Sistema.MICROSOFT_OFFICE_365]
+        vence = office.fecha_fin_vigencia.strftime("%d/%m/%Y")
+        anteriores = {
+            "emails/expired_license_notification": f"""
+                Estimado/a responsable de la empresa:  Tecno & Cía,
+
+                Le informamos que su licencia de suscripción para Office 365 (ID: LIC-Office 365) ha vencido el {vence}.
+
+                Por favor, contacteme para renovar su servicio.
+
+                Atentamente,
+                Ing. Miguel Angel López Monroy
+                TECNOIT
+                """,
+            "emails/license_per_renew_notification": f"""
+                Estimado/a responsable de la empresa:  Tecno & Cía,
+
+                Le informamos que su licencia de suscripción para Office 365 (ID: LIC-Office 365) está por vencer el {vence}.
+
+                Por favor, contacteme a la brevedad posible para renovar su servicio.
+
+                Atentamente,
+                Ing. Miguel Angel López Monroy
+                TECNOIT
+                """,
+        }
+        for plantilla, anterior in anteriores.items():
+            with self.subTest(plantilla=plantilla):
+                texto, _ = notifications.render_email(
+                    plantilla, notifications._license_context(office), office.tipo_sistema
+                )
+                self.assertEqual(_lineas(texto), _lineas(anterior))
+
+    def test_el_texto_plano_interno_de_aspel_es_el_de_antes(self):
+        aspel = self.licencias[Sistema.ASPEL]
+        anterior = f"""
+                Notificación interna: Licencia Aspel vencida.
+
+                Detalles del Cliente:
+                Nombre: Tecno & Cía
+                RFC: TEC010101AAA
+
+                Detalles de la Licencia:
+                Sistema: SAE
+                Identificador: LIC-SAE
+                Periodicidad: {aspel.get_periodo_licencia_display()}
+                Fecha de Vencimiento: {aspel.fecha_fin_vigencia.strftime("%d/%m/%Y")}
+                Estado: {aspel.get_estado_display()}
+
+                Acción requerida: Contactar al cliente para renovación.
+                """
+
+        texto, _ = notifications.render_email(
+            "emails/expired_license_notification",
+            notifications._license_context(aspel),
+            aspel.tipo_sistema,
+        )
+
+        self.assertEqual(_lineas(texto), _lineas(anterior))
+
+    def test_la_cache_de_fragmentos_esta_acotada(self):
+        self.assertEqual(
+            notifications._render_fragment.cache_info().maxsize,
+            notifications.FRAGMENTOS_EN_CACHE,
+        )
+
+
+def _vigencia_hasta(fin):
+    """
+    Fecha de inicio y periodo con los que PostgreSQL calcula `fin` como fecha de fin
+    de vigencia (fecha_fin_vigencia es una columna generada).
+    """
+    if (fin.month, fin.day) == (2, 29):
+        return {
+            "fecha_inicio_vigencia": fin - relativedelta(months=1),
+            "periodo_licencia": Licencia.PERIODO_MENSUAL,
+        }
+    return {
+        "fecha_inicio_vigencia": fin - relativedelta(years=1),
+        "periodo_licencia": Licencia.PERIODO_ANUAL,
+    }
+
+
+@unittest.skipUnless(connection.vendor == "postgresql", "Los planes son de PostgreSQL")
+class LicenciaIndexTests(TestCase):
+    """
+    Verifica con EXPLAIN que las consultas frecuentes sobre Licencia se resuelven con
+    los índices de Licencia.Meta.indexes. Con pocos datos PostgreSQL preferiría leer
+    la tabla, así que se desactiva el recorrido secuencial: si el plan aún no usa el
+    índice esperado es porque el índice ya no sirve para esa consulta.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        today = timezone.now().date()
+        office = Sistema.objects.create(
+            nombre="Office 365", categoria=Sistema.MICROSOFT_OFFICE_365
+        )
+        aspel = Sistema.objects.create(nombre="SAE", categoria=Sistema.ASPEL)
+        clientes = Cliente.objects.bulk_create(
+            Cliente(clave_cliente=f"{i:>10}", nombre=f"Cliente {i}") for i in range(200)
+        )
+        estados = [
+            Licencia.ESTADO_ACTIVA,
+            Licencia.ESTADO_VENCIDA,
+            Licencia.ESTADO_PENDIENTE_RENOVACION,
+        ]
+        tipos = [Licencia.TIPO_SUSCRIPCION, Licencia.TIPO_ELECTRONICA]
+        Licencia.objects.bulk_create(
+            Licencia(
+                cliente=clientes[i % len(clientes)],
+                tipo_sistema=aspel if i % 5 == 0 else office,
+                identificador_licencia=f"LIC-{i}",
+                tipo_licencia=tipos[i % len(tipos)],
+                periodo_licencia=Licencia.PERIODO_ANUAL,
+                estado=estados[i % len(estados)],
+                # Fechas de fin desde hace 200 días hasta dentro de 200
+                fecha_inicio_vigencia=today - timedelta(days=365 + 200 - i % 400),
+            )
+            for i in range(4000)
+        )
+        cls.today = today
+        cls.cliente = clientes[0]
+
+    def setUp(self):
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE licensing_management_licencia")
+            cursor.execute("SET LOCAL enable_seqscan = off")
+
+    def assertUsesIndex(self, queryset, index_name):
+        plan = queryset.explain()
+        self.assertIn(index_name, plan, msg=f"Plan sin {index_name}:\n{plan}")
+
+    def test_suscripciones_vencidas_de_un_cliente(self):
+        vencidas = Licencia.objects.filter(
+            cliente=OuterRef("pk"),
+            tipo_licencia=Licencia.TIPO_SUSCRIPCION,
+            fecha_fin_vigencia__lt=self.today,
+        )
+        queryset = Cliente.objects.annotate(
+            has_expired_subscription_license=Exists(vencidas)
+        ).filter(pk=self.cliente.pk)
+        self.assertUsesIndex(queryset, "licencia_susc_cliente_idx")
+
+    def test_licencias_vencidas(self):
+        queryset = Licencia.objects.filter(
+            tipo_licencia=Licencia.TIPO_SUSCRIPCION, estado=Licencia.ESTADO_VENCIDA
+        )
+        self.assertUsesIndex(queryset, "licencia_susc_estado_idx")
+
+    def test_licencias_por_renovar(self):
+        queryset = Licencia.objects.filter(
+            ~Q(tipo_sistema__categoria=Sistema.ASPEL),
+            tipo_licencia=Licencia.TIPO_SUSCRIPCION,
+            estado=Licencia.ESTADO_PENDIENTE_RENOVACION,
+        ).select_related("cliente", "tipo_sistema")
+        self.assertUsesIndex(queryset, "licencia_susc_estado_idx")
+
+    def test_orden_por_defecto(self):
+        self.assertUsesIndex(Licencia.objects.all()[:50], "licencia_fin_cliente_idx")
+
+    def test_ventana_de_aviso_de_update_estados(self):
+        estado, condicion = LicenciaQuerySet.estado_conditions(self.today)[1]
+        queryset = Licencia.objects.filter(condicion).exclude(estado=estado)
+        self.assertUsesIndex(queryset, "licencia_fin_cliente_idx")
+
+
+# Caché en memoria para las pruebas de vistas, en lugar de la de archivos compartida
+CACHE_PRUEBAS = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "pruebas",
+    }
+}
+
+
+class QueryCountMixin:
+    """
+    Fija el número de consultas de una vista. assertQueriesConstant además comprueba
+    que el número no crece con los datos (detecta consultas N+1). Cada medición parte
+    de la caché sin fragmentos, así que cuenta la vista completa; las generaciones ya
+    están en la caché, como en un servidor en marcha.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.clear_fragments()
+
+    def clear_fragments(self):
+        cache.clear()
+        caching._generacion(caching.LISTA_CLIENTES)
+        caching._generacion(caching.DETALLE_CLIENTE)
+
+    def assertViewQueries(self, expected, url, method="get", data=None, status=200):
+        with self.assertNumQueries(expected):
+            response = getattr(self.client, method)(url, data)
+        self.assertEqual(response.status_code, status)
+        return response
+
+    def assertQueriesConstant(self, expected, url, grow):
+        self.assertViewQueries(expected, url)
+        grow()
+        self.clear_fragments()
+        self.assertViewQueries(expected, url)
+
+
+@override_settings(CACHES=CACHE_PRUEBAS)
+class ViewQueryCountTests(QueryCountMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.sistema = Sistema.objects.create(
+            nombre="Office 365", categoria=Sistema.MICROSOFT_OFFICE_365
+        )
+        cls.cliente = Cliente.objects.create(
+            clave_cliente="         1", nombre="Tecnoit", rfc="TEC010101AAA"
+        )
+        Cliente.objects.bulk_create(
+            Cliente(clave_cliente=f"{i:>10}", nombre=f"Cliente {i}") for i in range(2, 80)
+        )
+        cls.licencia = cls._add_licenses(3)[0]
+
+    @classmethod
+    def _add_licenses(cls, total):
+        inicio = Licencia.objects.filter(cliente=cls.cliente).count()
+        licencias = []
+        for i in range(inicio, inicio + total):
+            licencia = Licencia(
+                cliente=cls.cliente,
+                tipo_sistema=cls.sistema,
+                identificador_licencia=f"LIC-{i}",
+                tipo_licencia=Licencia.TIPO_SUSCRIPCION,
+                periodo_licencia=Licencia.PERIODO_ANUAL,
+                fecha_inicio_vigencia=timezone.now().date() - timedelta(days=400 * (i % 2)),
+            )
+            licencia.save()
+            licencias.append(licencia)
+        return licencias
+
+    def _detail_url(self):
+        return reverse("client_detail", args=[self.cliente.clave_cliente])
+
+    def test_home(self):
+        self.assertViewQueries(0, reverse("home"))
+
+    def test_expiry_calendar(self):
+        # Una lectura de la vista materializada, sin importar cuántas licencias haya
+        CalendarioVencimientos.refrescar()
+        self.assertViewQueries(1, reverse("expiry_calendar"))
+        self.assertViewQueries(1, reverse("expiry_calendar"), data={"vista": "SEMANA"})
+
+    def test_client_list(self):
+        # Página, estimación de pg_class y conteo acotado (la tabla es chica)
+        self.assertQueriesConstant(
+            3,
+            reverse("client_list"),
+            lambda: Cliente.objects.bulk_create(
+                Cliente(clave_cliente=f"{i:>10}", nombre=f"Nuevo {i}")
+                for i in range(100, 160)
+            ),
+        )
+
+    def test_client_list_filters_and_next_page(self):
+        # Con filtros no se consulta pg_class: página + conteo acotado
+        response = self.assertViewQueries(2, reverse("client_list"), data={"rfc": "tec"})
+        self.assertContains(response, "Tecnoit")
+        response = self.assertViewQueries(3, reverse("client_list"))
+        self.assertViewQueries(3, reverse("client_list") + response.context["url_siguiente"])
+
+    def test_client_list_similar(self):
+        response = self.assertViewQueries(
+            2, reverse("client_list"), data={"nombre": "tecnoyt", "similar": "1"}
+        )
+        self.assertContains(response, "Tecnoit")
+
+    def test_client_detail(self):
+        # Cliente + licencias con su sistema, sin importar cuántas licencias tenga
+        self.assertQueriesConstant(
+            2, self._detail_url(), lambda: self._add_licenses(20)
+        )
+
+    def test_add_license(self):
+        url = reverse("add_license", args=[self.cliente.clave_cliente])
+        self.assertViewQueries(2, url)
+        data = {
+            "tipo_sistema": self.sistema.pk,
+            "identificador_licencia": "LIC-NUEVA",
+            "tipo_licencia": Licencia.TIPO_SUSCRIPCION,
+            "periodo_licencia": Licencia.PERIODO_MENSUAL,
+            "fecha_inicio_vigencia": timezone.now().date().isoformat(),
+            "estado": Licencia.ESTADO_ACTIVA,
+            "numero_usuarios": 1,
+        }
+        # Cliente, sistema, validación de unicidad, INSERT y resumen del cliente
+        self.assertViewQueries(6, url, method="post", data=data, status=302)
+
+    def test_update_license(self):
+        url = reverse(
+            "update_license", args=[self.cliente.clave_cliente, self.licencia.pk]
+        )
+        self.assertViewQueries(2, url)
+        data = {
+            "version_sistema": "2.0",
+            "fecha_inicio_vigencia": timezone.now().date().isoformat(),
+            "estado": Licencia.ESTADO_ACTIVA,
+            "pago_realizado": "on",
+        }
+        self.assertViewQueries(6, url, method="post", data=data, status=302)
+
+    def test_delete_license(self):
+        url = reverse(
+            "delete_license", args=[self.cliente.clave_cliente, self.licencia.pk]
+        )
+        # Cliente, licencia, borrado en cascada de sus avisos y renovaciones y resumen
+        # del cliente
+        self.assertViewQueries(6, url, method="post", status=302)
+
+    def test_admin_licencia_changelist(self):
+        self.client.force_login(
+            get_user_model().objects.create_superuser("admin", "admin@example.com", "x")
+        )
+        # Sesión, usuario, conteo y la página con cliente y sistema precargados
+        self.assertQueriesConstant(
+            4,
+            reverse("admin:licensing_management_licencia_changelist"),
+            lambda: self._add_licenses(20),
+        )
+
+    def test_admin_notificacion_changelist(self):
+        self.client.force_login(
+            get_user_model().objects.create_superuser("admin", "admin@example.com", "x")
+        )
+
+        def encolar():
+            NotificacionLicencia.objects.bulk_create(
+                NotificacionLicencia(
+                    licencia=licencia,
+                    tipo=NotificacionLicencia.TIPO_POR_VENCER,
+                    fecha_fin_vigencia=licencia.fecha_fin_vigencia,
+                )
+                for licencia in self._add_licenses(10)
+            )
+
+        self.assertQueriesConstant(
+            4,
+            reverse("admin:licensing_management_notificacionlicencia_changelist"),
+            encolar,
+        )
+
+
+@override_settings(CACHES=CACHE_PRUEBAS)
+class ClientSearchTests(TestCase):
+    NOMBRES = [
+        "FERRETERIA GONZALEZ",
+        "FERRETERIA GOMEZ",
+        "PAPELERIA GONZALEZ",
+        "GONZALEZ Y ASOCIADOS",
+        "TECNOIT SOLUCIONES",
+    ]
+
+    @classmethod
+    def setUpTestData(cls):
+        Cliente.objects.bulk_create(
+            Cliente(clave_cliente=f"{i:>10}", nombre=nombre)
+            for i, nombre in enumerate(cls.NOMBRES, start=1)
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def _buscar(self, nombre):
+        clientes = filter_clients(Cliente.objects.all(), nombre=nombre, similar=True)
+        return list(
+            clientes.order_by("distancia", "nombre").values_list("nombre", flat=True)
+        )
+
+    def test_los_errores_de_escritura_cercanos_van_primero(self):
+        self.assertEqual(self._buscar("ferreteria gonzales")[0], "FERRETERIA GONZALEZ")
+        self.assertEqual(self._buscar("Ferreteria Gomes")[0], "FERRETERIA GOMEZ")
+        self.assertEqual(self._buscar("tecnoyt")[0], "TECNOIT SOLUCIONES")
+
+    def test_los_indices_de_trigramas_existen(self):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT indexname, indexdef FROM pg_indexes WHERE tablename = %s",
+                [Cliente._meta.db_table],
+            )
+            indices = dict(cursor.fetchall())
+        for nombre, columna in [
+            ("cliente_nombre_trgm_idx", "upper((nombre)::text)"),
+            ("cliente_rfc_trgm_idx", "upper((rfc)::text)"),
+        ]:
+            with self.subTest(indice=nombre):
+                self.assertIn("USING gin", indices[nombre])
+                self.assertIn(f"{columna} gin_trgm_ops", indices[nombre])
+
+    def test_la_busqueda_aproximada_usa_el_indice(self):
+        with connection.cursor() as cursor:
+            cursor.execute("SET LOCAL enable_seqscan = off")
+        plan = (
+            filter_clients(Cliente.objects.all(), nombre="ferreteria gonzales", similar=True)
+            .order_by()
+            .explain()
+        )
+        self.assertIn("cliente_nombre_trgm_idx", plan)
+
+    def test_la_busqueda_aproximada_se_pagina(self):
+        Cliente.objects.bulk_create(
+            Cliente(clave_cliente=f"{i:>10}", nombre=f"FERRETERIA SUCURSAL {i}")
+            for i in range(100, 100 + CLIENTES_POR_PAGINA + 10)
+        )
+        parametros = {"nombre": "ferreteria", "similar": "1"}
+
+        vistos = []
+        url = reverse("client_list")
+        while url:
+            response = self.client.get(url, parametros if not vistos else None)
+            vistos += [cliente.nombre for cliente in response.context["clientes"]]
+            siguiente = response.context["url_siguiente"]
+            url = reverse("client_list") + siguiente if siguiente else None
+
+        esperados = Cliente.objects.filter(nombre__startswith="FERRETERIA").count()
+        self.assertEqual(len(vistos), esperados)
+        self.assertEqual(len(set(vistos)), esperados)
+
+
+@override_settings(CACHES=CACHE_PRUEBAS)
+class ViewCacheTests(QueryCountMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.sistema = Sistema.objects.create(
+            nombre="Office 365", categoria=Sistema.MICROSOFT_OFFICE_365
+        )
+        cls.cliente = Cliente.objects.create(clave_cliente="         1", nombre="Tecnoit")
+        cls.licencia = Licencia.objects.create(
+            cliente=cls.cliente,
+            tipo_sistema=cls.sistema,
+            identificador_licencia="LIC-1",
+            tipo_licencia=Licencia.TIPO_SUSCRIPCION,
+            periodo_licencia=Licencia.PERIODO_MENSUAL,
+            fecha_inicio_vigencia=timezone.now().date(),
+        )
+        cls.detail_url = reverse("client_detail", args=[cls.cliente.clave_cliente])
+
+    def test_client_detail_se_invalida_al_cambiar_una_licencia(self):
+        self.assertViewQueries(2, self.detail_url)
+        # Solo el cliente: las licencias salen de la caché
+        response = self.assertViewQueries(1, self.detail_url)
+        # El token CSRF queda fuera del fragmento guardado
+        self.assertContains(response, 'id="eliminar-licencia"')
+        self.assertContains(response, "csrfmiddlewaretoken", count=1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.licencia.version_sistema = "11.0"
+            self.licencia.save()
+        response = self.assertViewQueries(2, self.detail_url)
+        self.assertContains(response, "11.0")
+
+    def test_client_detail_se_invalida_con_update_estados(self):
+        self.assertContains(self.client.get(self.detail_url), "Activa")
+        # Una licencia mensual que empezó hace 32 días ya venció
+        Licencia.objects.filter(pk=self.licencia.pk).update(
+            fecha_inicio_vigencia=timezone.now().date() - timedelta(days=32)
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            Licencia.objects.update_estados()
+        self.assertContains(self.client.get(self.detail_url), "Vencida")
+
+    def test_client_detail_se_invalida_al_renombrar_un_sistema(self):
+        self.client.get(self.detail_url)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.sistema.nombre = "Microsoft 365"
+            self.sistema.save()
+        self.assertContains(self.client.get(self.detail_url), "Microsoft 365")
+
+    def test_client_list_por_filtros(self):
+        url = reverse("client_list")
+        self.assertViewQueries(3, url)
+        self.assertViewQueries(0, url)
+        # Otros filtros, otra entrada
+        self.assertViewQueries(2, url, data={"nombre": "tec"})
+        self.assertViewQueries(0, url, data={"nombre": "tec"})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.cliente.nombre = "Tecnoit Consultores"
+            self.cliente.save()
+        response = self.assertViewQueries(2, url, data={"nombre": "tec"})
+        self.assertContains(response, "Tecnoit Consultores")
+
+
+@override_settings(CACHES=CACHE_PRUEBAS)
+class GeneracionCacheTests(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_las_invalidaciones_concurrentes_no_se_pierden(self):
+        inicial = caching._generacion(caching.LISTA_CLIENTES)
+        hilos, por_hilo = 8, 25
+        barrera = threading.Barrier(hilos)
+        obtenidas = []
+
+        def invalidar():
+            try:
+                barrera.wait()
+                for _ in range(por_hilo):
+                    obtenidas.append(caching._avanzar_generacion(caching.LISTA_CLIENTES))
+            finally:
+                connection.close()  # Cada hilo usa su propia conexión
+
+        trabajadores = [threading.Thread(target=invalidar) for _ in range(hilos)]
+        for trabajador in trabajadores:
+            trabajador.start()
+        for trabajador in trabajadores:
+            trabajador.join()
+
+        # Cada invalidación obtuvo una generación distinta y ninguna se perdió
+        self.assertEqual(sorted(obtenidas), list(range(inicial + 1, inicial + 1 + hilos * por_hilo)))
+        self.assertEqual(
+            GeneracionCache.objects.get(nombre=caching.LISTA_CLIENTES).valor,
+            inicial + hilos * por_hilo,
+        )
+        self.assertGreater(caching._generacion(caching.LISTA_CLIENTES), inicial)
+
+    def test_sin_copia_en_la_cache_se_usa_una_generacion_nueva(self):
+        inicial = caching._generacion(caching.DETALLE_CLIENTE)
+        cache.clear()
+
+        self.assertEqual(caching._generacion(caching.DETALLE_CLIENTE), inicial + 1)
+
+
+class ResumenLicenciasClienteTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.sistema = Sistema.objects.create(
+            nombre="Office 365", categoria=Sistema.MICROSOFT_OFFICE_365
+        )
+        cls.cliente = Cliente.objects.create(clave_cliente="         1", nombre="Uno")
+        cls.otro = Cliente.objects.create(clave_cliente="         2", nombre="Dos")
+
+    def _licencia(self, cliente, dias_desde_inicio, identificador):
+        licencia = Licencia(
+            cliente=cliente,
+            tipo_sistema=self.sistema,
+            identificador_licencia=identificador,
+            tipo_licencia=Licencia.TIPO_SUSCRIPCION,
+            periodo_licencia=Licencia.PERIODO_MENSUAL,
+            fecha_inicio_vigencia=timezone.now().date() - timedelta(days=dias_desde_inicio),
+        )
+        licencia.save()
+        return licencia
+
+    def _resumen(self, cliente):
+        return ResumenLicenciasCliente.objects.get(cliente=cliente)
+
+    def test_save_y_delete_mantienen_el_resumen(self):
+        activa = self._licencia(self.cliente, 0, "A")
+        vencida = self._licencia(self.cliente, 60, "V")
+
+        resumen = self._resumen(self.cliente)
+        self.assertEqual((resumen.activas, resumen.vencidas), (1, 1))
+        self.assertTrue(resumen.tiene_suscripcion_vencida)
+        self.assertEqual(resumen.proxima_fecha_fin, activa.fecha_fin_vigencia)
+
+        vencida.delete()
+        resumen = self._resumen(self.cliente)
+        self.assertEqual((resumen.activas, resumen.vencidas), (1, 0))
+        self.assertFalse(resumen.tiene_suscripcion_vencida)
+
+    def test_eliminar_cliente_elimina_su_resumen(self):
+        self._licencia(self.cliente, 0, "A")
+        self.cliente.delete()
+        self.assertFalse(ResumenLicenciasCliente.objects.exists())
+
+    def test_reasignar_licencia_actualiza_ambos_clientes(self):
+        licencia = self._licencia(self.cliente, 0, "A")
+        licencia = Licencia.objects.get(pk=licencia.pk)
+        licencia.cliente = self.otro
+        licencia.save()
+
+        self.assertEqual(self._resumen(self.cliente).activas, 0)
+        self.assertEqual(self._resumen(self.otro).activas, 1)
+
+    def test_update_estados_envia_la_senal_masiva(self):
+        licencia = self._licencia(self.cliente, 0, "A")
+        # Simula el paso del tiempo: la licencia venció sin que nadie la guardara
+        Licencia.objects.filter(pk=licencia.pk).update(
+            fecha_inicio_vigencia=timezone.now().date() - timedelta(days=32)
+        )
+        self.assertEqual(self._resumen(self.cliente).vencidas, 0)
+
+        Licencia.objects.update_estados()
+
+        resumen = self._resumen(self.cliente)
+        self.assertEqual((resumen.activas, resumen.vencidas), (0, 1))
+        self.assertIsNone(resumen.proxima_fecha_fin)
+
+
+class UpdateEstadosTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.sistema = Sistema.objects.create(
+            nombre="Office 365", categoria=Sistema.MICROSOFT_OFFICE_365
+        )
+        cls.cliente = Cliente.objects.create(clave_cliente="         1", nombre="Uno")
+        cls.otro = Cliente.objects.create(clave_cliente="         2", nombre="Dos")
+
+    def _licencia(self, cliente, identificador, **campos):
+        # Empieza hoy: ACTIVA hasta dentro de un mes
+        return Licencia.objects.create(
+            cliente=cliente,
+            tipo_sistema=self.sistema,
+            identificador_licencia=identificador,
+            tipo_licencia=Licencia.TIPO_SUSCRIPCION,
+            periodo_licencia=Licencia.PERIODO_MENSUAL,
+            **campos,
+        )
+
+    def _estado(self, licencia):
+        licencia.refresh_from_db()
+        return licencia.estado
+
+    def test_activa_pasa_a_pendiente_de_renovacion(self):
+        licencia = self._licencia(self.cliente, "A")
+        dia = licencia.fecha_fin_vigencia - timedelta(days=3)
+
+        transiciones = Licencia.objects.update_estados(today=dia)
+
+        self.assertEqual(
+            transiciones,
+            {(Licencia.ESTADO_ACTIVA, Licencia.ESTADO_PENDIENTE_RENOVACION): 1},
+        )
+        self.assertEqual(self._estado(licencia), Licencia.ESTADO_PENDIENTE_RENOVACION)
+        resumen = ResumenLicenciasCliente.objects.get(cliente=self.cliente)
+        self.assertEqual((resumen.activas, resumen.pendientes), (0, 1))
+
+        # Otra corrida en la misma transacción vuelve a crear la tabla temporal
+        Licencia.objects.update_estados(today=licencia.fecha_fin_vigencia + timedelta(days=1))
+        self.assertEqual(self._estado(licencia), Licencia.ESTADO_VENCIDA)
+
+    def test_activa_y_pendiente_pasan_a_vencida(self):
+        activa = self._licencia(self.cliente, "A")
+        pendiente = self._licencia(self.otro, "P")
+        Licencia.objects.filter(pk=pendiente.pk).update(
+            estado=Licencia.ESTADO_PENDIENTE_RENOVACION
+        )
+
+        transiciones = Licencia.objects.update_estados(
+            today=activa.fecha_fin_vigencia + timedelta(days=1)
+        )
+
+        self.assertEqual(
+            transiciones,
+            {
+                (Licencia.ESTADO_ACTIVA, Licencia.ESTADO_VENCIDA): 1,
+                (Licencia.ESTADO_PENDIENTE_RENOVACION, Licencia.ESTADO_VENCIDA): 1,
+            },
+        )
+        for licencia, cliente in ((activa, self.cliente), (pendiente, self.otro)):
+            self.assertEqual(self._estado(licencia), Licencia.ESTADO_VENCIDA)
+            resumen = ResumenLicenciasCliente.objects.get(cliente=cliente)
+            self.assertEqual(resumen.vencidas, 1)
+            self.assertTrue(resumen.tiene_suscripcion_vencida)
+            self.assertIsNone(resumen.proxima_fecha_fin)
+
+    def test_las_inactivas_no_se_tocan(self):
+        licencia = self._licencia(self.cliente, "I")
+        Licencia.objects.filter(pk=licencia.pk).update(estado=Licencia.ESTADO_INACTIVA)
+
+        transiciones = Licencia.objects.update_estados(
+            today=licencia.fecha_fin_vigencia + timedelta(days=1)
+        )
+
+        self.assertEqual(transiciones, {})
+        self.assertEqual(self._estado(licencia), Licencia.ESTADO_INACTIVA)
+
+    def test_sin_cambios_no_recalcula_resumenes(self):
+        self._licencia(self.cliente, "A")
+        with self.assertNumQueries(3):  # Conteo de transiciones entre savepoints
+            self.assertEqual(Licencia.objects.update_estados(), {})
+
+
+class CalendarioVencimientosTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        office = Sistema.objects.create(
+            nombre="Office 365", categoria=Sistema.MICROSOFT_OFFICE_365
+        )
+        aspel = Sistema.objects.create(nombre="SAE", categoria=Sistema.ASPEL)
+        cliente = Cliente.objects.create(clave_cliente="         1", nombre="Uno")
+        hoy = timezone.now().date()
+        cls.lunes = hoy + timedelta(days=7 - hoy.weekday())  # Lunes de la próxima semana
+        filas = [
+            (office, Licencia.TIPO_SUSCRIPCION, cls.lunes, Licencia.ESTADO_ACTIVA),
+            (office, Licencia.TIPO_SUSCRIPCION, cls.lunes + timedelta(days=1), Licencia.ESTADO_ACTIVA),
+            (aspel, Licencia.TIPO_ELECTRONICA, cls.lunes, Licencia.ESTADO_ACTIVA),
+            # Fuera del calendario: ya vencida, más allá de 12 meses o inactiva
+            (office, Licencia.TIPO_SUSCRIPCION, hoy - timedelta(days=1), Licencia.ESTADO_VENCIDA),
+            (office, Licencia.TIPO_SUSCRIPCION, hoy + timedelta(days=400), Licencia.ESTADO_ACTIVA),
+            (office, Licencia.TIPO_SUSCRIPCION, cls.lunes, Licencia.ESTADO_INACTIVA),
+        ]
+        # bulk_create: los estados se fijan a mano en lugar de calcularse en save()
+        Licencia.objects.bulk_create(
+            Licencia(
+                cliente=cliente,
+                tipo_sistema=sistema,
+                identificador_licencia=f"LIC-{i}",
+                tipo_licencia=tipo,
+                estado=estado,
+                **_vigencia_hasta(fin),
+            )
+            for i, (sistema, tipo, fin, estado) in enumerate(filas)
+        )
+
+    def test_refrescar_agrupa_por_categoria_y_tipo(self):
+        self.assertFalse(CalendarioVencimientos.objects.exists())
+        CalendarioVencimientos.refrescar()
+
+        semanas = CalendarioVencimientos.objects.filter(
+            granularidad=CalendarioVencimientos.GRANULARIDAD_SEMANA
+        )
+        self.assertEqual(
+            {(f.periodo, f.categoria, f.tipo_licencia, f.licencias) for f in semanas},
+            {
+                (self.lunes, Sistema.MICROSOFT_OFFICE_365, Licencia.TIPO_SUSCRIPCION, 2),
+                (self.lunes, Sistema.ASPEL, Licencia.TIPO_ELECTRONICA, 1),
+            },
+        )
+        meses = CalendarioVencimientos.objects.filter(
+            granularidad=CalendarioVencimientos.GRANULARIDAD_MES
+        )
+        self.assertEqual(sum(f.licencias for f in meses), 3)
+        self.assertTrue(all(f.periodo.day == 1 for f in meses))
+
+    def test_tablero(self):
+        CalendarioVencimientos.refrescar()
+        response = self.client.get(reverse("expiry_calendar"))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context["total"], 3)
+        self.assertIn(("Aspel", "Electrónica"), response.context["encabezados"])
+
+
+class LicenseApiTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        office = Sistema.objects.create(
+            nombre="Office 365", categoria=Sistema.MICROSOFT_OFFICE_365
+        )
+        aspel = Sistema.objects.create(nombre="SAE", categoria=Sistema.ASPEL)
+        cliente = Cliente.objects.create(clave_cliente="         1", nombre="Uno")
+        hoy = timezone.now().date()
+        Licencia.objects.bulk_create(
+            Licencia(
+                cliente=cliente,
+                tipo_sistema=aspel if i % 2 else office,
+                identificador_licencia=f"LIC-{i}",
+                **_vigencia_hasta(hoy + timedelta(days=i)),
+                estado=Licencia.ESTADO_ACTIVA if i < 5 else Licencia.ESTADO_VENCIDA,
+            )
+            for i in range(7)
+        )
+        cls.hoy = hoy
+        cls.url = reverse("api_license_list")
+
+    def _get(self, url, data=None, status=200):
+        response = self.client.get(url, data)
+        self.assertEqual(response.status_code, status)
+        if response.streaming:
+            return json.loads(b"".join(response.streaming_content))
+        return json.loads(response.content)
+
+    def test_paginacion_con_campos_seleccionados(self):
+        instancias = []
+
+        def contar(sender, **kwargs):
+            instancias.append(sender)
+
+        post_init.connect(contar, sender=Licencia)
+        self.addCleanup(post_init.disconnect, contar, sender=Licencia)
+
+        identificadores = []
+        url, data = self.url, {"campos": "identificador_licencia,fecha_fin_vigencia", "limite": 3}
+        while url:
+            # Una consulta por página, leída con values() y sin instancias del modelo
+            with self.assertNumQueries(1):
+                pagina = self._get(url, data)
+            for fila in pagina["results"]:
+                self.assertEqual(set(fila), {"identificador_licencia", "fecha_fin_vigencia"})
+            identificadores += [fila["identificador_licencia"] for fila in pagina["results"]]
+            url, data = pagina["next"], None
+
+        self.assertEqual(identificadores, [f"LIC-{i}" for i in range(7)])
+        self.assertEqual(instancias, [])
+
+    def test_filtros(self):
+        pagina = self._get(
+            self.url,
+            {
+                "estado": "ACTIVA",
+                "categoria": Sistema.ASPEL,
+                "fecha_fin_desde": (self.hoy + timedelta(days=2)).isoformat(),
+                "campos": "identificador_licencia,categoria,sistema",
+            },
+        )
+        self.assertEqual(
+            pagina["results"],
+            [{"identificador_licencia": "LIC-3", "categoria": "ASPEL", "sistema": "SAE"}],
+        )
+        self.assertIsNone(pagina["next"])
+
+    def test_parametros_invalidos(self):
+        for data in (
+            {"campos": "identificador_licencia,precio"},
+            {"estado": "CADUCA"},
+            {"fecha_fin_hasta": "31/12/2026"},
+            {"limite": "0"},
+            {"cursor": "no-es-un-cursor"},
+            {"cursor": encode_cursor([{"identificador_licencia": "LIC-1"}])},
+            {"cursor": encode_cursor(["LIC-1", "LIC-2"])},
+        ):
+            with self.subTest(data=data):
+                self.assertIn("error", self._get(self.url, data, status=400))
+
+    def test_clientes(self):
+        pagina = self._get(reverse("api_client_list"), {"campos": "clave_cliente,nombre"})
+        self.assertEqual(pagina["results"], [{"clave_cliente": "         1", "nombre": "Uno"}])
+
+
+class ExportLicensesTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        sistema = Sistema.objects.create(nombre="SAE", categoria=Sistema.ASPEL)
+        for clave, nombre, rfc in (
+            ("         1", "Tecnoit", "TEC010101AAA"),
+            ("         2", "Ferretería Díaz", "FED020202BBB"),
+        ):
+            cliente = Cliente.objects.create(clave_cliente=clave, nombre=nombre, rfc=rfc)
+            Licencia.objects.bulk_create(
+                Licencia(
+                    cliente=cliente,
+                    tipo_sistema=sistema,
+                    identificador_licencia=f"{rfc}-{i}",
+                    **_vigencia_hasta(timezone.now().date()),
+                )
+                for i in range(3)
+            )
+        cls.url = reverse("export_licenses")
+
+    def _csv(self, data):
+        # El inventario se lee de un solo cursor, sin importar cuántas licencias haya
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url, data)
+            contenido = b"".join(response.streaming_content).decode("utf-8-sig")
+        return list(csv.reader(io.StringIO(contenido)))
+
+    def test_csv_con_los_filtros_de_la_lista(self):
+        filas = self._csv({"formato": "csv"})
+        self.assertEqual(filas[0][:2], ["Clave cliente", "Cliente"])
+        self.assertEqual(len(filas), 7)
+
+        filas = self._csv({"formato": "csv", "rfc": "fed"})
+        self.assertEqual({fila[1] for fila in filas[1:]}, {"Ferretería Díaz"})
+        self.assertEqual(len(filas), 4)
+
+    def test_xlsx_solo_desde_el_comando(self):
+        response = self.client.get(self.url, {"formato": "xlsx"})
+        self.assertContains(response, "export_licenses", status_code=400)
+
+    @unittest.skipIf(openpyxl is None, "openpyxl no está instalado")
+    def test_comando_xlsx(self):
+        with tempfile.TemporaryDirectory() as directorio:
+            salida = os.path.join(directorio, "licencias.xlsx")
+            call_command("export_licenses", salida, clave="1", stdout=io.StringIO())
+            libro = openpyxl.load_workbook(salida, read_only=True)
+            filas = list(libro.worksheets[0].iter_rows(values_only=True))
+            libro.close()
+        self.assertEqual(len(filas), 4)
+        self.assertEqual({fila[1] for fila in filas[1:]}, {"Tecnoit"})
+
+    def test_comando(self):
+        with tempfile.TemporaryDirectory() as directorio:
+            salida = os.path.join(directorio, "licencias.csv")
+            call_command("export_licenses", salida, nombre="tecno", stdout=io.StringIO())
+            with open(salida, encoding="utf-8-sig", newline="") as archivo:
+                filas = list(csv.reader(archivo))
+        self.assertEqual(len(filas), 4)
+
+
+class FakeFirebirdCursor:
+    def __init__(self, conn):
+        self.conn = conn
+        self.description = None
+        self._rows = []
+
+    def execute(self, query, params=None):
+        if self.conn.broken:
+            raise fdb.DatabaseError("La conexión se perdió")
+        self.description = self.conn.description
+        self._rows = list(self.conn.rows)
+
+    def fetchone(self):
+        return (1,)
+
+    def fetchmany(self, size):
+        self.conn.fetchmany_sizes.append(size)
+        if self.conn.fail_after is not None and self.conn.fetched >= self.conn.fail_after:
+            raise fdb.DatabaseError("Lectura interrumpida")
+        lote, self._rows = self._rows[:size], self._rows[size:]
+        self.conn.fetched += len(lote)
+        return lote
+
+    def close(self):
+        pass
+
+
+class FakeFirebirdConnection:
+    """
+    Conexión de fdb en memoria: devuelve `rows` con `description` y, con fail_after,
+    falla después de entregar ese número de filas.
+    """
+
+    def __init__(self, rows=(), description=(), fail_after=None):
+        self.rows = rows
+        self.description = description
+        self.fail_after = fail_after
+        self.fetched = 0
+        self.fetchmany_sizes = []
+        self.broken = False
+        self.closed = False
+
+    def cursor(self):
+        return FakeFirebirdCursor(self)
+
+    def rollback(self):
+        if self.broken:
+            raise fdb.DatabaseError("La conexión se perdió")
+
+    def close(self):
+        self.closed = True
+
+
+class FirebirdRowsTests(SimpleTestCase):
+    DESCRIPCION = [
+        ("CLAVE", str, 10, 10, 0, 0, False),
+        ("NOMBRE", bytes, 60, 60, 0, 0, True),
+        ("SALDO", Decimal, 18, 8, 18, 2, True),
+        ("ALTA", date, 10, 4, 0, 0, True),
+        ("NUM", int, 11, 4, 0, 0, True),
+    ]
+
+    def _conectar(self, conexion):
+        # Un pool propio por prueba, con fdb.connect reemplazado
+        database = f"/pruebas/{self.id()}.FDB"
+        self.addCleanup(firebird_connector._pools.pop, database, None)
+        patcher = mock.patch.object(firebird_connector.fdb, "connect", return_value=conexion)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        return database
+
+    def test_decodificador_segun_el_tipo_de_columna(self):
+        decoders = firebird_connector._column_decoders(self.DESCRIPCION)
+        self.assertEqual(
+            [decoder is not None for decoder in decoders], [True, True, False, False, False]
+        )
+
+    def test_lee_en_lotes_con_fetchmany(self):
+        filas = [
+            (f"{i:>10}".encode(), "Ñandú".encode("latin-1"), Decimal("1.50"), date(2026, 1, i), i)
+            for i in range(1, 6)
+        ]
+        conexion = FakeFirebirdConnection(filas, self.DESCRIPCION)
+        database = self._conectar(conexion)
+
+        leidas = list(firebird_connector.iter_firebird_rows("SELECT", batch_size=2, database=database))
+
+        self.assertEqual(conexion.fetchmany_sizes, [2, 2, 2, 2])
+        self.assertEqual(len(leidas), 5)
+        self.assertEqual(
+            leidas[0], ("         1", "Ñandú", Decimal("1.50"), date(2026, 1, 1), 1)
+        )
+        self.assertEqual(leidas[0].NOMBRE, "Ñandú")
+        self.assertEqual(firebird_connector.get_pool(database).stats()["idle"], 1)
+
+    def test_un_error_de_conexion_se_relanza(self):
+        database = self._conectar(None)
+        firebird_connector.fdb.connect.side_effect = fdb.DatabaseError("Sin servidor")
+
+        with self.assertRaises(fdb.Error):
+            list(firebird_connector.iter_firebird_rows("SELECT", database=database))
+
+    def test_un_error_a_mitad_de_la_lectura_se_relanza_y_descarta_la_conexion(self):
+        filas = [(f"{i:>10}", b"Uno", None, None, i) for i in range(5)]
+        conexion = FakeFirebirdConnection(filas, self.DESCRIPCION, fail_after=2)
+        database = self._conectar(conexion)
+
+        leidas = []
+        with self.assertRaises(fdb.Error):
+            for fila in firebird_connector.iter_firebird_rows(
+                "SELECT", batch_size=2, database=database
+            ):
+                leidas.append(fila)
+
+        self.assertEqual(len(leidas), 2)
+        self.assertTrue(conexion.closed)
+        stats = firebird_connector.get_pool(database).stats()
+        self.assertEqual((stats["idle"], stats["in_use"]), (0, 0))
+
+
+class FirebirdPoolTests(SimpleTestCase):
+    def setUp(self):
+        self.abiertas = []
+
+        def conectar(**kwargs):
+            conexion = FakeFirebirdConnection()
+            self.abiertas.append(conexion)
+            return conexion
+
+        patcher = mock.patch.object(firebird_connector.fdb, "connect", side_effect=conectar)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _pool(self, **kwargs):
+        pool = firebird_connector.FirebirdConnectionPool("/pruebas/pool.FDB", **kwargs)
+        self.addCleanup(pool.close)
+        return pool
+
+    def test_reutiliza_la_conexion_liberada(self):
+        pool = self._pool()
+        with pool.connection() as primera:
+            pass
+        with pool.connection() as segunda:
+            pass
+
+        self.assertIs(primera, segunda)
+        self.assertEqual(len(self.abiertas), 1)
+        stats = pool.stats()
+        self.assertEqual((stats["misses"], stats["hits"], stats["idle"]), (1, 1, 1))
+
+    def test_con_max_size_ocupado_acquire_vence(self):
+        pool = self._pool(max_size=1, acquire_timeout=0.05)
+        conn = pool.acquire()
+
+        with self.assertRaises(firebird_connector.FirebirdPoolTimeout):
+            pool.acquire()
+
+        self.assertEqual(pool.stats()["timeouts"], 1)
+        self.assertEqual(len(self.abiertas), 1)
+        pool.release(conn)
+
+    def test_acquire_bloqueado_recibe_la_conexion_liberada(self):
+        pool = self._pool(max_size=1, acquire_timeout=5)
+        conn = pool.acquire()
+        recibida = []
+        espera = threading.Thread(target=lambda: recibida.append(pool.acquire()))
+        espera.start()
+
+        espera.join(0.05)
+        self.assertTrue(espera.is_alive())  # Sigue esperando: no hay conexión libre
+        pool.release(conn)
+        espera.join(5)
+
+        self.assertEqual(recibida, [conn])
+        self.assertEqual(len(self.abiertas), 1)
+        pool.release(conn)
+
+    def test_un_error_de_firebird_descarta_la_conexion(self):
+        pool = self._pool()
+        with self.assertRaises(fdb.DatabaseError):
+            with pool.connection() as conn:
+                raise fdb.DatabaseError("Consulta fallida")
+
+        self.assertTrue(conn.closed)
+        stats = pool.stats()
+        self.assertEqual((stats["idle"], stats["in_use"]), (0, 0))
+
+    def test_una_conexion_rota_se_descarta_al_liberarla(self):
+        pool = self._pool()
+        with pool.connection() as conn:
+            conn.broken = True
+
+        self.assertTrue(conn.closed)
+        self.assertEqual(pool.stats()["idle"], 0)
+
+    def test_las_ociosas_vencidas_se_cierran_conservando_min_size(self):
+        pool = self._pool(min_size=1, idle_timeout=0)
+        antigua, reciente = pool.acquire(), pool.acquire()
+        pool.release(antigua)
+        pool.release(reciente)
+        time.sleep(0.01)
+
+        with pool.connection() as conn:
+            pass
+
+        # La más antigua vence; la reciente se reutiliza y cuenta para min_size
+        self.assertTrue(antigua.closed)
+        self.assertIs(conn, reciente)
+        self.assertFalse(reciente.closed)
+        self.assertEqual(pool.stats()["idle"], 1)
+
+    def test_fill_abre_min_size_conexiones(self):
+        pool = self._pool(min_size=2)
+        pool.fill()
+        pool.fill()
+
+        self.assertEqual(len(self.abiertas), 2)
+        self.assertEqual(pool.stats()["idle"], 2)
+
+
+class ImportClientsTests(TestCase):
+    FilaSae = namedtuple("FilaSae", "CLAVE NOMBRE RFC EMAILPRED TELEFONO STATUS")
+
+    def _command(self, **atributos):
+        command = import_clients.Command(stdout=io.StringIO(), stderr=io.StringIO())
+        command.sync_column = "VERSION_SINC"
+        for nombre, valor in atributos.items():
+            setattr(command, nombre, valor)
+        return command
+
+    def test_la_columna_de_sincronizacion_solo_se_lee_en_modo_incremental(self):
+        command = self._command()
+        empresa = import_clients.Empresa("01", "/datos/SAEDAT01.FDB")
+
+        completa, _ = command._build_query(empresa, incremental=False)
+        incremental, _ = command._build_query(empresa, incremental=True)
+
+        self.assertNotIn("VERSION_SINC", completa)
+        self.assertIn("VERSION_SINC", incremental)
+
+    def test_una_clave_repetida_en_otra_empresa_no_reemplaza_al_cliente(self):
+        # Importado antes de registrar la empresa: pertenece a la predeterminada (01)
+        Cliente.objects.create(clave_cliente="         1", nombre="Uno", empresa_sae="")
+        command = self._command(incremental=False)
+        empresa_01 = import_clients.Empresa("01", "/datos/SAEDAT01.FDB")
+        empresa_02 = import_clients.Empresa("02", "/datos/SAEDAT02.FDB")
+
+        creados, actualizados, _, omitidos = command._upsert_batch(
+            [
+                (empresa_02, self.FilaSae("         1", "Otro Uno", None, None, None, "A")),
+                (empresa_02, self.FilaSae("         2", "Dos", None, None, None, "A")),
+            ]
+        )
+        self.assertEqual((creados, actualizados, omitidos), (1, 0, 1))
+        cliente = Cliente.objects.get(pk="         1")
+        self.assertEqual((cliente.nombre, cliente.empresa_sae), ("Uno", ""))
+
+        _, actualizados, _, omitidos = command._upsert_batch(
+            [
+                (empresa_01, self.FilaSae("         1", "Uno SA", None, None, None, "A")),
+                (empresa_01, self.FilaSae("         2", "Dos de la 01", None, None, None, "A")),
+            ]
+        )
+        self.assertEqual((actualizados, omitidos), (1, 1))
+        self.assertEqual(
+            dict(Cliente.objects.values_list("nombre", "empresa_sae")),
+            {"Uno SA": "01", "Dos": "02"},
+        )
+
+    def test_reimporta_el_cliente_editado_en_django_aunque_sae_no_cambie(self):
+        fila = self.FilaSae("         1", "Uno", None, None, None, "A")
+        command = self._command(incremental=False)
+        empresa = import_clients.Empresa("01", "/datos/SAEDAT01.FDB")
+        command._upsert_batch([(empresa, fila)])
+
+        self.assertEqual(command._upsert_batch([(empresa, fila)])[2], 1)  # Sin cambios
+
+        Cliente.objects.filter(pk="         1").update(nombre="Editado a mano")
+        _, actualizados, sin_cambios, _ = command._upsert_batch([(empresa, fila)])
+        self.assertEqual((actualizados, sin_cambios), (1, 0))
+        self.assertEqual(Cliente.objects.get(pk="         1").nombre, "Uno")
+
+    def _importar(self, filas_por_ruta, *args):
+        """
+        Corre import_clients leyendo de `filas_por_ruta` en lugar de Firebird; una
+        excepción entre las filas se lanza al llegar a ella. Retorna la salida.
+        """
+
+        def filas_firebird(query, params=None, batch_size=None, database=None):
+            for fila in filas_por_ruta[database]:
+                if isinstance(fila, Exception):
+                    raise fila
+                yield fila
+
+        salida = io.StringIO()
+        with mock.patch.object(import_clients, "iter_firebird_rows", filas_firebird):
+            call_command("import_clients", *args, stdout=salida, stderr=io.StringIO())
+        return salida.getvalue()
+
+    def test_conteos_de_creados_actualizados_y_sin_cambios_entre_lotes(self):
+        ruta = "/datos/SAEDAT01.FDB"
+        filas = [self.FilaSae(f"{i:>10}", f"Cliente {i}", None, None, None, "A") for i in range(1, 6)]
+        self._importar({ruta: filas[:2]}, "--empresa", f"01={ruta}")
+        filas[1] = filas[1]._replace(NOMBRE="Cliente 2 SA")
+
+        salida = self._importar({ruta: filas}, "--empresa", f"01={ruta}", "--batch-size", "2")
+
+        self.assertIn("Lote 3:", salida)
+        self.assertIn("3 clientes creados, 1 clientes actualizados, 1 sin cambios", salida)
+        self.assertEqual(Cliente.objects.count(), 5)
+        self.assertEqual(Cliente.objects.get(pk="         2").nombre, "Cliente 2 SA")
+
+    def test_truncate_no_borra_nada_si_la_lectura_falla(self):
+        ruta = "/datos/SAEDAT01.FDB"
+        cliente = Cliente.objects.create(clave_cliente="         9", nombre="Nueve")
+        sistema = Sistema.objects.create(nombre="SAE", categoria=Sistema.ASPEL)
+        Licencia.objects.create(
+            cliente=cliente,
+            tipo_sistema=sistema,
+            identificador_licencia="LIC-9",
+            tipo_licencia=Licencia.TIPO_FISICA,
+        )
+        filas = [
+            self.FilaSae("         1", "Uno", None, None, None, "A"),
+            self.FilaSae("         2", "Dos", None, None, None, "A"),
+            fdb.DatabaseError("Lectura interrumpida"),
+        ]
+
+        with self.assertRaises(CommandError):
+            self._importar({ruta: filas}, "--empresa", f"01={ruta}", "--batch-size", "1", "--truncate")
+
+        self.assertEqual(list(Cliente.objects.values_list("pk", flat=True)), ["         9"])
+        self.assertTrue(Licencia.objects.filter(identificador_licencia="LIC-9").exists())
+
+    def test_truncate_requiere_leer_todas_las_empresas(self):
+        Cliente.objects.create(clave_cliente="         9", nombre="Nueve", empresa_sae="02")
+        filas_01 = [self.FilaSae("         1", "Uno", None, None, None, "A")]
+        empresas = ["--empresa", "01=/datos/SAEDAT01.FDB", "--empresa", "02=/datos/SAEDAT02.FDB"]
+
+        for filas_02 in ([fdb.DatabaseError("No se pudo conectar")], []):
+            with self.subTest(filas_02=filas_02):
+                with self.assertRaises(CommandError):
+                    self._importar(
+                        {"/datos/SAEDAT01.FDB": filas_01, "/datos/SAEDAT02.FDB": filas_02},
+                        *empresas,
+                        "--truncate",
+                    )
+                self.assertEqual(list(Cliente.objects.values_list("pk", flat=True)), ["         9"])
+
+    def test_rechaza_una_columna_de_sincronizacion_invalida(self):
+        with self.assertRaisesMessage(CommandError, "--sync-column inválida"):
+            call_command(
+                "import_clients", sync_column="VERSION_SINC; DROP TABLE CLIE01", stdout=io.StringIO()
+            )
+
+
+class ImportLicensesTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        Sistema.objects.create(nombre="SAE", categoria=Sistema.ASPEL)
+        cls.cliente = Cliente.objects.create(clave_cliente="         7", nombre="Tecnoit")
+        Licencia.objects.create(
+            cliente=cls.cliente,
+            tipo_sistema=Sistema.objects.get(),
+            identificador_licencia="EXISTE",
+            tipo_licencia="ELECTRONICA",
+            periodo_licencia="PERPETUA",
+        )
+
+    ENCABEZADOS = [
+        "clave_cliente", "sistema", "identificador_licencia", "tipo_licencia",
+        "periodo_licencia", "fecha_inicio_vigencia",
+    ]
+
+    def _importar(self, filas, encabezados=ENCABEZADOS, stdout=None, **opciones):
+        with tempfile.TemporaryDirectory() as directorio:
+            archivo = os.path.join(directorio, "licencias.csv")
+            with open(archivo, "w", encoding="utf-8", newline="") as f:
+                escritor = csv.writer(f)
+                escritor.writerow(encabezados)
+                escritor.writerows(filas)
+            call_command("import_licenses", archivo, stdout=stdout or io.StringIO(), **opciones)
+            with open(f"{archivo}.rechazos.csv", encoding="utf-8", newline="") as f:
+                return {int(fila["linea"]): fila["error"] for fila in csv.DictReader(f)}
+
+    def test_importa_validas_y_rechaza_las_demas(self):
+        hace_un_mes = (timezone.now().date() - timedelta(days=30)).isoformat()
+        rechazos = self._importar(
+            [
+                ["7", "sae", "NUEVA-1", "ELECTRONICA", "ANUAL", hace_un_mes],
+                ["7", "SAE", "NUEVA-2", "SUSCRIPCION", "MENSUAL", "01/01/2020"],
+                ["8", "SAE", "NUEVA-3", "ELECTRONICA", "ANUAL", ""],
+                ["7", "COI", "NUEVA-4", "ELECTRONICA", "ANUAL", ""],
+                ["7", "SAE", "EXISTE", "ELECTRONICA", "ANUAL", ""],
+                ["7", "SAE", "NUEVA-1", "ELECTRONICA", "ANUAL", ""],
+                ["7", "SAE", "NUEVA-5", "SUSCRIPCION", "PERPETUA", ""],
+                ["7", "SAE", "NUEVA-6", "ELECTRONICA", "ANUAL", "2020-13-01"],
+            ]
+        )
+        self.assertEqual(sorted(rechazos), [4, 5, 6, 7, 8, 9])
+        self.assertIn("cliente", rechazos[4])
+        self.assertIn("repetida", rechazos[7])
+
+        # Las fechas y el estado se calculan igual que en save()
+        nueva = Licencia.objects.get(identificador_licencia="NUEVA-1")
+        self.assertEqual(nueva.estado, Licencia.ESTADO_ACTIVA)
+        self.assertIsNotNone(nueva.fecha_fin_vigencia)
+        vencida = Licencia.objects.get(identificador_licencia="NUEVA-2")
+        self.assertEqual(vencida.estado, Licencia.ESTADO_VENCIDA)
+
+        resumen = ResumenLicenciasCliente.objects.get(cliente=self.cliente)
+        self.assertEqual((resumen.activas, resumen.vencidas), (2, 1))
+
+    def test_consultas_constantes_por_lote(self):
+        filas = [["7", "SAE", f"L-{i}", "ELECTRONICA", "ANUAL", ""] for i in range(50)]
+        # Sistemas y clientes una vez; por lote: duplicados, savepoint, inserción,
+        # resumen y liberación del savepoint
+        with self.assertNumQueries(2 + 2 * 5):
+            self._importar(filas, batch_size=25)
+        self.assertEqual(Licencia.objects.filter(identificador_licencia__startswith="L-").count(), 50)
+
+    def test_la_columna_estado_se_ignora_y_se_informa(self):
+        hace_un_mes = (timezone.now().date() - timedelta(days=30)).isoformat()
+        salida = io.StringIO()
+        rechazos = self._importar(
+            [
+                ["7", "SAE", "NUEVA-1", "ELECTRONICA", "ANUAL", hace_un_mes, "VENCIDA"],
+                ["7", "SAE", "NUEVA-2", "ELECTRONICA", "ANUAL", hace_un_mes, "ACTIVA"],
+                ["7", "SAE", "NUEVA-3", "ELECTRONICA", "ANUAL", hace_un_mes, "NO EXISTE"],
+            ],
+            encabezados=[*self.ENCABEZADOS, "estado"],
+            stdout=salida,
+        )
+
+        self.assertEqual(rechazos, {})
+        nuevas = Licencia.objects.filter(identificador_licencia__startswith="NUEVA-")
+        self.assertEqual(
+            set(nuevas.values_list("estado", flat=True)), {Licencia.ESTADO_ACTIVA}
+        )
+        self.assertIn("Se ignora la columna estado", salida.getvalue())
+        self.assertIn("2 filas traían un estado distinto al calculado", salida.getvalue())
+
+    def test_identificadores_registrados_por_otro_proceso_se_informan(self):
+        revisar = import_licenses.Command._descartar_duplicados
+
+        def revisar_y_perder_la_carrera(command, filas):
+            revisar(command, filas)
+            # Otro proceso registra NUEVA-2 después de la revisión
+            Licencia.objects.create(
+                cliente=self.cliente,
+                tipo_sistema=Sistema.objects.get(),
+                identificador_licencia="NUEVA-2",
+                tipo_licencia="ELECTRONICA",
+                periodo_licencia="PERPETUA",
+            )
+
+        salida = io.StringIO()
+        with mock.patch.object(
+            import_licenses.Command, "_descartar_duplicados", revisar_y_perder_la_carrera
+        ):
+            rechazos = self._importar(
+                [
+                    ["7", "SAE", "NUEVA-1", "ELECTRONICA", "ANUAL", ""],
+                    ["7", "SAE", "NUEVA-2", "ELECTRONICA", "ANUAL", ""],
+                ],
+                stdout=salida,
+            )
+
+        self.assertEqual(list(rechazos), [3])
+        self.assertIn("otro proceso", rechazos[3])
+        self.assertIn("Línea 3", salida.getvalue())
+        self.assertTrue(Licencia.objects.filter(identificador_licencia="NUEVA-1").exists())
+        # La de NUEVA-2 es la del otro proceso, no la del archivo
+        self.assertEqual(
+            Licencia.objects.get(identificador_licencia="NUEVA-2").periodo_licencia, "PERPETUA"
+        )
+
+    def test_dry_run(self):
+        rechazos = self._importar([["7", "SAE", "NUEVA-1", "ELECTRONICA", "ANUAL", ""]], dry_run=True)
+        self.assertEqual(rechazos, {})
+        self.assertFalse(Licencia.objects.filter(identificador_licencia="NUEVA-1").exists())
+
+
+class ExpiryTests(TestCase):
+    def test_fin_de_mes(self):
+        fechas_inicio = [
+            date(2024, 1, 31),
+            date(2023, 1, 31),
+            date(2024, 2, 29),
+            date(2024, 8, 31),
+            date(2024, 11, 30),
+            date(2024, 5, 15),
+            None,
+            date(2024, 5, 15),
+        ]
+        periodos = [
+            Licencia.PERIODO_MENSUAL,
+            Licencia.PERIODO_MENSUAL,
+            Licencia.PERIODO_ANUAL,
+            Licencia.PERIODO_SEMESTRAL,
+            Licencia.PERIODO_TRIMESTRAL,
+            Licencia.PERIODO_PERPETUA,
+            Licencia.PERIODO_MENSUAL,
+            None,
+        ]
+        self.assertEqual(
+            to_dates(compute_end_dates(fechas_inicio, periodos)),
+            [
+                date(2024, 2, 29),
+                date(2023, 2, 28),
+                date(2025, 2, 28),
+                date(2025, 2, 28),
+                date(2025, 2, 28),
+                None,
+                None,
+                None,
+            ],
+        )
+
+    def test_estados_coinciden_con_sql(self):
+        sistema = Sistema.objects.create(nombre="SAE", categoria=Sistema.ASPEL)
+        cliente = Cliente.objects.create(clave_cliente="         1", nombre="Tecnoit")
+        today = timezone.now().date()
+        Licencia.objects.bulk_create(
+            Licencia(
+                cliente=cliente,
+                tipo_sistema=sistema,
+                identificador_licencia=f"LIC-{i}-{periodo}",
+                # Con periodo anual, fechas de fin desde hace 20 días hasta dentro de 20
+                fecha_inicio_vigencia=today + timedelta(days=i - 20 - 365),
+                periodo_licencia=periodo,
+            )
+            for i in range(40)
+            for periodo in (Licencia.PERIODO_ANUAL, Licencia.PERIODO_PERPETUA, None)
+        )
+        filas = list(
+            Licencia.objects.annotate(
+                esperado=LicenciaQuerySet.estado_expression(today)
+            ).values_list(
+                "fecha_inicio_vigencia", "fecha_fin_vigencia", "periodo_licencia", "esperado"
+            )
+        )
+        inicio, fin, periodo, esperado = zip(*filas)
+        self.assertEqual(list(compute_estados(inicio, fin, periodo, today)), list(esperado))
+
+    def test_fecha_fin_generada_coincide_con_save(self):
+        sistema = Sistema.objects.create(nombre="SAE", categoria=Sistema.ASPEL)
+        cliente = Cliente.objects.create(clave_cliente="         1", nombre="Tecnoit")
+        fechas_inicio = [date(2024, 1, 31), date(2024, 2, 29), date(2023, 8, 31), date(2024, 5, 15)]
+        periodos = [valor for valor, _ in Licencia.PERIODO_LICENCIA_CHOICES] + [None]
+        combinaciones = [(inicio, periodo) for inicio in fechas_inicio for periodo in periodos]
+
+        # save(), bulk_create() y update() sin instanciar modelos
+        guardadas = [
+            Licencia.objects.create(
+                cliente=cliente,
+                tipo_sistema=sistema,
+                identificador_licencia=f"SAVE-{i}",
+                fecha_inicio_vigencia=inicio,
+                periodo_licencia=periodo,
+            )
+            for i, (inicio, periodo) in enumerate(combinaciones)
+        ]
+        Licencia.objects.bulk_create(
+            Licencia(
+                cliente=cliente,
+                tipo_sistema=sistema,
+                identificador_licencia=f"BULK-{i}",
+                fecha_inicio_vigencia=inicio,
+                periodo_licencia=periodo,
+            )
+            for i, (inicio, periodo) in enumerate(combinaciones)
+        )
+        for i, (inicio, periodo) in enumerate(combinaciones):
+            Licencia.objects.filter(identificador_licencia=f"SAVE-{i}").update(
+                identificador_licencia=f"UPDATE-{i}",
+                fecha_inicio_vigencia=inicio - timedelta(days=1),
+            )
+            Licencia.objects.filter(identificador_licencia=f"UPDATE-{i}").update(
+                fecha_inicio_vigencia=inicio
+            )
+
+        esperadas = to_dates(compute_end_dates(*zip(*combinaciones)))
+        for prefijo in ("BULK", "UPDATE"):
+            fechas_fin = dict(
+                Licencia.objects.filter(
+                    identificador_licencia__startswith=prefijo
+                ).values_list("identificador_licencia", "fecha_fin_vigencia")
+            )
+            self.assertEqual(
+                [fechas_fin[f"{prefijo}-{i}"] for i in range(len(combinaciones))], esperadas
+            )
+        # El valor que save() deja en memoria es el mismo que calcula PostgreSQL
+        self.assertEqual([licencia.fecha_fin_vigencia for licencia in guardadas], esperadas)
+
+
+@override_settings(CACHES=CACHE_PRUEBAS)
+class BulkRenewLicensesTests(QueryCountMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        sistema = Sistema.objects.create(
+            nombre="Office 365", categoria=Sistema.MICROSOFT_OFFICE_365
+        )
+        cls.cliente = Cliente.objects.create(clave_cliente="         1", nombre="Tecnoit")
+        hace_dos_meses = timezone.now().date() - timedelta(days=60)
+        cls.licencias = Licencia.objects.bulk_create(
+            Licencia(
+                cliente=cls.cliente,
+                tipo_sistema=sistema,
+                identificador_licencia=f"O365-{i}",
+                tipo_licencia=Licencia.TIPO_SUSCRIPCION,
+                periodo_licencia=Licencia.PERIODO_MENSUAL,
+                fecha_inicio_vigencia=hace_dos_meses,
+                estado=Licencia.ESTADO_VENCIDA,
+            )
+            for i in range(40)
+        )
+        cls.perpetua = Licencia.objects.create(
+            cliente=cls.cliente,
+            tipo_sistema=sistema,
+            identificador_licencia="PERPETUA",
+            tipo_licencia=Licencia.TIPO_ELECTRONICA,
+            periodo_licencia=Licencia.PERIODO_PERPETUA,
+            fecha_inicio_vigencia=hace_dos_meses,
+        )
+        cls.url = reverse("bulk_renew_licenses")
+        cls.detail_url = reverse("client_detail", args=[cls.cliente.clave_cliente])
+
+    def _datos(self, licencias, fecha_inicio):
+        return {
+            "licencias": [licencia.pk for licencia in licencias],
+            "fecha_inicio_vigencia": fecha_inicio.isoformat(),
+            "next": self.detail_url,
+        }
+
+    def test_renueva_todas_en_una_operacion(self):
+        hoy = timezone.now().date()
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                self.url, self._datos([*self.licencias, self.perpetua], hoy)
+            )
+        self.assertRedirects(response, self.detail_url, fetch_redirect_response=False)
+
+        renovadas = Licencia.objects.filter(periodo_licencia=Licencia.PERIODO_MENSUAL)
+        self.assertEqual(
+            set(renovadas.values_list("fecha_inicio_vigencia", "fecha_fin_vigencia", "estado")),
+            {(hoy, hoy + relativedelta(months=1), Licencia.ESTADO_ACTIVA)},
+        )
+        self.perpetua.refresh_from_db()
+        self.assertEqual(self.perpetua.fecha_inicio_vigencia, timezone.now().date() - timedelta(days=60))
+
+        historial = RenovacionLicencia.objects.all()
+        self.assertEqual(len(historial), 40)
+        self.assertEqual(
+            {(r.fecha_fin_anterior, r.fecha_fin_vigencia) for r in historial},
+            {(self.licencias[0].fecha_fin_vigencia, hoy + relativedelta(months=1))},
+        )
+        self.assertEqual(ResumenLicenciasCliente.objects.get(cliente=self.cliente).activas, 41)
+        self.assertContains(self.client.get(self.detail_url), "Activa", count=41)
+
+    def test_consultas_constantes(self):
+        hoy = timezone.now().date()
+        # Validación de los ids, bloqueo, UPDATE, historial, resumen y el savepoint de
+        # la transacción
+        self.assertViewQueries(7, self.url, "post", self._datos(self.licencias[:2], hoy), 302)
+        self.assertViewQueries(7, self.url, "post", self._datos(self.licencias, hoy), 302)
+
+    def test_confirmacion_y_errores(self):
+        response = self.assertViewQueries(
+            1, f"{self.url}?licencias={self.licencias[0].pk}&licencias={self.licencias[1].pk}"
+        )
+        self.assertContains(response, "Renovar 2 Licencias")
+        self.assertContains(response, "O365-1")
+
+        response = self.client.post(self.url, {"licencias": [self.licencias[0].pk]})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.context["form"].errors)
+        self.assertFalse(RenovacionLicencia.objects.exists())
+
+    def test_accion_del_admin(self):
+        self.client.force_login(
+            get_user_model().objects.create_superuser("admin", "admin@example.com", "x")
+        )
+        changelist = reverse("admin:licensing_management_licencia_changelist")
+        datos = {
+            "action": "renovar",
+            "_selected_action": [licencia.pk for licencia in self.licencias[:3]],
+        }
+        # Primero la confirmación, que vuelve a enviar la selección por POST
+        response = self.client.post(changelist, datos)
+        self.assertContains(response, "Renovar 3 licencias")
+        self.assertContains(response, 'name="aplicar"')
+        self.assertFalse(RenovacionLicencia.objects.exists())
+
+        hoy = timezone.now().date()
+        response = self.client.post(
+            changelist, {**datos, "aplicar": "1", "fecha_inicio_vigencia": hoy.isoformat()}
+        )
+        self.assertRedirects(response, changelist, fetch_redirect_response=False)
+        self.assertEqual(
+            set(RenovacionLicencia.objects.values_list("licencia_id", "usuario__username")),
+            {(licencia.pk, "admin") for licencia in self.licencias[:3]},
+        )
+        self.assertEqual(Licencia.objects.filter(fecha_inicio_vigencia=hoy).count(), 3)
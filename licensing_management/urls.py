@@ -1,10 +1,15 @@
 from django.urls import path
 
-from . import views
+from . import api, views
 
 urlpatterns = [
     path("", views.home_view, name="home"),
     path("clientes/", views.client_list_view, name="client_list"),
+    path("clientes/exportar/", views.export_licenses_view, name="export_licenses"),
+    path("vencimientos/", views.expiry_calendar_view, name="expiry_calendar"),
+    path(
+        "licencias/renovar/", views.bulk_renew_licenses_view, name="bulk_renew_licenses"
+    ),
     path(
         "clientes/<str:clave_cliente>/", views.client_detail_view, name="client_detail"
     ),
@@ -23,4 +28,7 @@ urlpatterns = [
         views.delete_license_view,
         name="delete_license",
     ),
+    # API JSON de solo lectura para otras herramientas internas
+    path("api/clientes/", api.client_list_api, name="api_client_list"),
+    path("api/licencias/", api.license_list_api, name="api_license_list"),
 ]
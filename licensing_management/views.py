@@ -1,18 +1,38 @@
+from urllib.parse import urlencode
+
 from django.contrib import messages
 from django.db import transaction  # Importa transaction para asegurar atomicidad
-from django.db.models import Exists, OuterRef  # Importar Exists y OuterRef
+from django.db.models import F, Value
+from django.db.models.functions import Coalesce
+from django.http import HttpResponseBadRequest, StreamingHttpResponse
 from django.shortcuts import get_object_or_404, redirect, render  # Importa redirect
-from django.utils import timezone  # Importa timezone para fechas y horas actuales
+from django.template.loader import render_to_string
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.http import url_has_allowed_host_and_scheme
 
+from .caching import (
+    cached_fragment,
+    client_detail_cache_key,
+    client_list_cache_key,
+)
+from .exports import iter_csv, license_rows
+from .filters import filter_clients, read_client_filters
 from .forms import (  # Importa el formulario que acabas de crear
     LicenciaForm,
     LicenciaUpdateForm,
+    RenovacionMasivaForm,
 )
 from .models import (
+    CalendarioVencimientos,
     Cliente,
     Licencia,
-    # Sistema,
+    Sistema,
 )
+from .pagination import estimate_count, paginate_keyset
+
+CLIENTES_POR_PAGINA = 50
+LICENCIAS_A_MOSTRAR = 100  # Licencias listadas en la confirmación de la renovación masiva
 
 
 # Vista para la página de inicio
@@ -22,74 +42,191 @@ def home_view(request):
 
 # Nueva vista para listar clientes
 def client_list_view(request):
-    # clientes = Cliente.objects.all()
-    # La fecha actual para comparar
-    today = timezone.now().date()
-
-    # Anotamos si el cliente tiene ALGUNA licencia de suscripción vencida
-    # Usamos Subquery con Exists para eficiencia: evita cargar todas las licencias
+    # Valores precalculados en ResumenLicenciasCliente (se mantienen con señales):
+    # una sola consulta plana con LEFT JOIN, sin subconsultas por cliente.
     clientes = Cliente.objects.annotate(
-        has_expired_subscription_license=Exists(
-            Licencia.objects.filter(
-                cliente=OuterRef(
-                    "pk"
-                ),  # Se refiere al cliente de la consulta principal
-                tipo_licencia=Licencia.TIPO_SUSCRIPCION,
-                fecha_fin_vigencia__lt=today,  # Licencias cuya fecha_fin_vigencia es anterior a hoy
-            )
-        )
+        has_expired_subscription_license=Coalesce(
+            F("resumen_licencias__tiene_suscripcion_vencida"), Value(False)
+        ),
+        licencias_activas=Coalesce(F("resumen_licencias__activas"), Value(0)),
+        licencias_pendientes=Coalesce(F("resumen_licencias__pendientes"), Value(0)),
+        licencias_vencidas=Coalesce(F("resumen_licencias__vencidas"), Value(0)),
+        proxima_fecha_fin=F("resumen_licencias__proxima_fecha_fin"),
     )
 
     # Obtener parámetros de filtro de la URL
-    filtro_rfc = request.GET.get("rfc", "").strip()
-    filtro_clave = request.GET.get("clave", "").strip()
-    filtro_nombre = request.GET.get("nombre", "").strip()
-
-    # Aplicar filtros
-    if filtro_rfc:
-        clientes = clientes.filter(
-            rfc__icontains=filtro_rfc
-        )  # icontains para LIKE insensible a mayúsculas
-
-    if filtro_clave:
-        # Aquí manejamos la lógica de "acompletar espacios" para la clave.
-        # Quitamos espacios y rellenamos a la derecha con espacios si es necesario para 16 caracteres.
-        # Asegúrate de que el campo `clave_cliente` en tu modelo `Cliente` tiene max_length suficiente (ej. 16).
-        clave_formateada = filtro_clave.rjust(
-            10
-        )  # Rellena a la izquierda con espacios hasta 16 caracteres
-        clientes = clientes.filter(
-            clave_cliente__exact=clave_formateada
-        )  # exact para coincidencia exacta
-
-    if filtro_nombre:
-        clientes = clientes.filter(
-            nombre__icontains=filtro_nombre
-        )  # icontains para LIKE insensible a mayúsculas
-
-    clientes = clientes.order_by("nombre")  # Ordenar después de filtrar
+    filtros = read_client_filters(request.GET)
+    filtro_nombre = filtros["nombre"]
+    busqueda_similar = filtros["similar"]
+    clientes = filter_clients(clientes, **filtros)
 
+    # Los resultados (conteo, tabla y paginación) se guardan en caché por filtros y
+    # página; las señales de Cliente y Licencia los invalidan.
+    resultados = cached_fragment(
+        client_list_cache_key(request.GET),
+        lambda: render_to_string(
+            "licensing_management/fragments/client_list.html",
+            _client_list_results(request, clientes, busqueda_similar, filtro_nombre),
+            request,
+        ),
+    )
     context = {
-        "clientes": clientes,
-        "filtro_rfc": filtro_rfc,  # Pasa los valores de filtro de vuelta a la plantilla
-        "filtro_clave": filtro_clave,
+        "resultados": resultados,
+        "busqueda_similar": busqueda_similar,
+        "filtro_rfc": filtros["rfc"],  # Pasa los valores de filtro de vuelta a la plantilla
+        "filtro_clave": filtros["clave"],
         "filtro_nombre": filtro_nombre,
+        # Los botones de exportación aplican los mismos filtros
+        "parametros_exportacion": urlencode(
+            {campo: "1" if valor is True else valor for campo, valor in filtros.items() if valor}
+        ),
     }
     return render(request, "licensing_management/client_list.html", context)
 
 
+# Exportación del inventario de licencias con los filtros de la lista de clientes.
+# Por HTTP solo CSV, que se envía conforme se lee del cursor. Un XLSX no se puede
+# enviar mientras se escribe (el libro es un ZIP que se arma al final), así que
+# se genera con el comando export_licenses.
+def export_licenses_view(request):
+    formato = request.GET.get("formato", "csv")
+    if formato != "csv":
+        return HttpResponseBadRequest(
+            "Formato no soportado; use csv. Para XLSX use el comando export_licenses."
+        )
+
+    clientes = filter_clients(Cliente.objects.all(), **read_client_filters(request.GET))
+    nombre_archivo = f"licencias_{timezone.localdate():%Y%m%d}.csv"
+    response = StreamingHttpResponse(
+        iter_csv(license_rows(clientes)), content_type="text/csv; charset=utf-8"
+    )
+    response["Content-Disposition"] = f'attachment; filename="{nombre_archivo}"'
+    return response
+
+
+def _client_list_results(request, clientes, busqueda_similar, filtro_nombre):
+    """
+    Contexto del fragmento de resultados de la lista de clientes.
+    """
+    # Paginación por llave (nombre, clave_cliente): cada página pide solo sus filas
+    # con un recorrido del índice, sin OFFSET. La búsqueda aproximada pagina igual,
+    # con los más parecidos (menor distancia) primero.
+    campos = ["nombre", "clave_cliente"]
+    if busqueda_similar:
+        campos.insert(0, "distancia")
+    pagina = paginate_keyset(
+        clientes,
+        campos,
+        CLIENTES_POR_PAGINA,
+        after=request.GET.get("despues"),
+        before=request.GET.get("antes"),
+    )
+
+    # Los enlaces de página conservan los filtros actuales
+    parametros = request.GET.copy()
+    parametros.pop("despues", None)
+    parametros.pop("antes", None)
+    url_siguiente = url_anterior = None
+    if pagina.next_cursor:
+        parametros["despues"] = pagina.next_cursor
+        url_siguiente = f"?{parametros.urlencode()}"
+        parametros.pop("despues")
+    if pagina.previous_cursor:
+        parametros["antes"] = pagina.previous_cursor
+        url_anterior = f"?{parametros.urlencode()}"
+
+    return {
+        "clientes": pagina,
+        "conteo": estimate_count(clientes),
+        "url_siguiente": url_siguiente,
+        "url_anterior": url_anterior,
+        "busqueda_similar": busqueda_similar,
+        "filtro_nombre": filtro_nombre,
+    }
+
+
+# Tablero de vencimientos de los próximos 12 meses
+def expiry_calendar_view(request):
+    granularidades = dict(CalendarioVencimientos.GRANULARIDAD_CHOICES)
+    granularidad = request.GET.get("vista", CalendarioVencimientos.GRANULARIDAD_MES)
+    if granularidad not in granularidades:
+        granularidad = CalendarioVencimientos.GRANULARIDAD_MES
+
+    # Una sola lectura indexada de la vista materializada; aquí solo se acomoda en tabla
+    filas = list(
+        CalendarioVencimientos.objects.filter(granularidad=granularidad).order_by(
+            "periodo"
+        )
+    )
+
+    # Columnas: las combinaciones categoría/tipo presentes, en el orden de las opciones
+    categorias = dict(Sistema.CATEGORIA_CHOICES)
+    tipos = dict(Licencia.TIPO_LICENCIA_CHOICES)
+    orden_categorias = list(categorias)
+    orden_tipos = list(tipos)
+    columnas = sorted(
+        {(fila.categoria, fila.tipo_licencia) for fila in filas},
+        key=lambda columna: (
+            orden_categorias.index(columna[0]) if columna[0] in categorias else len(categorias),
+            orden_tipos.index(columna[1]) if columna[1] in tipos else len(tipos),
+        ),
+    )
+
+    periodos = {}
+    for fila in filas:
+        valores = periodos.setdefault(fila.periodo, dict.fromkeys(columnas, 0))
+        valores[(fila.categoria, fila.tipo_licencia)] = fila.licencias
+
+    renglones = [
+        {
+            "periodo": periodo,
+            "valores": [valores[columna] for columna in columnas],
+            "total": sum(valores.values()),
+        }
+        for periodo, valores in periodos.items()
+    ]
+
+    context = {
+        "granularidad": granularidad,
+        "granularidades": granularidades,
+        "encabezados": [
+            (categorias.get(categoria, categoria), tipos.get(tipo, tipo))
+            for categoria, tipo in columnas
+        ],
+        "renglones": renglones,
+        "totales": [
+            sum(renglon["valores"][i] for renglon in renglones)
+            for i in range(len(columnas))
+        ],
+        "total": sum(renglon["total"] for renglon in renglones),
+        "fecha_calculo": filas[0].fecha_calculo if filas else None,
+    }
+    return render(request, "licensing_management/expiry_calendar.html", context)
+
+
 # Nueva vista para los detalles de un cliente específico
 def client_detail_view(request, clave_cliente):
     # Usamos get_object_or_404 para que Django devuelva un 404 si el cliente no existe
     cliente = get_object_or_404(Cliente, clave_cliente=clave_cliente)
-    # También podemos obtener las licencias relacionadas con este cliente
-    licencias = cliente.licencias.all().order_by(
-        "-fecha_fin_vigencia"
-    )  # Ordenar por fecha de vencimiento descendente
 
+    def render_contenido():
+        # También podemos obtener las licencias relacionadas con este cliente
+        # select_related: la plantilla muestra tipo_sistema.nombre en cada fila
+        licencias = cliente.licencias.select_related("tipo_sistema").order_by(
+            "-fecha_fin_vigencia"
+        )  # Ordenar por fecha de vencimiento descendente
+        return render_to_string(
+            "licensing_management/fragments/client_detail.html",
+            {"cliente": cliente, "licencias": licencias},
+            request,
+        )
+
+    # Datos y licencias en caché hasta que cambien el cliente, sus licencias o un sistema
     context = {
         "cliente": cliente,
-        "licencias": licencias,
+        "contenido": cached_fragment(
+            client_detail_cache_key(cliente.clave_cliente), render_contenido
+        ),
     }
     return render(request, "licensing_management/client_detail.html", context)
 
@@ -122,7 +259,9 @@ def add_license_view(request, clave_cliente):
 # Nueva vista para actualizar/renovar una licencia
 def update_license_view(request, clave_cliente, licencia_id):
     cliente = get_object_or_404(Cliente, clave_cliente=clave_cliente)
-    licencia = get_object_or_404(Licencia, id=licencia_id, cliente=cliente)
+    licencia = get_object_or_404(
+        Licencia.objects.select_related("tipo_sistema"), id=licencia_id, cliente=cliente
+    )
 
     if request.method == "POST":
         form = LicenciaUpdateForm(request.POST, instance=licencia)
@@ -144,14 +283,11 @@ def update_license_view(request, clave_cliente, licencia_id):
                     and licencia.tipo_licencia != Licencia.PERIODO_PERPETUA
                 ):
                     # Si estaba VENCIDA o PENDIENTE_RENOVACION, o simplemente se está renovando una ACTIVA
-                    # Actualiza fecha de inicio a HOY y la fecha de fin se recalculará
+                    # Actualiza fecha de inicio; PostgreSQL recalcula la fecha de fin
                     # licencia_actualizada.fecha_inicio_vigencia = timezone.now().date()
                     licencia_actualizada.fecha_inicio_vigencia = (
                         fecha_form_inicio_vigencia
                     )
-                    licencia_actualizada.fecha_fin_vigencia = (
-                        None  # Forzar recálculo en save()
-                    )
                     licencia_actualizada.estado = (
                         Licencia.ESTADO_ACTIVA
                     )  # Marcar como activa después de pago
@@ -172,6 +308,44 @@ def update_license_view(request, clave_cliente, licencia_id):
     return render(request, "licensing_management/update_license.html", context)
 
 
+# Renovación de varias licencias a la vez (desde el detalle del cliente o el admin)
+def bulk_renew_licenses_view(request):
+    # GET con ?licencias=...: confirmación con las licencias elegidas; POST: renueva
+    datos = request.POST if request.method == "POST" else None
+    form = RenovacionMasivaForm(
+        datos, initial={"licencias": request.GET.getlist("licencias")}
+    )
+    siguiente = request.POST.get("next") or request.GET.get("next")
+    if not siguiente or not url_has_allowed_host_and_scheme(
+        siguiente, allowed_hosts={request.get_host()}, require_https=request.is_secure()
+    ):
+        siguiente = reverse("client_list")
+
+    if form.is_valid():
+        usuario = request.user if request.user.is_authenticated else None
+        renovadas = form.cleaned_data["licencias"].renew(
+            form.cleaned_data["fecha_inicio_vigencia"], usuario=usuario
+        )
+        omitidas = len(form.cleaned_data["licencias"]) - renovadas
+        mensaje = f"Se renovaron {renovadas} licencias."
+        if omitidas:
+            mensaje += f" {omitidas} licencias perpetuas no se renovaron."
+        messages.success(request, mensaje)
+        return redirect(siguiente)
+
+    ids = datos.getlist("licencias") if datos else request.GET.getlist("licencias")
+    licencias = Licencia.objects.filter(
+        pk__in=[pk for pk in ids if pk.isdigit()]
+    ).select_related("cliente", "tipo_sistema")[:LICENCIAS_A_MOSTRAR]
+    context = {
+        "form": form,
+        "licencias": licencias,
+        "total": len(ids),
+        "siguiente": siguiente,
+    }
+    return render(request, "licensing_management/bulk_renew_licenses.html", context)
+
+
 def delete_license_view(request, clave_cliente, licencia_id):
     cliente = get_object_or_404(Cliente, clave_cliente=clave_cliente)
     licencia = get_object_or_404(Licencia, id=licencia_id, cliente=cliente)
@@ -43,6 +43,7 @@ DJANGO_APPS = [
     "django.contrib.sessions",
     "django.contrib.messages",
     "django.contrib.staticfiles",
+    "django.contrib.postgres",  # Búsqueda por trigramas (pg_trgm) de clientes
 ]
 
 THIRD_PARTY_APPS = []
@@ -100,6 +101,28 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# "file" (por defecto) se comparte entre el servidor web y los comandos de cron, así
+# que las invalidaciones de update_license_status o import_clients se ven en el sitio.
+# "locmem" vive dentro de cada proceso: úsese solo con un único proceso que escriba.
+# Variables de entorno: CACHE_BACKEND ("file" o "locmem"), CACHE_LOCATION (directorio
+# de la caché de archivos; tiene que ser el mismo para el servidor y cron) y
+# CACHE_TIMEOUT (segundos). Los contadores de generación que invalidan la caché están
+# en la base de datos (GeneracionCache), así que no dependen de un incr() atómico.
+CACHE_BACKENDS = {
+    "file": "django.core.cache.backends.filebased.FileBasedCache",
+    "locmem": "django.core.cache.backends.locmem.LocMemCache",
+}
+
+CACHES = {
+    "default": {
+        "BACKEND": CACHE_BACKENDS[os.getenv("CACHE_BACKEND", "file")],
+        "LOCATION": os.getenv("CACHE_LOCATION", "/var/tmp/plataforma_licencias_cache"),
+        "TIMEOUT": int(os.getenv("CACHE_TIMEOUT", 300)),
+    }
+}
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 